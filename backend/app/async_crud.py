@@ -0,0 +1,86 @@
+"""Asyncio versions of the hot crud paths, used when DB_ASYNC is enabled.
+
+Queries come from the ``select_*`` builders in crud so both paths stay in step;
+only the session calls differ.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from . import crud, models, schemas, serialization
+
+async def run(db, crud_function, *args, **kwargs):
+    """Call the async_crud function named like crud_function on an AsyncSession,
+    or crud_function itself in the threadpool on a sync Session."""
+    if isinstance(db, AsyncSession):
+        return await globals()[crud_function.__name__](db, *args, **kwargs)
+    return await run_in_threadpool(crud_function, db, *args, **kwargs)
+
+async def get_principal_by_email(db: AsyncSession, email: str):
+    row = (await db.execute(crud.select_principal(email))).first()
+    if not row:
+        return None
+    return schemas.Principal.model_validate(row)
+
+async def get_revision(db: AsyncSession, key: str) -> int:
+    return (await db.scalar(crud.select_revision(key))) or 0
+
+async def get_plan_revision(db: AsyncSession, plan_id: int, principal: schemas.Principal):
+    return crud.revision_of((await db.execute(crud.select_plan_revision(plan_id, principal))).first())
+
+async def get_step_notes_revision(db: AsyncSession, step_id: int, principal: schemas.Principal):
+    return crud.revision_of((await db.execute(crud.select_step_notes_revision(step_id, principal))).first())
+
+async def get_user_animals(db: AsyncSession, principal: schemas.Principal, skip: int = 0, limit: int = 100, after_id: int = None, fields=crud.ANIMAL_FIELDS):
+    return serialization.records(fields, await db.execute(crud.select_user_animals(principal, skip, limit, after_id, fields)))
+
+async def get_animal_record(db: AsyncSession, animal_id: int, principal: schemas.Principal, fields=crud.ANIMAL_FIELDS):
+    row = (await db.execute(crud.select_animal(animal_id, principal, fields))).first()
+    return dict(zip(fields, row)) if row else None
+
+async def get_plan_tree(db: AsyncSession, principal: schemas.Principal, include=("steps",), plan_id: int = None, animal_id: int = None, fields=crud.PLAN_FIELDS):
+    plans, *children = crud.select_plan_tree(principal, include, plan_id, animal_id, fields)
+    plan_rows = (await db.execute(plans)).all()
+    if not plan_rows:
+        return []
+    return crud.plan_tree_result(plan_rows, *[(await db.execute(stmt)).all() for stmt in children], include=include, fields=fields)
+
+async def get_plan_progress(db: AsyncSession, principal: schemas.Principal, plan_id: int = None, animal_id: int = None):
+    return crud.plan_progress_result((await db.execute(crud.select_plan_progress(principal, plan_id, animal_id))).all())
+
+async def get_notes_for_step(db: AsyncSession, step_id: int, principal: schemas.Principal, limit: int = None, after=None, fields=crud.NOTE_FIELDS):
+    return serialization.records(fields, await db.execute(crud.select_notes_for_step(step_id, principal, limit, after, fields)))
+
+async def add_step_session_note(db: AsyncSession, step_id: int, note_data: schemas.StepSessionNoteCreate, principal: schemas.Principal):
+    step = (await db.scalars(crud.select_step_for_user(step_id, principal))).first()
+    if not step:
+        return None
+
+    # The write itself is shared with crud, run on the session's sync facade
+    db_note = await db.run_sync(crud.add_note_to_step, step, note_data, principal)
+    await db.commit()
+    await db.refresh(db_note)
+    return db_note
+
+async def create_log(db: AsyncSession, principal: schemas.Principal, log: schemas.TimeLogCreate):
+    db_log = models.TimeLog(**log.dict(), user_id=principal.id)
+    db.add(db_log)
+    await db.commit()
+    await db.refresh(db_log)
+    return db_log
+
+async def get_user_stats(db: AsyncSession, principal: schemas.Principal, group_by: str = None,
+                         date_from=None, date_to=None):
+    totals = (await db.execute(crud.select_stats_totals(principal, date_from, date_to))).one()
+    group_rows = None
+    if group_by is not None:
+        group_rows = (await db.execute(
+            crud.select_stats_groups(db.bind.dialect.name, principal, group_by, date_from, date_to)
+        )).all()
+    return crud.stats_result(totals, group_by, group_rows)
+
+async def get_timeline(db: AsyncSession, principal: schemas.Principal, bucket: str = "week", animal_id: int = None,
+                       plan_id: int = None, date_from=None, date_to=None):
+    span_rows = (await db.execute(crud.select_timeline_spans(principal, animal_id, plan_id, date_from, date_to))).all()
+    session_rows = (await db.execute(crud.select_timeline_sessions(
+        db.bind.dialect.name, principal, bucket, animal_id, plan_id, date_from, date_to
+    ))).all()
+    return crud.timeline_result(bucket, span_rows, session_rows)
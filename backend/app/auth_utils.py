@@ -1,17 +1,55 @@
+import hashlib
+import os
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
-from . import crud, schemas, database
+from starlette.concurrency import run_in_threadpool
+from . import async_crud, cache, crud, models, schemas, database
 
 # Configuration - in production, these should be environment variables
 SECRET_KEY = "your-secret-key-here-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Principals are cached by token subject; set PRINCIPAL_CACHE_TTL=0 to always hit the database
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", "1024"))
+
+# Failed logins per email and client address inside a window (counted from the first
+# failure) before further attempts get a 429. Keying on the address means a third party
+# can't lock a user out, and the per-address cap stops one client from spraying emails
+# until the LRU evicts everyone else's counters
+LOGIN_MAX_FAILURES = int(os.environ.get("LOGIN_MAX_FAILURES", "5"))
+LOGIN_CLIENT_MAX_FAILURES = int(os.environ.get("LOGIN_CLIENT_MAX_FAILURES", "50"))
+LOGIN_FAILURE_WINDOW = float(os.environ.get("LOGIN_FAILURE_WINDOW", "300"))
+LOGIN_FAILURE_CACHE_SIZE = 100_000
+
+# Peers (comma-separated, "*" for any) whose X-Forwarded-For names the real client.
+# Behind a proxy every request arrives from the proxy's address, so without this all
+# clients would share one login throttle
+TRUSTED_PROXY_IPS = {ip.strip() for ip in os.environ.get("TRUSTED_PROXY_IPS", "").split(",") if ip.strip()}
+
+# Verified token claims, keyed by token hash and kept until the token expires, so
+# repeat requests skip the signature check
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "4096"))
+
 security = HTTPBearer()
+principal_cache = cache.TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+login_failures = cache.TTLCache(maxsize=LOGIN_FAILURE_CACHE_SIZE, ttl=LOGIN_FAILURE_WINDOW)
+token_cache = cache.TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def token_claims(user: models.User) -> dict:
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "org": user.organization_id,
+        "ver": user.token_version or 0,
+    }
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -24,16 +62,40 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def verify_token(token: str, credentials_exception):
+    key = hashlib.sha256(token.encode()).hexdigest()
+    token_data = token_cache.get(key)
+    if token_data is not None:
+        return token_data
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = schemas.TokenData(email=email)
+        token_data = schemas.TokenData(
+            email=email,
+            user_id=payload.get("uid"),
+            organization_id=payload.get("org"),
+            token_version=payload.get("ver", 0),
+        )
     except JWTError:
         raise credentials_exception
+    ttl = payload["exp"] - time.time() if "exp" in payload else None
+    token_cache.set(key, token_data, ttl=ttl)
     return token_data
 
+def token_matches(token_data: schemas.TokenData, user) -> bool:
+    """Whether a verified token is still valid for the user (or principal) it names.
+
+    Tokens issued before the uid/org claims existed only carry ``sub`` and count as version 0.
+    """
+    if token_data.token_version != (user.token_version or 0):
+        return False
+    if token_data.user_id is not None and token_data.user_id != user.id:
+        return False
+    if token_data.organization_id is not None and token_data.organization_id != user.organization_id:
+        return False
+    return True
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(database.get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -43,6 +105,89 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     token = credentials.credentials
     token_data = verify_token(token, credentials_exception)
     user = crud.get_user_by_email(db, email=token_data.email)
-    if user is None:
+    if user is None or not token_matches(token_data, user):
         raise credentials_exception
-    return user 
\ No newline at end of file
+    return user
+
+def _load_principal(email: str):
+    with database.SessionLocal() as db:
+        return crud.get_principal_by_email(db, email=email)
+
+async def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    # Async so a principal cache hit costs no threadpool hop and no session
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    token_data = verify_token(credentials.credentials, credentials_exception)
+    principal = principal_cache.get(token_data.email)
+    if principal is None:
+        if database.ASYNC_DB:
+            async with database.AsyncSessionLocal() as db:
+                principal = await async_crud.get_principal_by_email(db, email=token_data.email)
+        else:
+            principal = await run_in_threadpool(_load_principal, token_data.email)
+        if principal is None:
+            raise credentials_exception
+        principal_cache.set(token_data.email, principal)
+    # The cached principal carries the current token version, so a password change
+    # revokes older tokens without re-verifying them
+    if not token_matches(token_data, principal):
+        raise credentials_exception
+    return principal
+
+def client_address(request) -> str:
+    """The address a request came from, looking through trusted proxies."""
+    host = request.client.host if request.client else ""
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded or not ("*" in TRUSTED_PROXY_IPS or host in TRUSTED_PROXY_IPS):
+        return host
+    # Each proxy appends the address it received from, so read from the right and
+    # stop at the first hop that isn't a trusted proxy; anything left of it is client-supplied
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if hop not in TRUSTED_PROXY_IPS:
+            return hop
+    return hops[0] if hops else host
+
+def _failure_keys(email: str, client: str):
+    return ("login", email.lower(), client), ("client", client)
+
+def login_retry_after(email: str, client: str) -> float:
+    """Seconds until this email may be tried again from this client, 0 if not throttled."""
+    now = time.monotonic()
+    for key, limit in zip(_failure_keys(email, client), (LOGIN_MAX_FAILURES, LOGIN_CLIENT_MAX_FAILURES)):
+        count, window_end = login_failures.get(key, (0, now))
+        if count >= limit:
+            return max(window_end - now, 1.0)
+    return 0.0
+
+def record_login_failure(email: str, client: str):
+    now = time.monotonic()
+    for key in _failure_keys(email, client):
+        # The window runs from the first failure; later failures don't extend it
+        count, window_end = login_failures.get(key, (0, now + LOGIN_FAILURE_WINDOW))
+        login_failures.set(key, (count + 1, window_end), ttl=window_end - now)
+
+def clear_login_failures(email: str, client: str):
+    login_failures.pop(_failure_keys(email, client)[0])
+
+def invalidate_principal(email: str):
+    principal_cache.pop(email)
+
+@event.listens_for(models.User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    invalidate_principal(target.email)
+
+@event.listens_for(models.User, "after_update")
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(
+        getattr(state.attrs, name).history.has_changes()
+        for name in ("organization_id", "email", "token_version")
+    ):
+        for email in state.attrs.email.history.sum():
+            if email:
+                invalidate_principal(email)
+
@@ -0,0 +1,165 @@
+"""Content-negotiated response compression.
+
+A plain ASGI middleware, like ``MetricsMiddleware``. It picks the client's most
+preferred encoding from ``Accept-Encoding`` among those available: gzip always,
+``br`` with ``pip install brotli`` and ``zstd`` with ``pip install zstandard``.
+Whole responses under ``COMPRESSION_MIN_SIZE`` bytes go out as they are.
+Streamed responses (the log export) are compressed chunk by chunk and flushed
+after each one, so the client still sees rows as they are produced.
+
+Responses that already carry a Content-Encoding, have no body (204, 304), are not
+text-like or say ``Cache-Control: no-transform`` are passed through.
+"""
+import os
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+# Server preference when the client rates several encodings equally; empty disables compression
+COMPRESSION_ENCODINGS = [
+    name.strip() for name in os.environ.get("COMPRESSION_ENCODINGS", "br,zstd,gzip").split(",") if name.strip()
+]
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4  # dynamic responses: quality 11 costs far more CPU for a few percent
+ZSTD_LEVEL = 3
+
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "application/javascript", "application/xml",
+    "image/svg+xml", "text/",
+)
+
+class GzipStream:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class BrotliStream:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+class ZstdStream:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        flush = zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return self._compressor.compress(data) + self._compressor.flush(flush)
+
+STREAMS = {"gzip": GzipStream}
+if brotli is not None:
+    STREAMS["br"] = BrotliStream
+if zstandard is not None:
+    STREAMS["zstd"] = ZstdStream
+
+def available_encodings(preference=COMPRESSION_ENCODINGS):
+    return [name for name in preference if name in STREAMS]
+
+def negotiate(accept_encoding: str, encodings) -> str:
+    """The encoding to use for an Accept-Encoding header, or None for identity."""
+    ratings = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            ratings[name] = quality
+    best, best_quality = None, 0.0
+    for name in encodings:
+        quality = ratings.get(name, ratings.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers or "no-transform" in headers.get("cache-control", ""):
+        return False
+    return headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, encodings=None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings() if encodings is None else encodings
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # None (identity) still goes through send_wrapper so the response gets its Vary header
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+
+        start = None
+        stream = None  # set once the response is being compressed
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, stream, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is None:
+                headers = MutableHeaders(raw=start["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if (
+                    encoding is None
+                    or start["status"] in (204, 304)
+                    or not _compressible(headers)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                stream = STREAMS[encoding]()
+                headers["Content-Encoding"] = encoding
+                if "etag" in headers and not headers["etag"].startswith("W/"):
+                    # A strong validator must differ between encodings of the same resource
+                    headers["ETag"] = headers["etag"][:-1] + f'-{encoding}"'
+                if more_body:
+                    del headers["Content-Length"]
+                    await send(start)
+                else:
+                    body = stream.compress(body, final=True)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+            await send({
+                "type": "http.response.body",
+                "body": stream.compress(body, final=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,8 +1,110 @@
-from sqlalchemy.orm import Session
-from . import models, schemas
-from passlib.context import CryptContext
+import json
+from datetime import date, datetime, timedelta
+from sqlalchemy import bindparam, case, delete, func, insert, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from pydantic import ValidationError
+from sqlalchemy.orm import Session, contains_eager, selectinload
+from . import models, schemas, serialization
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Response fields read straight from column selects, see serialization.py
+ANIMAL_FIELDS = serialization.fields(schemas.AnimalOut)
+PLAN_FIELDS = serialization.fields(schemas.TrainingPlanOut, exclude={"steps"})
+STEP_FIELDS = serialization.fields(schemas.PlanStepOut)
+NOTE_FIELDS = serialization.fields(schemas.StepSessionNoteOut)
+STEP_PROGRESS_COLUMNS = (
+    models.StepProgress.actual_sessions,
+    models.StepProgress.note_count,
+    models.StepProgress.first_performed_date,
+    models.StepProgress.last_performed_date,
+)
+
+def plans_revision_key(organization_id: int) -> str:
+    # Covers every plan, step and session note of an organization
+    return f"org:{organization_id}:plans"
+
+def plan_revision_key(plan_id: int) -> str:
+    # A plan with its steps, notes and progress, as served by GET /plans/{plan_id}
+    return f"plan:{plan_id}"
+
+def step_notes_revision_key(step_id: int) -> str:
+    return f"step:{step_id}:notes"
+
+def animals_revision_key(organization_id: int) -> str:
+    return f"org:{organization_id}:animals"
+
+def _upsert_insert(dialect_name: str):
+    # The dialect's insert() with on_conflict_do_update, or None where there isn't one
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+def revision_bump(dialect_name: str):
+    """Statement adding one to the revision named by the ``key`` parameter, creating it if missing."""
+    table = models.Revision.__table__
+    upsert = _upsert_insert(dialect_name)
+    if upsert is None:
+        return None
+    return upsert(table).values(key=bindparam("key"), version=1).on_conflict_do_update(
+        index_elements=[table.c.key], set_={"version": table.c.version + 1}
+    )
+
+def record_revisions(session_info: dict, keys):
+    # read_cache advances these keys' generations once the session commits
+    session_info.setdefault("revision_keys", set()).update(keys)
+
+def bump_revisions(db: Session, *keys: str):
+    # Runs inside the caller's transaction so the bump commits with the write it describes
+    record_revisions(db.info, keys)
+    stmt = revision_bump(db.bind.dialect.name)
+    if stmt is not None:
+        db.execute(stmt, [{"key": key} for key in keys])
+        return
+    table = models.Revision.__table__
+    for key in keys:
+        if db.execute(update(table).where(table.c.key == key).values(version=table.c.version + 1)).rowcount == 0:
+            db.execute(insert(table).values(key=key, version=1))
+
+def select_revision(key: str):
+    return select(models.Revision.version).where(models.Revision.key == key)
+
+def get_revision(db: Session, key: str) -> int:
+    return db.scalar(select_revision(key)) or 0
+
+def _touch_plan(db: Session, principal: schemas.Principal, plan_id: int, *keys: str):
+    bump_revisions(db, plans_revision_key(principal.organization_id), plan_revision_key(plan_id), *keys)
+
+def _scoped_revision(stmt, principal: schemas.Principal, key: str):
+    # Authorizes the resource and reads its revision in one query; no row means not found
+    return _org_scoped(
+        stmt.add_columns(models.Revision.version).outerjoin(models.Revision, models.Revision.key == key),
+        principal,
+    )
+
+def select_plan_revision(plan_id: int, principal: schemas.Principal):
+    stmt = select(models.TrainingPlan.id).join(models.TrainingPlan.animal).where(models.TrainingPlan.id == plan_id)
+    return _scoped_revision(stmt, principal, plan_revision_key(plan_id))
+
+def select_step_notes_revision(step_id: int, principal: schemas.Principal):
+    stmt = (
+        select(models.PlanStep.id)
+        .join(models.PlanStep.plan)
+        .join(models.TrainingPlan.animal)
+        .where(models.PlanStep.id == step_id)
+    )
+    return _scoped_revision(stmt, principal, step_notes_revision_key(step_id))
+
+def revision_of(row):
+    return None if row is None else row[1] or 0
+
+def get_plan_revision(db: Session, plan_id: int, principal: schemas.Principal):
+    return revision_of(db.execute(select_plan_revision(plan_id, principal)).first())
+
+def get_step_notes_revision(db: Session, step_id: int, principal: schemas.Principal):
+    return revision_of(db.execute(select_step_notes_revision(step_id, principal)).first())
 
 def get_organization_by_name(db: Session, name: str):
     return db.query(models.Organization).filter(models.Organization.name == name).first()
@@ -20,16 +122,28 @@ def get_user_by_email(db: Session, email: str):
 def get_user_by_id(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
+# The select_* builders below are shared with async_crud, which runs them on an AsyncSession
+
+def select_principal(email: str):
+    return select(
+        models.User.id, models.User.email, models.User.organization_id, models.User.token_version
+    ).where(models.User.email == email)
+
+def get_principal_by_email(db: Session, email: str):
+    row = db.execute(select_principal(email)).first()
+    if not row:
+        return None
+    return schemas.Principal.model_validate(row)
+
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str):
     # Check if organization exists, create if it doesn't
     organization = get_organization_by_name(db, user.organization_name)
     if not organization:
         organization = create_organization(db, schemas.OrganizationCreate(name=user.organization_name))
     
-    hashed_pw = pwd_context.hash(user.password)
     db_user = models.User(
         email=user.email, 
-        hashed_password=hashed_pw,
+        hashed_password=hashed_password,
         organization_id=organization.id
     )
     db.add(db_user)
@@ -37,307 +151,981 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
-def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+def update_password_hash(db: Session, user: models.User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
-    if not user:
-        return False
-    if not verify_password(password, user.hashed_password):
-        return False
+def change_password(db: Session, user: models.User, hashed_password: str):
+    # Bumping the version revokes every token issued with the old password
+    user.hashed_password = hashed_password
+    user.token_version = (user.token_version or 0) + 1
+    db.commit()
+    db.refresh(user)
     return user
 
-def create_animal(db: Session, animal: schemas.AnimalCreate, user_id: int):
-    # Get user to get their organization_id
-    user = get_user_by_id(db, user_id)
-    if not user:
-        return None
-    
-    db_animal = models.Animal(**animal.dict(), owner_id=user_id, organization_id=user.organization_id)
+def create_animal(db: Session, animal: schemas.AnimalCreate, principal: schemas.Principal):
+    db_animal = models.Animal(**animal.dict(), owner_id=principal.id, organization_id=principal.organization_id)
     db.add(db_animal)
+    bump_revisions(db, animals_revision_key(principal.organization_id))
     db.commit()
     db.refresh(db_animal)
     return db_animal
 
-def get_user_animals(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    # Get user to get their organization_id
-    user = get_user_by_id(db, user_id)
-    if not user:
-        return []
-    
-    return db.query(models.Animal).filter(
-        models.Animal.organization_id == user.organization_id
-    ).offset(skip).limit(limit).all()
-
-def get_animal_by_id(db: Session, animal_id: int, user_id: int):
-    # Get user to get their organization_id
-    user = get_user_by_id(db, user_id)
-    if not user:
-        return None
-    
-    return db.query(models.Animal).filter(
-        models.Animal.id == animal_id, 
-        models.Animal.organization_id == user.organization_id
-    ).first()
+def _org_scoped(query, principal: schemas.Principal):
+    # Restrict a query that already selects or joins Animal to the caller's organization
+    return query.filter(models.Animal.organization_id == principal.organization_id)
+
+def select_user_animals(principal: schemas.Principal, skip: int = 0, limit: int = 100, after_id: int = None, fields=ANIMAL_FIELDS):
+    stmt = select(*serialization.columns(models.Animal, fields))
+    stmt = _org_scoped(stmt, principal).order_by(models.Animal.id)
+    if after_id is not None:
+        stmt = stmt.where(models.Animal.id > after_id)
+    else:
+        stmt = stmt.offset(skip)
+    return stmt.limit(limit)
+
+def get_user_animals(db: Session, principal: schemas.Principal, skip: int = 0, limit: int = 100, after_id: int = None, fields=ANIMAL_FIELDS):
+    return serialization.records(fields, db.execute(select_user_animals(principal, skip, limit, after_id, fields)))
+
+def select_animal(animal_id: int, principal: schemas.Principal, fields=ANIMAL_FIELDS):
+    stmt = select(*serialization.columns(models.Animal, fields))
+    return _org_scoped(stmt, principal).where(models.Animal.id == animal_id)
+
+def get_animal_record(db: Session, animal_id: int, principal: schemas.Principal, fields=ANIMAL_FIELDS):
+    row = db.execute(select_animal(animal_id, principal, fields)).first()
+    return dict(zip(fields, row)) if row else None
+
+def get_animal_by_id(db: Session, animal_id: int, principal: schemas.Principal):
+    return _org_scoped(db.query(models.Animal), principal).filter(models.Animal.id == animal_id).first()
 
-def update_animal(db: Session, animal_id: int, user_id: int, animal_update: schemas.AnimalCreate):
-    db_animal = get_animal_by_id(db, animal_id, user_id)
+def get_plan_for_user(db: Session, plan_id: int, principal: schemas.Principal):
+    # Resolve a plan and check its animal is in the caller's organization in one query
+    query = db.query(models.TrainingPlan).join(models.TrainingPlan.animal)
+    return _org_scoped(query, principal).filter(models.TrainingPlan.id == plan_id).first()
+
+def select_step_for_user(step_id: int, principal: schemas.Principal):
+    # Resolve a step through its plan and animal to the caller's organization in one query
+    stmt = select(models.PlanStep).join(models.PlanStep.plan).join(models.TrainingPlan.animal)
+    return _org_scoped(stmt, principal).where(models.PlanStep.id == step_id)
+
+def get_step_for_user(db: Session, step_id: int, principal: schemas.Principal):
+    return db.scalars(select_step_for_user(step_id, principal)).first()
+
+def get_note_for_user(db: Session, note_id: int, principal: schemas.Principal):
+    # Resolve a session note through its step, plan and animal to the caller's organization in one query
+    query = (
+        db.query(models.StepSessionNote)
+        .join(models.StepSessionNote.step)
+        .join(models.PlanStep.plan)
+        .join(models.TrainingPlan.animal)
+    )
+    query = query.options(contains_eager(models.StepSessionNote.step))
+    return _org_scoped(query, principal).filter(models.StepSessionNote.id == note_id).first()
+
+def update_animal(db: Session, animal_id: int, principal: schemas.Principal, animal_update: schemas.AnimalCreate):
+    db_animal = get_animal_by_id(db, animal_id, principal)
     if not db_animal:
         return None
     
     for field, value in animal_update.dict().items():
         setattr(db_animal, field, value)
     
+    bump_revisions(db, animals_revision_key(principal.organization_id))
     db.commit()
     db.refresh(db_animal)
     return db_animal
 
-def delete_animal(db: Session, animal_id: int, user_id: int):
-    db_animal = get_animal_by_id(db, animal_id, user_id)
+def delete_animal(db: Session, animal_id: int, principal: schemas.Principal):
+    db_animal = get_animal_by_id(db, animal_id, principal)
     if not db_animal:
         return False
     
     db.delete(db_animal)
+    bump_revisions(db, animals_revision_key(principal.organization_id), plans_revision_key(principal.organization_id))
     db.commit()
     return True
 
-def create_log(db: Session, user_id: int, log: schemas.TimeLogCreate):
-    db_log = models.TimeLog(**log.dict(), user_id=user_id)
+def create_log(db: Session, principal: schemas.Principal, log: schemas.TimeLogCreate):
+    db_log = models.TimeLog(**log.dict(), user_id=principal.id)
     db.add(db_log)
     db.commit()
     db.refresh(db_log)
     return db_log
 
-def get_user_logs(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.TimeLog).filter(models.TimeLog.user_id == user_id).order_by(models.TimeLog.timestamp.desc()).offset(skip).limit(limit).all()
+def get_user_logs(db: Session, principal: schemas.Principal, skip: int = 0, limit: int = 100, before=None):
+    # before is a (timestamp, id) keyset position; newest logs come first
+    query = db.query(models.TimeLog).filter(models.TimeLog.user_id == principal.id).order_by(
+        models.TimeLog.timestamp.desc(), models.TimeLog.id.desc()
+    )
+    if before is not None:
+        query = query.filter(tuple_(models.TimeLog.timestamp, models.TimeLog.id) < tuple(before))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
-def get_user_stats(db: Session, user_id: int):
-    logs = db.query(models.TimeLog).filter(models.TimeLog.user_id == user_id).all()
-    total_sessions = len(logs)
-    total_time = sum(log.duration for log in logs)
-    
-    # Calculate this week's time
-    from datetime import datetime, timedelta
+LOG_IMPORT_CHUNK_SIZE = 1000
+MAX_IMPORT_ERRORS = 100
+
+def _insert_log_chunk(db: Session, principal: schemas.Principal, chunk: list):
+    # chunk holds (line, TimeLogImport) pairs; returns the lines rejected for a foreign animal
+    animal_ids = {log.animal_id for _, log in chunk if log.animal_id is not None}
+    allowed = set(db.scalars(
+        select(models.Animal.id).where(
+            models.Animal.id.in_(animal_ids),
+            models.Animal.organization_id == principal.organization_id,
+        )
+    )) if animal_ids else set()
+
+    rows, rejected = [], []
+    for line, log in chunk:
+        if log.animal_id is not None and log.animal_id not in allowed:
+            rejected.append(line)
+            continue
+        rows.append({
+            "user_id": principal.id,
+            "duration": log.duration,
+            "timestamp": log.timestamp or datetime.utcnow(),
+            "notes": log.notes,
+            "animal_id": log.animal_id,
+        })
+    if rows:
+        db.execute(insert(models.TimeLog.__table__), rows)
+    db.commit()
+    return len(rows), rejected
+
+def import_logs(db: Session, principal: schemas.Principal, records, chunk_size: int = LOG_IMPORT_CHUNK_SIZE):
+    """Insert (line, record) pairs in chunked transactions, holding at most one chunk in memory."""
+    result = {"imported": 0, "rejected": 0, "errors": []}
+
+    def reject(line, error):
+        result["rejected"] += 1
+        if len(result["errors"]) < MAX_IMPORT_ERRORS:
+            result["errors"].append({"line": line, "error": error})
+
+    def flush(chunk):
+        imported, rejected = _insert_log_chunk(db, principal, chunk)
+        result["imported"] += imported
+        for line in rejected:
+            reject(line, "Animal not found or not in your organization")
+
+    chunk = []
+    for line, record in records:
+        if isinstance(record, Exception):
+            reject(line, "Invalid JSON")
+            continue
+        try:
+            chunk.append((line, schemas.TimeLogImport.model_validate(record)))
+        except ValidationError as exc:
+            reject(line, "; ".join(
+                f"{'.'.join(str(part) for part in error['loc']) or 'record'}: {error['msg']}" for error in exc.errors()
+            ))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    return result
+
+def iter_user_log_batches(db: Session, principal: schemas.Principal, batch_size: int = LOG_IMPORT_CHUNK_SIZE):
+    # yield_per streams from a server-side cursor where the driver supports one
+    result = db.execute(
+        select(
+            models.TimeLog.id,
+            models.TimeLog.timestamp,
+            models.TimeLog.duration,
+            models.TimeLog.notes,
+            models.TimeLog.animal_id,
+        )
+        .where(models.TimeLog.user_id == principal.id)
+        .order_by(models.TimeLog.timestamp, models.TimeLog.id)
+        .execution_options(yield_per=batch_size)
+    )
+    yield from result.partitions()
+
+STATS_GROUPS = ("animal", "day", "week", "month")
+
+def _period_bucket(dialect_name: str, column, period: str):
+    # Start of the day/week/month containing column, as an ISO date
+    if dialect_name == "sqlite":
+        if period == "day":
+            return func.date(column)
+        if period == "week":
+            return func.date(column, "weekday 0", "-6 days")
+        return func.strftime("%Y-%m-01", column)
+    return func.to_char(func.date_trunc(period, column), "YYYY-MM-DD")
+
+def _day_start(value: date) -> datetime:
+    # A bare date covers its whole day, as the timeline's from/to do
+    return value if isinstance(value, datetime) else datetime.combine(value, datetime.min.time())
+
+def _stats_filters(principal: schemas.Principal, date_from: date = None, date_to: date = None):
+    filters = [models.TimeLog.user_id == principal.id]
+    if date_from is not None:
+        filters.append(models.TimeLog.timestamp >= _day_start(date_from))
+    if date_to is not None:
+        if not isinstance(date_to, datetime):
+            date_to = date_to + timedelta(days=1)
+        filters.append(models.TimeLog.timestamp < _day_start(date_to))
+    return filters
+
+def select_stats_totals(principal: schemas.Principal, date_from: datetime = None, date_to: datetime = None):
     week_ago = datetime.utcnow() - timedelta(days=7)
-    this_week_logs = db.query(models.TimeLog).filter(
-        models.TimeLog.user_id == user_id,
-        models.TimeLog.timestamp >= week_ago
-    ).all()
-    this_week_time = sum(log.duration for log in this_week_logs)
-    
-    return {
+    return select(
+        func.count(models.TimeLog.id),
+        func.coalesce(func.sum(models.TimeLog.duration), 0),
+        func.coalesce(func.sum(case((models.TimeLog.timestamp >= week_ago, models.TimeLog.duration), else_=0)), 0),
+    ).where(*_stats_filters(principal, date_from, date_to))
+
+def select_stats_groups(dialect_name: str, principal: schemas.Principal, group_by: str,
+                        date_from: datetime = None, date_to: datetime = None):
+    if group_by == "animal":
+        key = models.TimeLog.animal_id
+    else:
+        key = _period_bucket(dialect_name, models.TimeLog.timestamp, group_by)
+    return select(
+        key,
+        func.count(models.TimeLog.id),
+        func.coalesce(func.sum(models.TimeLog.duration), 0),
+    ).where(*_stats_filters(principal, date_from, date_to)).group_by(key).order_by(key)
+
+def stats_result(totals, group_by: str = None, group_rows=None):
+    total_sessions, total_time, this_week_time = totals
+    stats = {
         "total_sessions": total_sessions,
         "total_time": total_time,
         "this_week_time": this_week_time
     }
+    if group_by is None:
+        return stats
+    key_field = "animal_id" if group_by == "animal" else "period"
+    stats["group_by"] = group_by
+    stats["groups"] = [
+        {key_field: value, "sessions": sessions, "total_time": time}
+        for value, sessions, time in group_rows
+    ]
+    return stats
+
+def get_user_stats(db: Session, principal: schemas.Principal, group_by: str = None,
+                   date_from: datetime = None, date_to: datetime = None):
+    totals = db.execute(select_stats_totals(principal, date_from, date_to)).one()
+    group_rows = None
+    if group_by is not None:
+        group_rows = db.execute(
+            select_stats_groups(db.bind.dialect.name, principal, group_by, date_from, date_to)
+        ).all()
+    return stats_result(totals, group_by, group_rows)
+
+TIMELINE_BUCKETS = ("day", "week", "month")
+
+def _timeline_scope(stmt, principal: schemas.Principal, animal_id: int = None, plan_id: int = None):
+    stmt = _org_scoped(stmt, principal)
+    if animal_id is not None:
+        stmt = stmt.where(models.TrainingPlan.animal_id == animal_id)
+    if plan_id is not None:
+        stmt = stmt.where(models.TrainingPlan.id == plan_id)
+    return stmt
+
+def select_timeline_spans(principal: schemas.Principal, animal_id: int = None, plan_id: int = None,
+                          date_from: date = None, date_to: date = None):
+    # Step spans run from the first to the last performed note (kept in step_progress),
+    # falling back to the plan's start date for steps with no dated notes yet
+    progress = models.StepProgress
+    start = func.coalesce(progress.first_performed_date, models.TrainingPlan.started_date)
+    end = func.coalesce(progress.last_performed_date, start)
+    stmt = (
+        select(
+            models.TrainingPlan.id,
+            models.TrainingPlan.name,
+            models.TrainingPlan.animal_id,
+            models.TrainingPlan.started_date,
+            models.PlanStep.id,
+            models.PlanStep.name,
+            models.PlanStep.order,
+            models.PlanStep.estimated_sessions,
+            models.PlanStep.is_complete,
+            start,
+            end,
+        )
+        .select_from(models.PlanStep)
+        .join(models.PlanStep.plan)
+        .join(models.TrainingPlan.animal)
+        .outerjoin(progress, progress.step_id == models.PlanStep.id)
+    )
+    stmt = _timeline_scope(stmt, principal, animal_id, plan_id)
+    if date_from is not None:
+        stmt = stmt.where(end >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(start <= date_to)
+    return stmt.order_by(models.TrainingPlan.id, models.PlanStep.order, models.PlanStep.id)
+
+def select_timeline_sessions(dialect_name: str, principal: schemas.Principal, bucket: str, animal_id: int = None,
+                             plan_id: int = None, date_from: date = None, date_to: date = None):
+    note = models.StepSessionNote
+    key = _period_bucket(dialect_name, note.performed_date, bucket)
+    stmt = (
+        select(note.step_id, key, func.coalesce(func.sum(note.session_count), 0), func.count(note.id))
+        .join(note.step)
+        .join(models.PlanStep.plan)
+        .join(models.TrainingPlan.animal)
+        .where(note.performed_date.is_not(None))
+    )
+    stmt = _timeline_scope(stmt, principal, animal_id, plan_id)
+    if date_from is not None:
+        stmt = stmt.where(note.performed_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(note.performed_date <= date_to)
+    return stmt.group_by(note.step_id, key).order_by(key, note.step_id)
+
+def timeline_result(bucket: str, span_rows, session_rows):
+    # Columnar: one list per field, with sessions pointing into steps and buckets by index
+    plans = {"id": [], "name": [], "animal_id": [], "started_date": []}
+    steps = {"id": [], "plan_id": [], "name": [], "order": [], "estimated_sessions": [],
+             "is_complete": [], "start": [], "end": []}
+    step_index = {}
+    for (plan_id, plan_name, animal_id, started_date, step_id, name, order,
+         estimated_sessions, is_complete, start, end) in span_rows:
+        if not plans["id"] or plans["id"][-1] != plan_id:
+            plans["id"].append(plan_id)
+            plans["name"].append(plan_name)
+            plans["animal_id"].append(animal_id)
+            plans["started_date"].append(started_date)
+        step_index[step_id] = len(steps["id"])
+        steps["id"].append(step_id)
+        steps["plan_id"].append(plan_id)
+        steps["name"].append(name)
+        steps["order"].append(order)
+        steps["estimated_sessions"].append(estimated_sessions)
+        steps["is_complete"].append(bool(is_complete))
+        steps["start"].append(start)
+        steps["end"].append(end)
+
+    buckets = sorted({key for _, key, _, _ in session_rows})
+    bucket_index = {key: index for index, key in enumerate(buckets)}
+    sessions = {"step": [], "bucket": [], "sessions": [], "notes": []}
+    for step_id, key, session_total, note_count in session_rows:
+        if step_id not in step_index:
+            continue
+        sessions["step"].append(step_index[step_id])
+        sessions["bucket"].append(bucket_index[key])
+        sessions["sessions"].append(session_total)
+        sessions["notes"].append(note_count)
+    return {"bucket": bucket, "buckets": buckets, "plans": plans, "steps": steps, "sessions": sessions}
+
+def get_timeline(db: Session, principal: schemas.Principal, bucket: str = "week", animal_id: int = None,
+                 plan_id: int = None, date_from: date = None, date_to: date = None):
+    span_rows = db.execute(select_timeline_spans(principal, animal_id, plan_id, date_from, date_to)).all()
+    session_rows = db.execute(select_timeline_sessions(
+        db.bind.dialect.name, principal, bucket, animal_id, plan_id, date_from, date_to
+    )).all()
+    return timeline_result(bucket, span_rows, session_rows)
+
+# Plan columns a template carries over
+PLAN_COPY_FIELDS = ("name", "description", "cue_description", "cue_video_url", "criteria", "category")
+TEMPLATE_STEP_FIELDS = ("name", "description", "order", "estimated_sessions")
+
+def _insert_plans(db: Session, plan_rows: list, step_rows: list) -> dict:
+    """Insert one plan per animal, each with a copy of step_rows; returns {animal_id: plan_id}.
 
-def create_plan_with_steps(db: Session, animal_id: int, plan_data: schemas.TrainingPlanCreate, user_id: int):
-    # Verify the animal belongs to the user's organization
-    animal = get_animal_by_id(db, animal_id, user_id)
+    Plans and steps go in one batched statement each. Ids are matched back by animal
+    rather than by row order, which would cost one INSERT per plan on some backends.
+    Each new step gets its zeroed step_progress row in a third statement, so note
+    writes on it take the atomic delta path rather than a recount.
+    """
+    plans_table = models.TrainingPlan.__table__
+    plan_ids = dict(
+        (animal_id, plan_id) for plan_id, animal_id in db.execute(
+            insert(plans_table).returning(plans_table.c.id, plans_table.c.animal_id), plan_rows
+        )
+    )
+    if step_rows:
+        db.execute(
+            insert(models.PlanStep.__table__),
+            [{**step, "plan_id": plan_id} for plan_id in plan_ids.values() for step in step_rows],
+        )
+        db.execute(insert(models.StepProgress.__table__).from_select(
+            ["step_id"], select(models.PlanStep.id).where(models.PlanStep.plan_id.in_(plan_ids.values()))
+        ))
+    return plan_ids
+
+def create_plan_with_steps(db: Session, animal_id: int, plan_data: schemas.TrainingPlanCreate, principal: schemas.Principal):
+    # Verify the animal belongs to the caller's organization
+    animal = get_animal_by_id(db, animal_id, principal)
     if not animal:
         return None
     
-    db_plan = models.TrainingPlan(
-        name=plan_data.name,
-        description=plan_data.description,
-        animal_id=animal_id
+    plan_row = {field: getattr(plan_data, field) for field in PLAN_COPY_FIELDS + ("started_date",)}
+    step_rows = [
+        {
+            "name": step.name,
+            "description": step.description,
+            "order": step.order,
+            "estimated_sessions": step.estimated_sessions,
+            "is_complete": 1 if getattr(step, 'is_complete', False) else 0,
+        }
+        for step in plan_data.steps
+    ]
+    plan_ids = _insert_plans(db, [{**plan_row, "animal_id": animal_id}], step_rows)
+    bump_revisions(db, plans_revision_key(principal.organization_id))
+    db.commit()
+    return db.get(models.TrainingPlan, plan_ids[animal_id])
+
+def create_plan_template(db: Session, template: schemas.PlanTemplateCreate, principal: schemas.Principal):
+    db_template = models.PlanTemplate(**template.dict(exclude={"steps"}), organization_id=principal.organization_id)
+    db.add(db_template)
+    db.flush()  # Get the template id, then insert the steps as one batch
+    if template.steps:
+        db.execute(
+            insert(models.PlanTemplateStep.__table__),
+            [{**step.dict(), "template_id": db_template.id} for step in template.steps],
+        )
+    db.commit()
+    db.refresh(db_template)
+    return db_template
+
+def _templates_for_user(principal: schemas.Principal):
+    return (
+        select(models.PlanTemplate)
+        .where(models.PlanTemplate.organization_id == principal.organization_id)
+        .options(selectinload(models.PlanTemplate.steps))
+        .order_by(models.PlanTemplate.id)
     )
-    db.add(db_plan)
-    db.flush()  # Get plan id before adding steps
-    for step in plan_data.steps:
-        db_step = models.PlanStep(
-            name=step.name,
-            description=step.description,
-            order=step.order,
-            estimated_sessions=step.estimated_sessions,
-            plan_id=db_plan.id,
-            is_complete=1 if getattr(step, 'is_complete', False) else 0
+
+def get_plan_templates(db: Session, principal: schemas.Principal):
+    return db.scalars(_templates_for_user(principal)).all()
+
+def get_plan_template_for_user(db: Session, template_id: int, principal: schemas.Principal):
+    return db.scalars(_templates_for_user(principal).where(models.PlanTemplate.id == template_id)).first()
+
+def delete_plan_template(db: Session, template_id: int, principal: schemas.Principal):
+    template = get_plan_template_for_user(db, template_id, principal)
+    if not template:
+        return False
+    db.delete(template)
+    db.commit()
+    return True
+
+def apply_plan_template(db: Session, template_id: int, request: schemas.PlanTemplateApply, principal: schemas.Principal):
+    """Create a plan from a template for each animal in one transaction; None if the template isn't found."""
+    template = get_plan_template_for_user(db, template_id, principal)
+    if not template:
+        return None
+
+    # Authorize every animal with one query; repeated ids get a single plan
+    animal_ids = list(dict.fromkeys(request.animal_ids))
+    allowed = set(db.scalars(
+        select(models.Animal.id).where(
+            models.Animal.id.in_(animal_ids),
+            models.Animal.organization_id == principal.organization_id,
         )
-        db.add(db_step)
+    ).all())
+    targets = [animal_id for animal_id in animal_ids if animal_id in allowed]
+
+    plan_row = {field: getattr(template, field) for field in PLAN_COPY_FIELDS}
+    step_rows = [{field: getattr(step, field) for field in TEMPLATE_STEP_FIELDS} for step in template.steps]
+    plan_ids = {}
+    if targets:
+        plan_ids = _insert_plans(
+            db,
+            [{**plan_row, "animal_id": animal_id, "started_date": request.started_date} for animal_id in targets],
+            step_rows,
+        )
+        bump_revisions(db, plans_revision_key(principal.organization_id))
     db.commit()
-    db.refresh(db_plan)
-    return db_plan
+    return {
+        "created": len(plan_ids),
+        "results": [
+            {"animal_id": animal_id, "status": "created", "plan_id": plan_ids[animal_id]}
+            if animal_id in plan_ids else
+            {"animal_id": animal_id, "status": "not_found", "plan_id": None}
+            for animal_id in animal_ids
+        ],
+    }
 
-def get_plans_for_animal(db: Session, animal_id: int, user_id: int):
-    # Verify the animal belongs to the user's organization
-    animal = get_animal_by_id(db, animal_id, user_id)
-    if not animal:
+def select_plan_tree(principal: schemas.Principal, include=("steps",), plan_id: int = None, animal_id: int = None, fields=PLAN_FIELDS):
+    """Column-only statements for the plan, step and (if included) note rows of one plan or an animal's plans."""
+    def scoped(stmt):
+        # Plans outside the caller's organization simply don't match the join
+        stmt = _org_scoped(stmt.join(models.TrainingPlan.animal), principal)
+        if plan_id is not None:
+            return stmt.where(models.TrainingPlan.id == plan_id)
+        return stmt.where(models.TrainingPlan.animal_id == animal_id)
+
+    plans = scoped(select(*serialization.columns(models.TrainingPlan, fields)))
+    step_columns = [models.PlanStep.plan_id, *serialization.columns(models.PlanStep, STEP_FIELDS)]
+    steps = select(*step_columns, *STEP_PROGRESS_COLUMNS) if "progress" in include else select(*step_columns)
+    steps = steps.join(models.PlanStep.plan)
+    if "progress" in include:
+        steps = steps.outerjoin(models.StepProgress, models.StepProgress.step_id == models.PlanStep.id)
+    statements = [
+        plans.order_by(models.TrainingPlan.id),
+        scoped(steps).order_by(models.PlanStep.plan_id, models.PlanStep.order, models.PlanStep.id),
+    ]
+    if "notes" in include:
+        note = models.StepSessionNote
+        notes = select(*serialization.columns(note, NOTE_FIELDS)).join(note.step).join(models.PlanStep.plan)
+        statements.append(scoped(notes).order_by(note.timestamp, note.id))
+    return statements
+
+def plan_tree_result(plan_rows, step_rows, note_rows=(), include=("steps",), fields=PLAN_FIELDS):
+    """Plan trees as dicts shaped like TrainingPlanTreeOut (extras only when included), from select_plan_tree rows."""
+    notes = {}
+    for row in note_rows:
+        notes.setdefault(row.step_id, []).append(dict(zip(NOTE_FIELDS, row)))
+    plans = {row.id: {**dict(zip(fields, row)), "steps": []} for row in plan_rows}
+    for plan_id, *row in step_rows:
+        step = dict(zip(STEP_FIELDS, row))
+        step["is_complete"] = bool(step["is_complete"])
+        if "notes" in include:
+            step["notes"] = notes.get(step["id"], [])
+        if "progress" in include:
+            step["progress"] = _step_progress_fields(step["estimated_sessions"], step["is_complete"], *row[len(STEP_FIELDS):])
+        plans[plan_id]["steps"].append(step)
+    return list(plans.values())
+
+def get_plan_tree(db: Session, principal: schemas.Principal, include=("steps",), plan_id: int = None, animal_id: int = None, fields=PLAN_FIELDS):
+    plans, *children = select_plan_tree(principal, include, plan_id, animal_id, fields)
+    plan_rows = db.execute(plans).all()
+    if not plan_rows:
         return []
-    
-    return db.query(models.TrainingPlan).filter(models.TrainingPlan.animal_id == animal_id).all()
+    return plan_tree_result(plan_rows, *[db.execute(stmt).all() for stmt in children], include=include, fields=fields)
 
-def get_plan_with_steps(db: Session, plan_id: int, user_id: int):
-    # Get plan and verify the animal belongs to the user's organization
-    plan = db.query(models.TrainingPlan).filter(models.TrainingPlan.id == plan_id).first()
-    if not plan:
-        return None
-    
-    # Check if the animal belongs to the user's organization
-    animal = get_animal_by_id(db, plan.animal_id, user_id)
-    if not animal:
-        return None
-    
-    return plan
+def select_plan_progress(principal: schemas.Principal, plan_id: int = None, animal_id: int = None):
+    # One row per step (or per step-less plan) read from step_progress, so no notes are scanned
+    progress = models.StepProgress
+    stmt = (
+        select(
+            models.TrainingPlan.id,
+            models.PlanStep.id,
+            models.PlanStep.estimated_sessions,
+            models.PlanStep.is_complete,
+            progress.actual_sessions,
+            progress.note_count,
+            progress.first_performed_date,
+            progress.last_performed_date,
+        )
+        .join(models.TrainingPlan.animal)
+        .outerjoin(models.TrainingPlan.steps)
+        .outerjoin(progress, progress.step_id == models.PlanStep.id)
+    )
+    stmt = _org_scoped(stmt, principal)
+    if plan_id is not None:
+        stmt = stmt.where(models.TrainingPlan.id == plan_id)
+    if animal_id is not None:
+        stmt = stmt.where(models.TrainingPlan.animal_id == animal_id)
+    return stmt.order_by(models.TrainingPlan.id, models.PlanStep.order, models.PlanStep.id)
 
-def add_step_session_note(db: Session, step_id: int, note_data: schemas.StepSessionNoteCreate, user_id: int):
-    # Verify the step belongs to a plan for an animal in the user's organization
-    step = db.query(models.PlanStep).filter(models.PlanStep.id == step_id).first()
-    if not step:
-        return None
-    
-    plan = db.query(models.TrainingPlan).filter(models.TrainingPlan.id == step.plan_id).first()
-    if not plan:
-        return None
-    
-    animal = get_animal_by_id(db, plan.animal_id, user_id)
-    if not animal:
-        return None
-    
+def _step_progress_fields(estimated, is_complete, actual, note_count, first_performed, last_performed):
+    actual = actual or 0
+    percent_complete = overrun_sessions = None
+    if estimated:
+        percent_complete = 100.0 if is_complete else round(min(actual / estimated, 1) * 100, 1)
+        overrun_sessions = max(actual - estimated, 0)
+    elif is_complete:
+        percent_complete = 100.0
+    return {
+        "actual_sessions": actual,
+        "note_count": note_count or 0,
+        "first_performed_date": first_performed,
+        "last_performed_date": last_performed,
+        "estimated_sessions": estimated,
+        "percent_complete": percent_complete,
+        "overrun_sessions": overrun_sessions,
+    }
+
+def _plan_progress(plan_id: int, steps: list):
+    estimated = sum(step.estimated_sessions or 0 for step in steps)
+    steps_complete = sum(step.is_complete for step in steps)
+    first_dates = [step.first_performed_date for step in steps if step.first_performed_date]
+    last_dates = [step.last_performed_date for step in steps if step.last_performed_date]
+    # Session-weighted when steps carry estimates, otherwise the share of completed steps
+    percent_complete = None
+    if estimated:
+        done = sum(
+            step.estimated_sessions if step.is_complete else min(step.actual_sessions, step.estimated_sessions)
+            for step in steps if step.estimated_sessions
+        )
+        percent_complete = round(done / estimated * 100, 1)
+    elif steps:
+        percent_complete = round(steps_complete / len(steps) * 100, 1)
+    return schemas.PlanProgressOut(
+        plan_id=plan_id,
+        step_count=len(steps),
+        steps_complete=steps_complete,
+        estimated_sessions=estimated,
+        actual_sessions=sum(step.actual_sessions for step in steps),
+        note_count=sum(step.note_count for step in steps),
+        first_performed_date=min(first_dates, default=None),
+        last_performed_date=max(last_dates, default=None),
+        percent_complete=percent_complete,
+        overrun_sessions=sum(step.overrun_sessions or 0 for step in steps),
+        steps=steps,
+    )
+
+def plan_progress_result(rows):
+    plans = {}
+    for plan_id, step_id, estimated, is_complete, *totals in rows:
+        steps = plans.setdefault(plan_id, [])
+        if step_id is not None:
+            steps.append(schemas.PlanStepProgressOut(
+                step_id=step_id,
+                is_complete=bool(is_complete),
+                **_step_progress_fields(estimated, is_complete, *totals),
+            ))
+    return [_plan_progress(plan_id, steps) for plan_id, steps in plans.items()]
+
+def get_plan_progress(db: Session, principal: schemas.Principal, plan_id: int = None, animal_id: int = None):
+    return plan_progress_result(db.execute(select_plan_progress(principal, plan_id, animal_id)).all())
+
+def step_progress_delta(step_id: int, sessions: int = 0, notes: int = 0, first_performed=None, last_performed=None):
+    # Applied in SQL so concurrent note writes on the same step don't lose updates
+    progress = models.StepProgress.__table__.c
+    values = {
+        "actual_sessions": progress.actual_sessions + sessions,
+        "note_count": progress.note_count + notes,
+    }
+    if first_performed is not None:
+        values["first_performed_date"] = case(
+            (or_(progress.first_performed_date.is_(None), progress.first_performed_date > first_performed), first_performed),
+            else_=progress.first_performed_date,
+        )
+    if last_performed is not None:
+        values["last_performed_date"] = case(
+            (or_(progress.last_performed_date.is_(None), progress.last_performed_date < last_performed), last_performed),
+            else_=progress.last_performed_date,
+        )
+    return update(models.StepProgress.__table__).where(progress.step_id == step_id).values(**values)
+
+def recount_step_progress(step_ids=None, dialect_name: str = None):
+    """Statements rebuilding step_progress rows from the notes of step_ids (every step if None).
+
+    For given steps this is an upsert where the dialect has one, so two writers
+    recounting the same step don't collide on its primary key.
+    """
+    table = models.StepProgress.__table__
+    note = models.StepSessionNote
+    totals = (
+        select(
+            models.PlanStep.id,
+            func.coalesce(func.sum(note.session_count), 0),
+            func.count(note.id),
+            func.min(note.performed_date),
+            func.max(note.performed_date),
+        )
+        .outerjoin(note, note.step_id == models.PlanStep.id)
+        .group_by(models.PlanStep.id)
+    )
+    columns = ["step_id", "actual_sessions", "note_count", "first_performed_date", "last_performed_date"]
+    if step_ids is None:
+        return [delete(table), insert(table).from_select(columns, totals)]
+    totals = totals.where(models.PlanStep.id.in_(step_ids))
+    upsert = _upsert_insert(dialect_name)
+    if upsert is None:
+        return [delete(table).where(table.c.step_id.in_(step_ids)), insert(table).from_select(columns, totals)]
+    stmt = upsert(table).from_select(columns, totals)
+    return [stmt.on_conflict_do_update(
+        index_elements=[table.c.step_id], set_={name: stmt.excluded[name] for name in columns[1:]}
+    )]
+
+def _recount_progress(db: Session, step_ids):
+    db.flush()
+    for stmt in recount_step_progress(step_ids, db.bind.dialect.name):
+        db.execute(stmt)
+
+def _apply_progress_delta(db: Session, step_id: int, **delta):
+    # Steps without a progress row yet are counted from scratch
+    if db.execute(step_progress_delta(step_id, **delta)).rowcount == 0:
+        _recount_progress(db, [step_id])
+
+def add_note_to_step(db: Session, step: models.PlanStep, note_data: schemas.StepSessionNoteCreate, principal: schemas.Principal):
+    """Add a note with its progress delta and revision bumps, without committing."""
     db_note = models.StepSessionNote(
-        step_id=step_id,
+        step_id=step.id,
         note=note_data.note,
         session_count=note_data.session_count,
         performed_date=note_data.performed_date
     )
     db.add(db_note)
+    _apply_progress_delta(
+        db, step.id, sessions=note_data.session_count or 0, notes=1,
+        first_performed=note_data.performed_date, last_performed=note_data.performed_date,
+    )
+    _touch_plan(db, principal, step.plan_id, step_notes_revision_key(step.id))
+    return db_note
+
+def add_step_session_note(db: Session, step_id: int, note_data: schemas.StepSessionNoteCreate, principal: schemas.Principal):
+    step = get_step_for_user(db, step_id, principal)
+    if not step:
+        return None
+    db_note = add_note_to_step(db, step, note_data, principal)
     db.commit()
     db.refresh(db_note)
     return db_note
 
-def get_notes_for_step(db: Session, step_id: int, user_id: int):
-    # Verify the step belongs to a plan for an animal in the user's organization
-    step = db.query(models.PlanStep).filter(models.PlanStep.id == step_id).first()
-    if not step:
-        return []
-    
-    plan = db.query(models.TrainingPlan).filter(models.TrainingPlan.id == step.plan_id).first()
-    if not plan:
-        return []
-    
-    animal = get_animal_by_id(db, plan.animal_id, user_id)
-    if not animal:
-        return []
-    
-    return db.query(models.StepSessionNote).filter(models.StepSessionNote.step_id == step_id).order_by(models.StepSessionNote.timestamp.asc()).all()
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+# Columns a bulk-inserted note is identified by when its id comes back
+NOTE_CONTENT = ("step_id", "note", "session_count", "performed_date")
+
+def add_step_session_notes_bulk(db: Session, notes: list, principal: schemas.Principal, idempotency_key: str = None):
+    # Replaying a key returns the stored result instead of inserting again
+    if idempotency_key:
+        stored = db.get(models.IdempotencyKey, (principal.id, idempotency_key))
+        if stored:
+            return json.loads(stored.response)
+
+    # Authorize every referenced step with one query
+    step_ids = {item.step_id for item in notes}
+    allowed = dict(db.execute(
+        select(models.PlanStep.id, models.PlanStep.plan_id)
+        .join(models.PlanStep.plan)
+        .join(models.TrainingPlan.animal)
+        .where(
+            models.PlanStep.id.in_(step_ids),
+            models.Animal.organization_id == principal.organization_id,
+        )
+    ).all())
 
-def mark_step_complete(db: Session, step_id: int, user_id: int):
-    # Verify the step belongs to a plan for an animal in the user's organization
-    step = db.query(models.PlanStep).filter(models.PlanStep.id == step_id).first()
+    rows = [{column: getattr(item, column) for column in NOTE_CONTENT} for item in notes if item.step_id in allowed]
+    # A Core insert keeps every row in one batched statement. Ids are matched back by
+    # content rather than row order, which would cost one INSERT per note on some
+    # backends; notes with identical content are interchangeable, so any pairing is right
+    notes_table = models.StepSessionNote.__table__
+    content = [notes_table.c[column] for column in NOTE_CONTENT]
+    new_ids = {}
+    if rows:
+        for note_id, *values in db.execute(insert(notes_table).returning(notes_table.c.id, *content), rows):
+            new_ids.setdefault(tuple(values), []).append(note_id)
+        for ids in new_ids.values():
+            ids.sort(reverse=True)
+    per_step = {}
+    for row in rows:
+        totals = per_step.setdefault(row["step_id"], {"sessions": 0, "notes": 0, "dates": []})
+        totals["sessions"] += row["session_count"] or 0
+        totals["notes"] += 1
+        if row["performed_date"] is not None:
+            totals["dates"].append(row["performed_date"])
+    for step_id, totals in per_step.items():
+        _apply_progress_delta(
+            db, step_id, sessions=totals["sessions"], notes=totals["notes"],
+            first_performed=min(totals["dates"], default=None), last_performed=max(totals["dates"], default=None),
+        )
+    results = [
+        {"index": index, "step_id": item.step_id, "status": "created",
+         "id": new_ids[tuple(getattr(item, column) for column in NOTE_CONTENT)].pop()}
+        if item.step_id in allowed else
+        {"index": index, "step_id": item.step_id, "status": "not_found", "id": None}
+        for index, item in enumerate(notes)
+    ]
+    result = {"created": len(rows), "results": results}
+
+    if idempotency_key:
+        db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.user_id == principal.id,
+            models.IdempotencyKey.created_at < datetime.utcnow() - IDEMPOTENCY_KEY_TTL,
+        ).delete(synchronize_session=False)
+        db.add(models.IdempotencyKey(user_id=principal.id, key=idempotency_key, response=json.dumps(result)))
+    if rows:
+        bump_revisions(
+            db,
+            plans_revision_key(principal.organization_id),
+            *sorted({plan_revision_key(allowed[step_id]) for step_id in per_step}),
+            *sorted(step_notes_revision_key(step_id) for step_id in per_step),
+        )
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key won the race; return its result
+        db.rollback()
+        if not idempotency_key:
+            raise
+        stored = db.get(models.IdempotencyKey, (principal.id, idempotency_key))
+        return json.loads(stored.response)
+    return result
+
+def select_notes_for_step(step_id: int, principal: schemas.Principal, limit: int = None, after=None, fields=NOTE_FIELDS):
+    # Notes of a step outside the caller's organization simply don't match the join.
+    # after is a (timestamp, id) keyset position; oldest notes come first
+    stmt = (
+        select(*serialization.columns(models.StepSessionNote, fields))
+        .join(models.StepSessionNote.step)
+        .join(models.PlanStep.plan)
+        .join(models.TrainingPlan.animal)
+    )
+    stmt = _org_scoped(stmt, principal).where(
+        models.StepSessionNote.step_id == step_id
+    ).order_by(models.StepSessionNote.timestamp.asc(), models.StepSessionNote.id.asc())
+    if after is not None:
+        stmt = stmt.where(tuple_(models.StepSessionNote.timestamp, models.StepSessionNote.id) > tuple(after))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+def get_notes_for_step(db: Session, step_id: int, principal: schemas.Principal, limit: int = None, after=None, fields=NOTE_FIELDS):
+    return serialization.records(fields, db.execute(select_notes_for_step(step_id, principal, limit, after, fields)))
+
+def mark_step_complete(db: Session, step_id: int, principal: schemas.Principal):
+    step = get_step_for_user(db, step_id, principal)
     if not step:
         return None
     
-    plan = db.query(models.TrainingPlan).filter(models.TrainingPlan.id == step.plan_id).first()
-    if not plan:
-        return None
-    
-    animal = get_animal_by_id(db, plan.animal_id, user_id)
-    if not animal:
-        return None
-    
     step.is_complete = 1
+    _touch_plan(db, principal, step.plan_id)
     db.commit()
     db.refresh(step)
     return step
 
-def update_plan(db: Session, plan_id: int, plan_update: schemas.TrainingPlanUpdate, user_id: int):
-    plan = get_plan_with_steps(db, plan_id, user_id)
+def update_plan(db: Session, plan_id: int, plan_update: schemas.TrainingPlanUpdate, principal: schemas.Principal):
+    plan = get_plan_for_user(db, plan_id, principal)
     if not plan:
         return None
     for field, value in plan_update.dict(exclude_unset=True).items():
         setattr(plan, field, value)
+    _touch_plan(db, principal, plan.id)
     db.commit()
     db.refresh(plan)
     return plan
 
-def delete_plan(db: Session, plan_id: int, user_id: int):
-    plan = get_plan_with_steps(db, plan_id, user_id)
+def delete_plan(db: Session, plan_id: int, principal: schemas.Principal):
+    plan = get_plan_for_user(db, plan_id, principal)
     if not plan:
         return False
     db.delete(plan)
+    _touch_plan(db, principal, plan.id)
     db.commit()
     return True
 
-def update_step(db: Session, step_id: int, step_update: schemas.PlanStepUpdate, user_id: int):
-    # Verify the step belongs to a plan for an animal in the user's organization
-    step = db.query(models.PlanStep).filter(models.PlanStep.id == step_id).first()
+def update_step(db: Session, step_id: int, step_update: schemas.PlanStepUpdate, principal: schemas.Principal):
+    step = get_step_for_user(db, step_id, principal)
     if not step:
         return None
     
-    plan = db.query(models.TrainingPlan).filter(models.TrainingPlan.id == step.plan_id).first()
-    if not plan:
-        return None
-    
-    animal = get_animal_by_id(db, plan.animal_id, user_id)
-    if not animal:
-        return None
-    
     for field, value in step_update.dict(exclude_unset=True).items():
         setattr(step, field, value)
+    _touch_plan(db, principal, step.plan_id)
     db.commit()
     db.refresh(step)
     return step
 
-def delete_step(db: Session, step_id: int, user_id: int):
-    # Verify the step belongs to a plan for an animal in the user's organization
-    step = db.query(models.PlanStep).filter(models.PlanStep.id == step_id).first()
+def delete_step(db: Session, step_id: int, principal: schemas.Principal):
+    step = get_step_for_user(db, step_id, principal)
     if not step:
         return False
     
-    plan = db.query(models.TrainingPlan).filter(models.TrainingPlan.id == step.plan_id).first()
-    if not plan:
-        return False
-    
-    animal = get_animal_by_id(db, plan.animal_id, user_id)
-    if not animal:
-        return False
-    
     db.delete(step)
+    _touch_plan(db, principal, step.plan_id, step_notes_revision_key(step.id))
     db.commit()
     return True
 
-def update_session_note(db: Session, note_id: int, note_update: schemas.StepSessionNoteUpdate, user_id: int):
-    # Verify the note belongs to a step for a plan for an animal in the user's organization
-    note = db.query(models.StepSessionNote).filter(models.StepSessionNote.id == note_id).first()
-    if not note:
-        return None
-    
-    step = db.query(models.PlanStep).filter(models.PlanStep.id == note.step_id).first()
-    if not step:
-        return None
-    
-    plan = db.query(models.TrainingPlan).filter(models.TrainingPlan.id == step.plan_id).first()
-    if not plan:
+def edit_plan_steps(db: Session, plan_id: int, patch: schemas.PlanStepsPatch, principal: schemas.Principal):
+    """Apply a bulk step edit in one transaction; None if the plan isn't found.
+
+    Raises ValueError for step ids that aren't in the plan or are both deleted and edited.
+    """
+    # Authorize the plan and read its step positions with one query
+    rows = db.execute(_org_scoped(
+        select(models.TrainingPlan.id, models.PlanStep.id, models.PlanStep.order)
+        .join(models.TrainingPlan.animal)
+        .outerjoin(models.PlanStep, models.PlanStep.plan_id == models.TrainingPlan.id)
+        .where(models.TrainingPlan.id == plan_id),
+        principal,
+    )).all()
+    if not rows:
         return None
-    
-    animal = get_animal_by_id(db, plan.animal_id, user_id)
-    if not animal:
+    positions = {step_id: order for _, step_id, order in rows if step_id is not None}
+
+    deleted = set(patch.delete)
+    edits = {edit.id: edit.dict(exclude_unset=True, exclude={"id"}) for edit in patch.update}
+    ordered = patch.order or []
+    unknown = (deleted | set(edits) | set(ordered)) - set(positions)
+    if unknown:
+        raise ValueError(f"Steps not in this plan: {', '.join(map(str, sorted(unknown)))}")
+    conflicting = deleted & (set(edits) | set(ordered))
+    if conflicting:
+        raise ValueError(f"Steps both deleted and edited: {', '.join(map(str, sorted(conflicting)))}")
+    if len(set(ordered)) != len(ordered):
+        raise ValueError("Each step may appear in order only once")
+
+    if deleted:
+        step_ids = sorted(deleted)
+        # Core deletes skip the ORM cascades, so notes and progress rows are removed here
+        db.execute(delete(models.StepSessionNote.__table__).where(models.StepSessionNote.step_id.in_(step_ids)))
+        db.execute(delete(models.StepProgress.__table__).where(models.StepProgress.step_id.in_(step_ids)))
+        db.execute(delete(models.PlanStep.__table__).where(models.PlanStep.id.in_(step_ids)))
+        for step_id in step_ids:
+            del positions[step_id]
+
+    for step_id, values in edits.items():
+        if values.get("is_complete") is not None:
+            values["is_complete"] = int(values["is_complete"])
+        if values.get("order") is not None:
+            positions[step_id] = values["order"]
+
+    if patch.create:
+        # Ids come back with each step's order rather than in row order, which would
+        # cost one INSERT per step on some backends
+        steps_table = models.PlanStep.__table__
+        new_steps = db.execute(
+            insert(steps_table).returning(steps_table.c.id, steps_table.c.order),
+            [
+                {
+                    "plan_id": plan_id,
+                    "name": step.name,
+                    "description": step.description,
+                    "order": step.order,
+                    "estimated_sessions": step.estimated_sessions,
+                    "is_complete": 1 if step.is_complete else 0,
+                }
+                for step in patch.create
+            ],
+        ).all()
+        positions.update(new_steps)
+        db.execute(insert(models.StepProgress.__table__), [{"step_id": step_id} for step_id, _ in new_steps])
+
+    if ordered:
+        # The listed steps take the slots they hold between them, then every step is renumbered
+        sequence = sorted(positions, key=lambda step_id: (positions[step_id], step_id))
+        listed, slots = set(ordered), iter(ordered)
+        sequence = [next(slots) if step_id in listed else step_id for step_id in sequence]
+        for number, step_id in enumerate(sequence, 1):
+            if positions[step_id] != number:
+                edits.setdefault(step_id, {})["order"] = number
+
+    changes = [{"id": step_id, **values} for step_id, values in edits.items() if values]
+    if changes:
+        # Bulk UPDATE by primary key, batched per set of changed columns
+        db.execute(update(models.PlanStep), changes)
+    _touch_plan(db, principal, plan_id, *sorted(step_notes_revision_key(step_id) for step_id in deleted))
+    db.commit()
+    return True
+
+def update_session_note(db: Session, note_id: int, note_update: schemas.StepSessionNoteUpdate, principal: schemas.Principal):
+    note = get_note_for_user(db, note_id, principal)
+    if not note:
         return None
     
+    old_sessions, old_performed = note.session_count or 0, note.performed_date
     for field, value in note_update.dict(exclude_unset=True).items():
         setattr(note, field, value)
+    if note.performed_date != old_performed:
+        # The first/last dates can't be adjusted by a delta, so recount this step
+        _recount_progress(db, [note.step_id])
+    elif (note.session_count or 0) != old_sessions:
+        _apply_progress_delta(db, note.step_id, sessions=(note.session_count or 0) - old_sessions)
+    _touch_plan(db, principal, note.step.plan_id, step_notes_revision_key(note.step_id))
     db.commit()
     db.refresh(note)
     return note
 
-def delete_session_note(db: Session, note_id: int, user_id: int):
-    # Verify the note belongs to a step for a plan for an animal in the user's organization
-    note = db.query(models.StepSessionNote).filter(models.StepSessionNote.id == note_id).first()
+def delete_session_note(db: Session, note_id: int, principal: schemas.Principal):
+    note = get_note_for_user(db, note_id, principal)
     if not note:
         return False
     
-    step = db.query(models.PlanStep).filter(models.PlanStep.id == note.step_id).first()
-    if not step:
-        return False
-    
-    plan = db.query(models.TrainingPlan).filter(models.TrainingPlan.id == step.plan_id).first()
-    if not plan:
-        return False
-    
-    animal = get_animal_by_id(db, plan.animal_id, user_id)
-    if not animal:
-        return False
-    
     db.delete(note)
+    if note.performed_date is not None:
+        _recount_progress(db, [note.step_id])
+    else:
+        _apply_progress_delta(db, note.step_id, sessions=-(note.session_count or 0), notes=-1)
+    _touch_plan(db, principal, note.step.plan_id, step_notes_revision_key(note.step_id))
     db.commit()
     return True
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""Password hashing on a dedicated, size-bounded worker pool.
+
+bcrypt is deliberately slow and releases the GIL while it runs, so hashing on a
+small thread pool of its own keeps a burst of logins from occupying the
+threadpool every other route runs on. Work beyond ``HASH_QUEUE_LIMIT``
+in-flight calls is refused with ``HashingBusy`` (served as a 429) instead of
+queueing without bound.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", "2"))
+HASH_QUEUE_LIMIT = int(os.environ.get("HASH_QUEUE_LIMIT", "32"))
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+
+@functools.lru_cache(maxsize=None)
+def crypt_context():
+    """The passlib context, built on first use so importing the app doesn't load passlib."""
+    from passlib.context import CryptContext
+
+    # Pinning min and max rounds to the configured cost makes verify_and_update flag
+    # any hash made with a different cost, so it is rehashed on the next login
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=BCRYPT_ROUNDS,
+        bcrypt__min_rounds=BCRYPT_ROUNDS,
+        bcrypt__max_rounds=BCRYPT_ROUNDS,
+    )
+
+class HashingBusy(Exception):
+    """Raised when HASH_QUEUE_LIMIT hashing calls are already in flight."""
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hashing")
+_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+
+async def _run(function, *args):
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, function, *args)
+    finally:
+        _slots.release()
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password)
+
+def _hash(password: str) -> str:
+    return crypt_context().hash(password)
+
+def _verify_and_update(password: str, hashed_password: str = None):
+    if hashed_password is None:
+        # Spend the same time as a real check so unknown emails can't be told apart by latency
+        crypt_context().dummy_verify()
+        return False, None
+    return crypt_context().verify_and_update(password, hashed_password)
+
+async def verify_password(password: str, hashed_password: str = None):
+    """Return (valid, new_hash); new_hash is set when the stored hash should be replaced."""
+    return await _run(_verify_and_update, password, hashed_password)
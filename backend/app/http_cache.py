@@ -0,0 +1,35 @@
+"""Conditional GET support.
+
+ETags here are derived from revision counters (see ``crud.bump_revisions``) rather
+than from response bytes, so a matching ``If-None-Match`` can be answered with a 304
+before any payload is loaded or serialized.
+"""
+import hashlib
+import json
+from fastapi import Request, Response
+
+# Authenticated payloads: browsers may keep them but must revalidate every time
+CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison
+    return _opaque(etag) in {_opaque(tag) for tag in header.split(",")}
+
+def cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
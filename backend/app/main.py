@@ -1,12 +1,15 @@
-from .database import Base, engine
-from . import models
-from fastapi import FastAPI
+from .database import ASYNC_DB, async_engine, engine, pool_status
+from . import models, metrics, migrations, pagination, hashing, profiling, compression
+from .read_cache import read_cache
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from .routes import auth, plans, animals, plan_steps
+from fastapi.responses import JSONResponse, PlainTextResponse
+from .routes import auth, plans, animals, plan_steps, timeline, templates
 
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="TrainIt API", description="Animal Training Plan Tracker", version="1.0.0")
+app = FastAPI(
+    title="TrainIt API", description="Animal Training Plan Tracker", version="1.0.0",
+    default_response_class=profiling.TimedJSONResponse,
+)
 
 # Add CORS middleware
 app.add_middleware(
@@ -28,13 +31,66 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pagination.CURSOR_HEADER, "ETag", "Server-Timing"],
 )
 
+# br / zstd / gzip by Accept-Encoding; COMPRESSION_ENCODINGS= (empty) turns it off
+if compression.available_encodings():
+    app.add_middleware(compression.CompressionMiddleware)
+
+# Slow-query log, N+1 warnings and X-Profile / sampled Server-Timing breakdowns
+if profiling.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+    profiling.instrument_engine(engine)
+    if async_engine is not None:
+        profiling.instrument_engine(async_engine.sync_engine)
+
+# Outermost, so latency includes CORS handling; METRICS_ENABLED=0 removes it
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument_engine(engine)
+    if async_engine is not None:
+        metrics.instrument_engine(async_engine.sync_engine)
+
+@app.exception_handler(hashing.HashingBusy)
+async def hashing_busy_handler(request: Request, exc: hashing.HashingBusy):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Server is busy verifying passwords, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.on_event("startup")
+def prepare_schema():
+    # Not at import time, so tooling can import the app without touching the database
+    if migrations.MIGRATE_ON_STARTUP:
+        migrations.prepare_schema(engine)
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    # Pooled aiosqlite connections each hold a worker thread that would otherwise block exit
+    if async_engine is not None:
+        await async_engine.dispose()
+
 app.include_router(auth.router)
 app.include_router(plans.router)
 app.include_router(animals.router)
 app.include_router(plan_steps.router)
+app.include_router(timeline.router)
+app.include_router(templates.router)
 
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to TrainIt API - Animal Training Plan Tracker"}
\ No newline at end of file
+    return {"message": "Welcome to TrainIt API - Animal Training Plan Tracker"}
+
+@app.get("/metrics/pool")
+def read_pool_metrics():
+    return {"async_engine": ASYNC_DB, **pool_status()}
+
+@app.get("/metrics/cache")
+def read_cache_metrics():
+    return read_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return PlainTextResponse(metrics.render(pool_status()), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,183 @@
+"""Prometheus text-format metrics for HTTP requests, SQL statements and the pool.
+
+``MetricsMiddleware`` is a plain ASGI middleware: it times each request, labels it
+with the matched route template (not the raw path, to keep label cardinality
+bounded) and keeps a per-request SQL tally in a context variable that the engine
+events below add to. Context variables follow requests into the threadpool, so
+sync routes and crud calls are counted too.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from sqlalchemy import event
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _labels(self, labels) -> str:
+        if not labels:
+            return ""
+        pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+        return "{" + pairs + "}"
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{self._labels(labels)} {value}"
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items()]
+        for labels, (counts, total, count) in items:
+            base = self._labels(labels)[1:-1]
+            prefix = base + "," if base else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}'
+            yield f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}'
+            yield f"{self.name}_sum{self._labels(labels)} {total}"
+            yield f"{self.name}_count{self._labels(labels)} {count}"
+
+registry = []
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_duration = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests being served")
+db_statements = Counter("db_statements_total", "SQL statements executed while serving a route", ("route",))
+db_seconds = Counter("db_statement_seconds_total", "Time spent in SQL statements per route", ("route",))
+db_statements_per_request = Histogram(
+    "db_statements_per_request", "SQL statements per request", ("route",), buckets=STATEMENT_BUCKETS
+)
+db_seconds_per_request = Histogram("db_seconds_per_request", "SQL time per request", ("route",))
+
+# [statement count, statement seconds] for the request being served
+_request_sql = contextvars.ContextVar("request_sql", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    tally = _request_sql.get()
+    if tally is not None:
+        tally[0] += 1
+        tally[1] += time.perf_counter() - context._metrics_start
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        tally = [0, 0.0]
+        token = _request_sql.set(tally)
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            _request_sql.reset(token)
+            route = route_label(scope)
+            method = scope["method"]
+            http_requests.inc(method, route, str(status_code))
+            http_duration.observe(elapsed, method, route)
+            db_statements.inc(route, amount=tally[0])
+            db_seconds.inc(route, amount=tally[1])
+            db_statements_per_request.observe(tally[0], route)
+            db_seconds_per_request.observe(tally[1], route)
+
+POOL_COUNTERS = {"checkout_waits", "checkout_wait_seconds_total", "checkout_timeouts"}
+
+def render(pool_status: dict = None) -> str:
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    for name, value in (pool_status or {}).items():
+        kind = "counter" if name in POOL_COUNTERS else "gauge"
+        lines.append(f"# TYPE db_pool_{name} {kind}")
+        lines.append(f"db_pool_{name} {value}")
+    return "\n".join(lines) + "\n"
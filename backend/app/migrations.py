@@ -0,0 +1,117 @@
+"""Versioned schema migrations.
+
+``Base.metadata.create_all`` only creates missing tables, so changes to existing
+tables (new indexes, new columns) are applied here. Each migration runs once, in
+order, inside its own transaction and is recorded in ``schema_migrations``.
+Migrations must be safe to run against a database that ``create_all`` has just
+built from the current models.
+
+``prepare_schema`` does both and runs on application startup unless
+``DB_MIGRATE_ON_STARTUP=0``; deployments that skip it run
+``python -m backend.app.migrations`` before starting the server instead.
+"""
+import os
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from .database import Base
+
+MIGRATE_ON_STARTUP = os.environ.get("DB_MIGRATE_ON_STARTUP", "1").lower() in ("1", "true", "yes")
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+def _create_indexes(conn, *names):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in names:
+                index.create(conn, checkfirst=True)
+
+def _hot_filter_indexes(conn):
+    _create_indexes(
+        conn,
+        "ix_timelogs_user_id_timestamp",
+        "ix_animals_organization_id_id",
+        "ix_training_plans_animal_id",
+        "ix_plan_steps_plan_id_order",
+        "ix_step_session_notes_step_id_timestamp",
+    )
+
+def _add_column(conn, table_name, column_name, ddl):
+    if column_name not in {column["name"] for column in inspect(conn).get_columns(table_name)}:
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}"))
+
+def _user_token_version(conn):
+    _add_column(conn, "users", "token_version", "INTEGER NOT NULL DEFAULT 0")
+
+def _step_progress(conn):
+    # Frozen as of this migration: later changes to StepProgress or crud's recount
+    # must not change what it does to a legacy database
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS step_progress ("
+        " step_id INTEGER NOT NULL PRIMARY KEY REFERENCES plan_steps (id),"
+        " actual_sessions INTEGER NOT NULL,"
+        " note_count INTEGER NOT NULL,"
+        " first_performed_date DATE,"
+        " last_performed_date DATE)"
+    ))
+    conn.execute(text("DELETE FROM step_progress"))
+    conn.execute(text(
+        "INSERT INTO step_progress"
+        " (step_id, actual_sessions, note_count, first_performed_date, last_performed_date)"
+        " SELECT plan_steps.id, coalesce(sum(step_session_notes.session_count), 0),"
+        " count(step_session_notes.id), min(step_session_notes.performed_date),"
+        " max(step_session_notes.performed_date)"
+        " FROM plan_steps"
+        " LEFT OUTER JOIN step_session_notes ON step_session_notes.step_id = plan_steps.id"
+        " GROUP BY plan_steps.id"
+    ))
+
+MIGRATIONS = [
+    (1, "hot filter indexes", _hot_filter_indexes),
+    (2, "user token version", _user_token_version),
+    (3, "step progress backfill", _step_progress),
+]
+
+def migrate(engine):
+    """Apply every migration that has not been recorded yet; returns the versions applied."""
+    from . import models  # noqa: F401 - register every table on Base.metadata
+
+    migration_metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    ran = []
+    for version, name, upgrade in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            upgrade(conn)
+            conn.execute(schema_migrations.insert().values(version=version, name=name))
+        ran.append(version)
+    return ran
+
+def prepare_schema(engine):
+    """Create missing tables, then apply pending migrations; returns the versions applied."""
+    from . import models  # noqa: F401 - register every table on Base.metadata
+
+    # One table listing instead of create_all's per-table existence checks, so an
+    # up-to-date database costs a few queries on startup
+    with engine.connect() as conn:
+        existing = set(inspect(conn).get_table_names())
+    missing = [table for table in Base.metadata.sorted_tables if table.name not in existing]
+    if missing:
+        Base.metadata.create_all(bind=engine, tables=missing)
+    return migrate(engine)
+
+if __name__ == "__main__":
+    from .database import engine
+
+    applied = prepare_schema(engine)
+    print(f"applied migrations: {', '.join(map(str, applied))}" if applied else "schema is up to date")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Date, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Date, Text, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
@@ -18,6 +18,8 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    # Bumped to revoke every token issued before it (e.g. on password change)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     organization = relationship("Organization", back_populates="users")
     logs = relationship("TimeLog", back_populates="user")
     animals = relationship("Animal", back_populates="owner")
@@ -36,6 +38,7 @@ class Animal(Base):
     organization = relationship("Organization", back_populates="animals")
     logs = relationship("TimeLog", back_populates="animal")
     plans = relationship("TrainingPlan", back_populates="animal")
+    __table_args__ = (Index("ix_animals_organization_id_id", "organization_id", "id"),)
 
 class TrainingPlan(Base):
     __tablename__ = "training_plans"
@@ -50,6 +53,7 @@ class TrainingPlan(Base):
     animal_id = Column(Integer, ForeignKey("animals.id"), nullable=False)
     animal = relationship("Animal", back_populates="plans")
     steps = relationship("PlanStep", back_populates="plan", cascade="all, delete-orphan")
+    __table_args__ = (Index("ix_training_plans_animal_id", "animal_id"),)
 
 class PlanStep(Base):
     __tablename__ = "plan_steps"
@@ -60,8 +64,36 @@ class PlanStep(Base):
     estimated_sessions = Column(Integer, nullable=True)
     plan_id = Column(Integer, ForeignKey("training_plans.id"), nullable=False)
     plan = relationship("TrainingPlan", back_populates="steps")
-    session_notes = relationship("StepSessionNote", back_populates="step", cascade="all, delete-orphan")
+    session_notes = relationship("StepSessionNote", back_populates="step", cascade="all, delete-orphan", order_by="StepSessionNote.timestamp")
+    progress_totals = relationship("StepProgress", uselist=False, cascade="all, delete-orphan")
     is_complete = Column(Integer, default=0)  # 0 = not complete, 1 = complete
+    __table_args__ = (Index("ix_plan_steps_plan_id_order", "plan_id", "order"),)
+
+class PlanTemplate(Base):
+    # An organization's reusable protocol, copied into a TrainingPlan per animal
+    __tablename__ = "plan_templates"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    cue_description = Column(Text, nullable=True)
+    cue_video_url = Column(String, nullable=True)
+    criteria = Column(Text, nullable=True)
+    category = Column(String, nullable=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    steps = relationship("PlanTemplateStep", back_populates="template", cascade="all, delete-orphan", order_by="PlanTemplateStep.order")
+    __table_args__ = (Index("ix_plan_templates_organization_id", "organization_id"),)
+
+class PlanTemplateStep(Base):
+    __tablename__ = "plan_template_steps"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    order = Column(Integer, nullable=False)
+    estimated_sessions = Column(Integer, nullable=True)
+    template_id = Column(Integer, ForeignKey("plan_templates.id"), nullable=False)
+    template = relationship("PlanTemplate", back_populates="steps")
+    __table_args__ = (Index("ix_plan_template_steps_template_id_order", "template_id", "order"),)
 
 class TimeLog(Base):
     __tablename__ = "timelogs"
@@ -73,6 +105,7 @@ class TimeLog(Base):
     animal_id = Column(Integer, ForeignKey("animals.id"), nullable=True)
     user = relationship("User", back_populates="logs")
     animal = relationship("Animal", back_populates="logs")
+    __table_args__ = (Index("ix_timelogs_user_id_timestamp", "user_id", "timestamp"),)
 
 class StepSessionNote(Base):
     __tablename__ = "step_session_notes"
@@ -82,4 +115,28 @@ class StepSessionNote(Base):
     note = Column(Text, nullable=True)
     session_count = Column(Integer, nullable=True)
     performed_date = Column(Date, nullable=True)
-    step = relationship("PlanStep", back_populates="session_notes")
\ No newline at end of file
+    step = relationship("PlanStep", back_populates="session_notes")
+    __table_args__ = (Index("ix_step_session_notes_step_id_timestamp", "step_id", "timestamp"),)
+
+class StepProgress(Base):
+    # Session-note aggregates per step, kept current by the note write paths in crud
+    __tablename__ = "step_progress"
+    step_id = Column(Integer, ForeignKey("plan_steps.id"), primary_key=True)
+    actual_sessions = Column(Integer, nullable=False, default=0)
+    note_count = Column(Integer, nullable=False, default=0)
+    first_performed_date = Column(Date, nullable=True)
+    last_performed_date = Column(Date, nullable=True)
+
+class Revision(Base):
+    # Monotonic counters bumped by write paths; readers use them as cache keys and ETags
+    __tablename__ = "revisions"
+    key = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class IdempotencyKey(Base):
+    # Stored result of a bulk request so a retried sync with the same key is not applied twice
+    __tablename__ = "idempotency_keys"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String, primary_key=True)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,35 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, Response
+
+# Keyset pages return their rows unchanged and hand the cursor for the next page back in this header
+CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types):
+    """Decode a cursor into values of the given types (int, datetime); raises 400 if malformed."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(raw, list) or len(raw) != len(types):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(value) if kind is datetime else kind(value) for kind, value in zip(types, raw)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def split_page(rows: list, limit: int, key):
+    """Trim rows fetched with limit + 1; returns (rows, next-page cursor or None)."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(*key(rows[-1]))
+    return rows, None
+
+def paginate(response: Response, rows: list, limit: int, key):
+    """Trim rows fetched with limit + 1 and set the next-page cursor if there are more."""
+    rows, cursor = split_page(rows, limit, key)
+    if cursor:
+        response.headers[CURSOR_HEADER] = cursor
+    return rows
@@ -0,0 +1,148 @@
+"""Slow-query log, N+1 detection and opt-in per-request profiles.
+
+Every request gets a small state object in a context variable; engine hooks add
+each statement's time and shape (its SQL text, which already has placeholders)
+to it. From that:
+
+* statements slower than ``SLOW_QUERY_MS`` are logged with their route;
+* requests that run one statement shape ``N_PLUS_ONE_THRESHOLD`` times or more
+  are logged as likely N+1 patterns and counted in ``/metrics``;
+* requests sent with ``X-Profile: <PROFILE_TOKEN>``, or sampled at
+  ``PROFILE_SAMPLE_RATE``, get a ``Server-Timing`` header splitting the time into
+  SQL, response serialization and the rest of the handler, plus an INFO log line
+  with their most repeated statements.
+
+Profiles need PROFILE_TOKEN or a sample rate, so they are off unless configured;
+with every setting at 0 or empty, main.py leaves the middleware and hooks out.
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import random
+import time
+from collections import Counter
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))  # 0 disables
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", "5"))  # 0 disables
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER = b"x-profile"
+PROFILING_ENABLED = bool(SLOW_QUERY_MS or N_PLUS_ONE_THRESHOLD or PROFILE_TOKEN or PROFILE_SAMPLE_RATE)
+
+n_plus_one_requests = metrics.Counter(
+    "db_repeated_statement_requests_total", "Requests that repeated one statement shape past N_PLUS_ONE_THRESHOLD", ("route",)
+)
+
+class RequestProfile:
+    __slots__ = ("scope", "profiled", "sql_count", "sql_seconds", "serialize_seconds", "shapes")
+
+    def __init__(self, scope, profiled: bool):
+        self.scope = scope
+        self.profiled = profiled
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.shapes = Counter()
+
+_current = contextvars.ContextVar("request_profile", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._profile_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._profile_start
+    profile = _current.get()
+    if profile is not None:
+        profile.sql_count += 1
+        profile.sql_seconds += elapsed
+        profile.shapes[statement] += 1
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        route = metrics.route_label(profile.scope) if profile is not None else "<no request>"
+        logger.warning("slow query %.1f ms on %s: %s", elapsed * 1000, route, " ".join(statement.split()))
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+@contextlib.contextmanager
+def serializing():
+    """Count the time spent in the block as serialization on a profiled request."""
+    profile = _current.get()
+    if profile is None or not profile.profiled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serialize_seconds += time.perf_counter() - start
+
+class TimedJSONResponse(JSONResponse):
+    """The app's default response class: JSON rendering counts as serialization.
+
+    Response-model validation runs inside FastAPI's handler and counts as handler time.
+    """
+
+    def render(self, content) -> bytes:
+        with serializing():
+            return super().render(content)
+
+def _wants_profile(scope) -> bool:
+    if PROFILE_TOKEN:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER and value.decode("latin-1") == PROFILE_TOKEN:
+                return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+def server_timing(profile: RequestProfile, total_seconds: float) -> str:
+    handler = max(total_seconds - profile.sql_seconds - profile.serialize_seconds, 0.0)
+    return ", ".join([
+        f'sql;dur={profile.sql_seconds * 1000:.2f};desc="{profile.sql_count} statements"',
+        f"serialize;dur={profile.serialize_seconds * 1000:.2f}",
+        f"handler;dur={handler * 1000:.2f}",
+        f"total;dur={total_seconds * 1000:.2f}",
+    ])
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope, _wants_profile(scope))
+        token = _current.set(profile)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and profile.profiled:
+                timing = server_timing(profile, time.perf_counter() - start)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+                logger.info(
+                    "profile %s %s: %s; top statements: %s",
+                    scope["method"], metrics.route_label(scope), timing,
+                    [(count, " ".join(shape.split())[:120]) for shape, count in profile.shapes.most_common(3)],
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if N_PLUS_ONE_THRESHOLD and profile.shapes:
+                shape, count = profile.shapes.most_common(1)[0]
+                if count >= N_PLUS_ONE_THRESHOLD:
+                    route = metrics.route_label(scope)
+                    n_plus_one_requests.inc(route)
+                    logger.warning(
+                        "possible N+1 on %s %s: %d statements, one shape ran %dx: %s",
+                        scope["method"], route, profile.sql_count, count, " ".join(shape.split())[:300],
+                    )
@@ -0,0 +1,202 @@
+"""Organization-scoped cache for encoded read responses.
+
+Entries are keyed by a revision key (see ``crud.plans_revision_key`` and friends),
+that key's current generation and the query parameters. ``crud.bump_revisions``
+records the keys a write touches on its session; once the session commits, their
+generations move on and every entry cached under the old ones becomes unreachable
+and ages out through the TTL and LRU limits.
+
+``READ_CACHE_BACKEND=memory`` (the default) keeps everything in-process, which is
+only coherent for a single worker. ``READ_CACHE_BACKEND=redis`` shares entries and
+generations between workers through ``READ_CACHE_URL`` and needs the ``redis``
+package. ``off`` disables caching.
+
+Invalidation runs after the write has committed, so a backend error there is
+logged rather than raised; entries under the old generation then live out their TTL.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+READ_CACHE_BACKEND = os.environ.get("READ_CACHE_BACKEND", "memory").lower()
+READ_CACHE_URL = os.environ.get("READ_CACHE_URL", "redis://localhost:6379/0")
+READ_CACHE_TTL = float(os.environ.get("READ_CACHE_TTL", "60"))
+READ_CACHE_SIZE = int(os.environ.get("READ_CACHE_SIZE", "2048"))
+
+class MemoryBackend:
+    name = "memory"
+    blocking = False
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._values = cache.TTLCache(maxsize=maxsize, ttl=ttl)
+        # Generations of recently used keys, as many as there are entries. Every advance
+        # hands out a new number and a key seen for the first time starts at the floor,
+        # which moves up to the newest number whenever a key is evicted, so an evicted
+        # key never lands back on a generation it had older entries under
+        self._generations = OrderedDict()
+        self._maxsize = maxsize
+        self._latest = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        return self._values.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._values.set(key, value, ttl=ttl)
+
+    def generation(self, key: str) -> int:
+        with self._lock:
+            generation = self._generations.get(key)
+            if generation is None:
+                generation = self._generations[key] = self._floor
+                self._evict()
+            self._generations.move_to_end(key)
+            return generation
+
+    def advance(self, keys):
+        with self._lock:
+            for key in keys:
+                self._latest += 1
+                self._generations[key] = self._latest
+                self._generations.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        while len(self._generations) > self._maxsize:
+            self._generations.popitem(last=False)
+            self._floor = self._latest
+
+class RedisBackend:
+    name = "redis"
+    blocking = True
+
+    def __init__(self, url: str = READ_CACHE_URL, client=None):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url)
+        self._client = client
+
+    def get(self, key: str):
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._client.set(key, value, ex=max(int(ttl), 1))
+
+    def generation(self, key: str) -> int:
+        return int(self._client.get(f"gen:{key}") or 0)
+
+    def advance(self, keys):
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            pipe.incr(f"gen:{key}")
+        pipe.execute()
+
+class ReadCache:
+    def __init__(self, backend=None, ttl: float = READ_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._stats = {}
+        self._lock = threading.Lock()
+        # Invalidations handed to the executor from the event loop and not yet applied
+        self._pending = set()
+
+    def _count(self, resource: str, outcome: str):
+        with self._lock:
+            counts = self._stats.setdefault(resource, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def _lookup(self, revision_key: str, params):
+        digest = hashlib.sha1(json.dumps(params, default=str).encode()).hexdigest()[:16]
+        key = f"rc:{revision_key}:{self.backend.generation(revision_key)}:{digest}"
+        return key, self.backend.get(key)
+
+    async def get_or_load(self, resource: str, revision_key: str, params, load):
+        """Return the cached bytes for (revision_key, params), or await load() and cache what it returns.
+
+        Entries are stored and served as the encoded bytes load produced, so a hit is
+        neither decoded nor re-encoded.
+        """
+        if self.backend is None:
+            return await load()
+        if self.backend.blocking:
+            # This process's own writes are applied before it reads, as they are in memory
+            if self._pending:
+                await asyncio.wait(list(self._pending))
+            key, cached = await run_in_threadpool(self._lookup, revision_key, params)
+        else:
+            key, cached = self._lookup(revision_key, params)
+        if cached is not None:
+            self._count(resource, "hits")
+            return cached
+        self._count(resource, "misses")
+        payload = await load()
+        # A write that commits while loading has already advanced the generation,
+        # so this entry is stored under a key nobody will read again
+        if self.backend.blocking:
+            await run_in_threadpool(self.backend.set, key, payload, self.ttl)
+        else:
+            self.backend.set(key, payload, self.ttl)
+        return payload
+
+    def invalidate(self, keys):
+        if self.backend is None or not keys:
+            return
+        keys = sorted(keys)
+        if self.backend.blocking:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            # AsyncSession commits on the event loop; keep the network round trip off it
+            if loop is not None:
+                future = loop.run_in_executor(None, self._advance, keys)
+                self._pending.add(future)
+                future.add_done_callback(self._pending.discard)
+                return
+        self._advance(keys)
+
+    def _advance(self, keys):
+        try:
+            self.backend.advance(keys)
+        except Exception:
+            logger.exception("read cache invalidation failed for %s", keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            resources = {
+                name: {
+                    **counts,
+                    "hit_ratio": counts["hits"] / (counts["hits"] + counts["misses"]),
+                }
+                for name, counts in self._stats.items()
+            }
+        return {"backend": self.backend.name if self.backend else "off", "ttl": self.ttl, "resources": resources}
+
+def _backend_from_env():
+    if READ_CACHE_BACKEND in ("off", "none", "0") or READ_CACHE_SIZE <= 0 or READ_CACHE_TTL <= 0:
+        return None
+    if READ_CACHE_BACKEND == "redis":
+        return RedisBackend(READ_CACHE_URL)
+    return MemoryBackend(READ_CACHE_SIZE, READ_CACHE_TTL)
+
+read_cache = ReadCache(_backend_from_env())
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    read_cache.invalidate(session.info.pop("revision_keys", None))
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session):
+    session.info.pop("revision_keys", None)
@@ -1,50 +1,74 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List
-from .. import schemas, crud, database, auth_utils
+from typing import List, Optional
+from .. import schemas, crud, async_crud, database, auth_utils, pagination, http_cache, serialization
+from ..read_cache import read_cache
 
 router = APIRouter(prefix="/animals", tags=["animals"])
 
 @router.post("/", response_model=schemas.AnimalOut)
 def create_animal(
     animal: schemas.AnimalCreate,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
     """Create a new animal for the current user"""
-    return crud.create_animal(db, animal, current_user.id)
+    return crud.create_animal(db, animal, current_user)
 
 @router.get("/", response_model=List[schemas.AnimalOut])
-def list_animals(
+async def list_animals(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
-    db: Session = Depends(database.get_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    fields: tuple = Depends(serialization.sparse_fields(schemas.AnimalOut)),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_session)
 ):
     """Get all animals for the current user"""
-    return crud.get_user_animals(db, user_id=current_user.id, skip=skip, limit=limit)
+    revision = await async_crud.run(db, crud.get_revision, crud.animals_revision_key(current_user.organization_id))
+    etag = http_cache.make_etag("animals", current_user.organization_id, skip, limit, cursor, fields, revision)
+    if http_cache.etag_matches(request, etag):
+        return http_cache.not_modified(etag)
+    after_id = pagination.decode_cursor(cursor, int)[0] if cursor else None
+
+    async def load():
+        animals = await async_crud.run(db, crud.get_user_animals, principal=current_user, skip=skip, limit=limit + 1, after_id=after_id, fields=fields)
+        page, next_cursor = pagination.split_page(animals, limit, lambda animal: (animal["id"],))
+        # The next-page cursor is cached with the page, on a line before the body
+        return (next_cursor or "").encode() + b"\n" + serialization.dumps(page)
+
+    entry = await read_cache.get_or_load(
+        "animals", crud.animals_revision_key(current_user.organization_id), (skip, limit, after_id, fields), load
+    )
+    next_cursor, _, body = entry.partition(b"\n")
+    headers = http_cache.cache_headers(etag)
+    if next_cursor:
+        headers[pagination.CURSOR_HEADER] = next_cursor.decode()
+    return serialization.json_response(body, headers)
 
 @router.get("/{animal_id}", response_model=schemas.AnimalOut)
-def get_animal(
+async def get_animal(
     animal_id: int,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
-    db: Session = Depends(database.get_db)
+    fields: tuple = Depends(serialization.sparse_fields(schemas.AnimalOut)),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_session)
 ):
     """Get a specific animal by ID"""
-    animal = crud.get_animal_by_id(db, animal_id, current_user.id)
+    animal = await async_crud.run(db, crud.get_animal_record, animal_id, current_user, fields=fields)
     if not animal:
         raise HTTPException(status_code=404, detail="Animal not found")
-    return animal
+    return serialization.json_response(serialization.dumps(animal))
 
 @router.put("/{animal_id}", response_model=schemas.AnimalOut)
 def update_animal(
     animal_id: int,
     animal_update: schemas.AnimalCreate,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
     """Update an animal"""
-    updated_animal = crud.update_animal(db, animal_id, current_user.id, animal_update)
+    updated_animal = crud.update_animal(db, animal_id, current_user, animal_update)
     if not updated_animal:
         raise HTTPException(status_code=404, detail="Animal not found")
     return updated_animal
@@ -52,11 +76,11 @@ def update_animal(
 @router.delete("/{animal_id}")
 def delete_animal(
     animal_id: int,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
     """Delete an animal"""
-    success = crud.delete_animal(db, animal_id, current_user.id)
+    success = crud.delete_animal(db, animal_id, current_user)
     if not success:
         raise HTTPException(status_code=404, detail="Animal not found")
     return {"message": "Animal deleted successfully"} 
\ No newline at end of file
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import math
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
-from .. import schemas, crud, database, auth_utils
+from starlette.concurrency import run_in_threadpool
+from .. import schemas, crud, database, auth_utils, hashing
 from datetime import timedelta
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -12,28 +14,72 @@ def get_db():
     finally:
         db.close()
 
+def _token_response(user):
+    access_token_expires = timedelta(minutes=auth_utils.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = auth_utils.create_access_token(
+        data=auth_utils.token_claims(user), expires_delta=access_token_expires
+    )
+    return {"access_token": access_token, "token_type": "bearer"}
+
+def _create_user(db: Session, user: schemas.UserCreate, hashed_password: str):
+    # Serialize in the worker thread so the organization lazy-load doesn't block the event loop
+    return schemas.UserOut.model_validate(crud.create_user(db, user, hashed_password))
+
+# Signup and login are async so bcrypt runs on the bounded hashing pool rather than pinning a threadpool worker
 @router.post("/signup", response_model=schemas.UserOut)
-def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+async def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(crud.get_user_by_email, db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db, user)
+    hashed_password = await hashing.hash_password(user.password)
+    return await run_in_threadpool(_create_user, db, user, hashed_password)
 
 @router.post("/login", response_model=schemas.Token)
-def login(user_credentials: schemas.UserLogin, db: Session = Depends(database.get_db)):
-    user = crud.authenticate_user(db, user_credentials.email, user_credentials.password)
-    if not user:
+async def login(user_credentials: schemas.UserLogin, request: Request, db: Session = Depends(database.get_db)):
+    client = auth_utils.client_address(request)
+    retry_after = auth_utils.login_retry_after(user_credentials.email, client)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    user = await run_in_threadpool(crud.get_user_by_email, db, email=user_credentials.email)
+    valid, new_hash = await hashing.verify_password(
+        user_credentials.password, user.hashed_password if user else None
+    )
+    if not user or not valid:
+        auth_utils.record_login_failure(user_credentials.email, client)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=auth_utils.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth_utils.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+    auth_utils.clear_login_failures(user_credentials.email, client)
+    if new_hash:
+        await run_in_threadpool(crud.update_password_hash, db, user, new_hash)
+    return _token_response(user)
+
+@router.put("/password", response_model=schemas.Token)
+async def change_password(
+    password_change: schemas.PasswordChange,
+    principal: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_db),
+):
+    # Every token issued before the change is revoked; the response carries a fresh one
+    user = await run_in_threadpool(crud.get_user_by_email, db, email=principal.email)
+    valid, _ = await hashing.verify_password(
+        password_change.current_password, user.hashed_password if user else None
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    if not user or not valid:
+        raise HTTPException(status_code=400, detail="Current password is incorrect")
+    hashed_password = await hashing.hash_password(password_change.new_password)
+    user = await run_in_threadpool(crud.change_password, db, user, hashed_password)
+    # The mapper event already dropped the cached principal before commit; drop it again in
+    # case a concurrent request re-cached the pre-commit row in between
+    auth_utils.invalidate_principal(user.email)
+    return _token_response(user)
 
 @router.get("/me", response_model=schemas.UserOut)
 def read_users_me(current_user: schemas.UserOut = Depends(auth_utils.get_current_user)):
-    return current_user
\ No newline at end of file
+    return current_user
@@ -1,49 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
-from typing import List
-from .. import schemas, crud, database, auth_utils
+from typing import List, Optional
+from datetime import datetime
+from .. import schemas, crud, async_crud, database, auth_utils, pagination, http_cache, serialization
 
 router = APIRouter(prefix="/steps", tags=["plan steps"])
 
 @router.post("/{step_id}/notes", response_model=schemas.StepSessionNoteOut)
-def add_note_to_step(
+async def add_note_to_step(
     step_id: int,
     note: schemas.StepSessionNoteCreate,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
-    db: Session = Depends(database.get_db)
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_session)
 ):
-    result = crud.add_step_session_note(db, step_id, note, current_user.id)
+    result = await async_crud.run(db, crud.add_step_session_note, step_id, note, current_user)
     if not result:
         raise HTTPException(status_code=404, detail="Step not found or not in your organization")
-    return schemas.StepSessionNoteOut.model_validate(result)
+    return result
+
+@router.post("/notes/bulk", response_model=schemas.StepSessionNoteBulkOut)
+def add_notes_bulk(
+    payload: schemas.StepSessionNoteBulkCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_db)
+):
+    """Add many session notes across steps in one transaction; retries with the same Idempotency-Key replay the first result"""
+    return crud.add_step_session_notes_bulk(db, payload.notes, current_user, idempotency_key=idempotency_key)
 
 @router.get("/{step_id}/notes", response_model=List[schemas.StepSessionNoteOut])
-def list_notes_for_step(
+async def list_notes_for_step(
     step_id: int,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
-    db: Session = Depends(database.get_db)
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; omit to return every note"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    fields: tuple = Depends(serialization.sparse_fields(schemas.StepSessionNoteOut)),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_session)
 ):
-    return crud.get_notes_for_step(db, step_id, current_user.id)
+    headers = {}
+    revision = await async_crud.run(db, crud.get_step_notes_revision, step_id, current_user)
+    if revision is not None:
+        etag = http_cache.make_etag("notes", step_id, limit, cursor, fields, revision)
+        if http_cache.etag_matches(request, etag):
+            return http_cache.not_modified(etag)
+        headers.update(http_cache.cache_headers(etag))
+    after = pagination.decode_cursor(cursor, datetime, int) if cursor else None
+    if limit is None:
+        notes = await async_crud.run(db, crud.get_notes_for_step, step_id, current_user, after=after, fields=fields)
+    else:
+        # The cursor needs each note's timestamp even when the client didn't ask for it
+        selected = fields if "timestamp" in fields else (*fields, "timestamp")
+        notes = await async_crud.run(
+            db, crud.get_notes_for_step, step_id, current_user, limit=limit + 1, after=after, fields=selected
+        )
+        notes, next_cursor = pagination.split_page(notes, limit, lambda note: (note["timestamp"], note["id"]))
+        if next_cursor:
+            headers[pagination.CURSOR_HEADER] = next_cursor
+        if selected is not fields:
+            for note in notes:
+                del note["timestamp"]
+    return serialization.json_response(serialization.dumps(notes), headers)
 
 @router.post("/{step_id}/complete", response_model=schemas.PlanStepOut)
 def mark_step_complete(
     step_id: int,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
-    result = crud.mark_step_complete(db, step_id, current_user.id)
+    result = crud.mark_step_complete(db, step_id, current_user)
     if not result:
         raise HTTPException(status_code=404, detail="Step not found or not in your organization")
-    return schemas.PlanStepOut.model_validate(result)
+    return result
 
 @router.put("/{step_id}", response_model=schemas.PlanStepOut)
 def update_step(
     step_id: int,
     step_update: schemas.PlanStepUpdate,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
-    updated_step = crud.update_step(db, step_id, step_update, current_user.id)
+    updated_step = crud.update_step(db, step_id, step_update, current_user)
     if not updated_step:
         raise HTTPException(status_code=404, detail="Step not found or not in your organization")
     return updated_step
@@ -51,10 +88,10 @@ def update_step(
 @router.delete("/{step_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_step(
     step_id: int,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
-    success = crud.delete_step(db, step_id, current_user.id)
+    success = crud.delete_step(db, step_id, current_user)
     if not success:
         raise HTTPException(status_code=404, detail="Step not found or not in your organization")
     return None
@@ -63,10 +100,10 @@ def delete_step(
 def update_session_note(
     note_id: int,
     note_update: schemas.StepSessionNoteUpdate,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
-    updated_note = crud.update_session_note(db, note_id, note_update, current_user.id)
+    updated_note = crud.update_session_note(db, note_id, note_update, current_user)
     if not updated_note:
         raise HTTPException(status_code=404, detail="Session note not found or not in your organization")
     return updated_note
@@ -74,10 +111,10 @@ def update_session_note(
 @router.delete("/notes/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_session_note(
     note_id: int,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
-    success = crud.delete_session_note(db, note_id, current_user.id)
+    success = crud.delete_session_note(db, note_id, current_user)
     if not success:
         raise HTTPException(status_code=404, detail="Session note not found or not in your organization")
     return None 
\ No newline at end of file
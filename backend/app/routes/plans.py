@@ -1,10 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from .. import schemas, crud, database, auth_utils
+from typing import List, Optional, Union
+from datetime import date, datetime
+from .. import schemas, crud, async_crud, database, auth_utils, pagination, timelog_io, http_cache, serialization
+from ..read_cache import read_cache
 
 router = APIRouter(prefix="/plans", tags=["training plans"])
 
+PLAN_INCLUDES = {"steps", "notes", "progress"}
+plan_fields = serialization.sparse_fields(schemas.TrainingPlanOut, exclude={"steps"})
+
+def parse_include(include: Optional[str] = Query(None, description="Comma-separated extras to embed: steps, notes, progress")):
+    includes = {"steps"}
+    if include:
+        requested = {part.strip() for part in include.split(",") if part.strip()}
+        unknown = requested - PLAN_INCLUDES
+        if unknown:
+            raise HTTPException(status_code=422, detail=f"Unknown include: {', '.join(sorted(unknown))}")
+        includes |= requested
+    return includes
+
 @router.get("/", summary="List all plans (placeholder)")
 def list_plans():
     return {"message": "Plans route placeholder"}
@@ -13,80 +29,180 @@ def list_plans():
 def create_plan_for_animal(
     animal_id: int,
     plan: schemas.TrainingPlanCreate,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
-    result = crud.create_plan_with_steps(db, animal_id, plan, current_user.id)
+    result = crud.create_plan_with_steps(db, animal_id, plan, current_user)
     if not result:
         raise HTTPException(status_code=404, detail="Animal not found or not in your organization")
     return result
 
-@router.get("/animal/{animal_id}", response_model=List[schemas.TrainingPlanOut])
-def get_plans_for_animal(
+@router.get("/animal/{animal_id}", response_model=List[schemas.TrainingPlanTreeOut], response_model_exclude_unset=True)
+async def get_plans_for_animal(
     animal_id: int,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
-    db: Session = Depends(database.get_db)
+    includes: set = Depends(parse_include),
+    fields: tuple = Depends(plan_fields),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_session)
 ):
-    return crud.get_plans_for_animal(db, animal_id, current_user.id)
+    async def load():
+        trees = await async_crud.run(db, crud.get_plan_tree, current_user, include=includes, animal_id=animal_id, fields=fields)
+        return serialization.dumps(trees)
 
-@router.get("/{plan_id}", response_model=schemas.TrainingPlanOut)
-def get_plan(
-    plan_id: int,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
-    db: Session = Depends(database.get_db)
+    body = await read_cache.get_or_load(
+        "plans_for_animal", crud.plans_revision_key(current_user.organization_id), (animal_id, sorted(includes), fields), load
+    )
+    return serialization.json_response(body)
+
+@router.get("/animal/{animal_id}/progress", response_model=List[schemas.PlanProgressOut])
+async def get_animal_progress(
+    animal_id: int,
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_session)
 ):
-    plan = crud.get_plan_with_steps(db, plan_id, current_user.id)
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan not found or not in your organization")
-    return plan
+    """Estimated vs actual sessions for every plan of an animal"""
+    return await async_crud.run(db, crud.get_plan_progress, current_user, animal_id=animal_id)
 
 @router.post("/log", response_model=schemas.TimeLogOut)
-def log_training_session(
+async def log_training_session(
     log: schemas.TimeLogCreate,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
-    db: Session = Depends(database.get_db)
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_session)
 ):
     """Log a training session for the current user"""
-    return crud.create_log(db, user_id=current_user.id, log=log)
+    return await async_crud.run(db, crud.create_log, principal=current_user, log=log)
 
-@router.get("/stats")
-def get_user_stats(
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
-    db: Session = Depends(database.get_db)
+@router.get("/stats", response_model=schemas.StatsOut, response_model_exclude_unset=True)
+async def get_user_stats(
+    group_by: Optional[str] = Query(None, pattern="^(" + "|".join(crud.STATS_GROUPS) + ")$"),
+    date_from: Optional[Union[datetime, date]] = Query(None, alias="from"),
+    date_to: Optional[Union[datetime, date]] = Query(None, alias="to", description="Exclusive for a datetime; a date includes that whole day"),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_session)
 ):
-    """Get training statistics for the current user"""
-    return crud.get_user_stats(db, user_id=current_user.id)
+    """Get training statistics for the current user, optionally grouped by animal or period"""
+    return await async_crud.run(
+        db, crud.get_user_stats, principal=current_user, group_by=group_by, date_from=date_from, date_to=date_to
+    )
 
 @router.get("/logs")
 def get_user_logs(
+    response: Response,
     skip: int = 0,
     limit: int = 10,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
     """Get recent training logs for the current user"""
-    logs = crud.get_user_logs(db, user_id=current_user.id, skip=skip, limit=limit)
-    return logs
+    before = pagination.decode_cursor(cursor, datetime, int) if cursor else None
+    logs = crud.get_user_logs(db, principal=current_user, skip=skip, limit=limit + 1, before=before)
+    return pagination.paginate(response, logs, limit, lambda log: (log.timestamp, log.id))
+
+@router.post("/logs/import", response_model=schemas.TimeLogImportOut)
+def import_logs(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Defaults to the file extension or content type"),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_db)
+):
+    """Bulk-import training logs from a CSV or NDJSON upload"""
+    fmt = format or timelog_io.guess_format(file.filename, file.content_type)
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Upload a .csv or .ndjson file or pass format")
+    return crud.import_logs(db, current_user, timelog_io.iter_records(file.file, fmt))
+
+@router.get("/logs/export")
+def export_logs(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal)
+):
+    """Stream every training log for the current user as CSV or NDJSON"""
+    def stream():
+        # The stream outlives the request dependencies, so it owns its session
+        db = database.SessionLocal()
+        try:
+            yield timelog_io.header(format)
+            for rows in crud.iter_user_log_batches(db, current_user):
+                yield timelog_io.encode_rows(rows, format)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=timelog_io.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="training-logs.{format}"'},
+    )
+
+@router.get("/{plan_id}", response_model=schemas.TrainingPlanTreeOut, response_model_exclude_unset=True)
+async def get_plan(
+    plan_id: int,
+    request: Request,
+    includes: set = Depends(parse_include),
+    fields: tuple = Depends(plan_fields),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_session)
+):
+    # Polls with a current ETag are answered from the revision lookup alone
+    revision = await async_crud.run(db, crud.get_plan_revision, plan_id, current_user)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Plan not found or not in your organization")
+    etag = http_cache.make_etag("plan", plan_id, sorted(includes), fields, revision)
+    if http_cache.etag_matches(request, etag):
+        return http_cache.not_modified(etag)
+    trees = await async_crud.run(db, crud.get_plan_tree, current_user, include=includes, plan_id=plan_id, fields=fields)
+    if not trees:
+        raise HTTPException(status_code=404, detail="Plan not found or not in your organization")
+    return serialization.json_response(serialization.dumps(trees[0]), http_cache.cache_headers(etag))
+
+@router.get("/{plan_id}/progress", response_model=schemas.PlanProgressOut)
+async def get_plan_progress(
+    plan_id: int,
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_session)
+):
+    """Estimated vs actual sessions per step of a plan, with plan totals"""
+    progress = await async_crud.run(db, crud.get_plan_progress, current_user, plan_id=plan_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Plan not found or not in your organization")
+    return progress[0]
 
 @router.put("/{plan_id}", response_model=schemas.TrainingPlanOut)
 def update_plan(
     plan_id: int,
     plan_update: schemas.TrainingPlanUpdate,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
-    updated_plan = crud.update_plan(db, plan_id, plan_update, current_user.id)
+    updated_plan = crud.update_plan(db, plan_id, plan_update, current_user)
     if not updated_plan:
         raise HTTPException(status_code=404, detail="Plan not found or not in your organization")
     return updated_plan
 
+@router.patch("/{plan_id}/steps", response_model=schemas.TrainingPlanTreeOut, response_model_exclude_unset=True)
+def edit_plan_steps(
+    plan_id: int,
+    patch: schemas.PlanStepsPatch,
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_db)
+):
+    """Delete, edit, add and reorder a plan's steps in one transaction; returns the plan with its steps"""
+    try:
+        edited = crud.edit_plan_steps(db, plan_id, patch, current_user)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    if not edited:
+        raise HTTPException(status_code=404, detail="Plan not found or not in your organization")
+    trees = crud.get_plan_tree(db, current_user, plan_id=plan_id)
+    return serialization.json_response(serialization.dumps(trees[0]))
+
 @router.delete("/{plan_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_plan(
     plan_id: int,
-    current_user: schemas.UserOut = Depends(auth_utils.get_current_user),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
     db: Session = Depends(database.get_db)
 ):
-    success = crud.delete_plan(db, plan_id, current_user.id)
+    success = crud.delete_plan(db, plan_id, current_user)
     if not success:
         raise HTTPException(status_code=404, detail="Plan not found or not in your organization")
     return None
\ No newline at end of file
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+from .. import schemas, crud, database, auth_utils
+
+router = APIRouter(prefix="/templates", tags=["plan templates"])
+
+@router.post("/", response_model=schemas.PlanTemplateOut)
+def create_template(
+    template: schemas.PlanTemplateCreate,
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_db)
+):
+    """Create a plan template for the current user's organization"""
+    return crud.create_plan_template(db, template, current_user)
+
+@router.get("/", response_model=List[schemas.PlanTemplateOut])
+def list_templates(
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_db)
+):
+    return crud.get_plan_templates(db, current_user)
+
+@router.get("/{template_id}", response_model=schemas.PlanTemplateOut)
+def get_template(
+    template_id: int,
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_db)
+):
+    template = crud.get_plan_template_for_user(db, template_id, current_user)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found or not in your organization")
+    return template
+
+@router.delete("/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_template(
+    template_id: int,
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_db)
+):
+    """Delete a template; plans created from it are kept"""
+    if not crud.delete_plan_template(db, template_id, current_user):
+        raise HTTPException(status_code=404, detail="Template not found or not in your organization")
+    return None
+
+@router.post("/{template_id}/apply", response_model=schemas.PlanTemplateApplyOut)
+def apply_template(
+    template_id: int,
+    request: schemas.PlanTemplateApply,
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_db)
+):
+    """Create a plan from the template for each animal in one transaction; animals outside the organization are reported as not_found"""
+    result = crud.apply_plan_template(db, template_id, request, current_user)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Template not found or not in your organization")
+    return result
@@ -0,0 +1,35 @@
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.orm import Session
+from .. import schemas, crud, async_crud, database, auth_utils, http_cache
+from ..read_cache import read_cache
+
+router = APIRouter(prefix="/timeline", tags=["timeline"])
+
+@router.get("/", response_model=schemas.TimelineOut)
+async def get_timeline(
+    request: Request,
+    bucket: str = Query("week", pattern="^(" + "|".join(crud.TIMELINE_BUCKETS) + ")$"),
+    animal_id: Optional[int] = None,
+    plan_id: Optional[int] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    current_user: schemas.Principal = Depends(auth_utils.get_current_principal),
+    db: Session = Depends(database.get_session)
+):
+    """Step spans and bucketed session totals for the organization, one animal or one plan"""
+    revision_key = crud.plans_revision_key(current_user.organization_id)
+    revision = await async_crud.run(db, crud.get_revision, revision_key)
+    params = (bucket, animal_id, plan_id, date_from, date_to)
+    etag = http_cache.make_etag("timeline", current_user.organization_id, *params, revision)
+    if http_cache.etag_matches(request, etag):
+        return http_cache.not_modified(etag)
+
+    async def load():
+        timeline = await async_crud.run(db, crud.get_timeline, current_user, bucket, animal_id, plan_id, date_from, date_to)
+        return schemas.TimelineOut.model_validate(timeline).model_dump_json().encode()
+
+    # The stored revision is part of the key too, so an entry outlives a lost invalidation only until the next write
+    body = await read_cache.get_or_load("timeline", revision_key, (*params, revision), load)
+    return Response(content=body, media_type="application/json", headers=http_cache.cache_headers(etag))
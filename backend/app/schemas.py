@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime, date
 from typing import List, Optional
 
@@ -30,6 +30,18 @@ class TimeLogOut(BaseModel):
     class Config:
         from_attributes = True
 
+class TimeLogImport(TimeLogCreate):
+    timestamp: Optional[datetime] = None
+
+class TimeLogImportError(BaseModel):
+    line: int
+    error: str
+
+class TimeLogImportOut(BaseModel):
+    imported: int
+    rejected: int
+    errors: List[TimeLogImportError]
+
 class AnimalCreate(BaseModel):
     name: str
     species: str
@@ -59,6 +71,10 @@ class UserLogin(BaseModel):
     email: str
     password: str
 
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str
+
 class UserOut(BaseModel):
     id: int
     email: str
@@ -74,6 +90,32 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
+    organization_id: Optional[int] = None
+    token_version: int = 0
+
+class Principal(BaseModel):
+    """The authenticated caller, resolved once per request and passed into crud."""
+    id: int
+    email: str
+    organization_id: int
+    token_version: int = 0
+
+    class Config:
+        from_attributes = True
+
+class StatsGroupOut(BaseModel):
+    animal_id: Optional[int] = None
+    period: Optional[str] = None
+    sessions: int
+    total_time: float
+
+class StatsOut(BaseModel):
+    total_sessions: int
+    total_time: float
+    this_week_time: float
+    group_by: Optional[str] = None
+    groups: Optional[List[StatsGroupOut]] = None
 
 class PlanStepCreate(BaseModel):
     name: str
@@ -118,6 +160,53 @@ class TrainingPlanOut(BaseModel):
     class Config:
         from_attributes = True
 
+class PlanTemplateStepCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+    order: int
+    estimated_sessions: Optional[int] = None
+
+class PlanTemplateStepOut(PlanTemplateStepCreate):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+class PlanTemplateCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+    cue_description: Optional[str] = None
+    cue_video_url: Optional[str] = None
+    criteria: Optional[str] = None
+    category: Optional[str] = None
+    steps: List[PlanTemplateStepCreate] = Field(..., max_length=500)
+
+class PlanTemplateOut(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    cue_description: Optional[str] = None
+    cue_video_url: Optional[str] = None
+    criteria: Optional[str] = None
+    category: Optional[str] = None
+    steps: List[PlanTemplateStepOut]
+
+    class Config:
+        from_attributes = True
+
+class PlanTemplateApply(BaseModel):
+    animal_ids: List[int] = Field(..., min_length=1, max_length=1000)
+    started_date: Optional[date] = None
+
+class PlanTemplateApplyResult(BaseModel):
+    animal_id: int
+    status: str  # "created" or "not_found"
+    plan_id: Optional[int] = None
+
+class PlanTemplateApplyOut(BaseModel):
+    created: int
+    results: List[PlanTemplateApplyResult]
+
 class StepSessionNoteCreate(BaseModel):
     note: Optional[str] = None
     session_count: Optional[int] = None
@@ -134,6 +223,85 @@ class StepSessionNoteOut(BaseModel):
     class Config:
         from_attributes = True
 
+class StepSessionNoteBulkItem(StepSessionNoteCreate):
+    step_id: int
+
+class StepSessionNoteBulkCreate(BaseModel):
+    notes: List[StepSessionNoteBulkItem] = Field(..., min_length=1, max_length=1000)
+
+class StepSessionNoteBulkResult(BaseModel):
+    index: int
+    step_id: int
+    status: str  # "created" or "not_found"
+    id: Optional[int] = None
+
+class StepSessionNoteBulkOut(BaseModel):
+    created: int
+    results: List[StepSessionNoteBulkResult]
+
+class StepProgressOut(BaseModel):
+    actual_sessions: int = 0
+    note_count: int = 0
+    first_performed_date: Optional[date] = None
+    last_performed_date: Optional[date] = None
+    estimated_sessions: Optional[int] = None
+    percent_complete: Optional[float] = None
+    overrun_sessions: Optional[int] = None
+
+class PlanStepProgressOut(StepProgressOut):
+    step_id: int
+    is_complete: bool
+
+class PlanProgressOut(BaseModel):
+    plan_id: int
+    step_count: int
+    steps_complete: int
+    estimated_sessions: int
+    actual_sessions: int
+    note_count: int
+    first_performed_date: Optional[date] = None
+    last_performed_date: Optional[date] = None
+    percent_complete: Optional[float] = None
+    overrun_sessions: int
+    steps: List[PlanStepProgressOut]
+
+class PlanStepTreeOut(PlanStepOut):
+    notes: Optional[List[StepSessionNoteOut]] = None
+    progress: Optional[StepProgressOut] = None
+
+class TrainingPlanTreeOut(TrainingPlanOut):
+    steps: List[PlanStepTreeOut]
+
+class TimelinePlansOut(BaseModel):
+    id: List[int]
+    name: List[str]
+    animal_id: List[int]
+    started_date: List[Optional[date]]
+
+class TimelineStepsOut(BaseModel):
+    id: List[int]
+    plan_id: List[int]
+    name: List[str]
+    order: List[int]
+    estimated_sessions: List[Optional[int]]
+    is_complete: List[bool]
+    start: List[Optional[date]]
+    end: List[Optional[date]]
+
+class TimelineSessionsOut(BaseModel):
+    step: List[int]
+    bucket: List[int]
+    sessions: List[int]
+    notes: List[int]
+
+class TimelineOut(BaseModel):
+    """Gantt data in columns; ``sessions`` rows index into ``steps`` and ``buckets``."""
+    bucket: str
+    buckets: List[str]
+    plans: TimelinePlansOut
+    steps: TimelineStepsOut
+    sessions: TimelineSessionsOut
+
 class TrainingPlanUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
@@ -150,6 +318,24 @@ class PlanStepUpdate(BaseModel):
     estimated_sessions: Optional[int] = None
     is_complete: Optional[bool] = None
 
+class PlanStepEdit(BaseModel):
+    # Omitted fields are left as they are; an explicit null is a 422 for the columns that can't be null
+    id: int
+    name: str = None
+    description: Optional[str] = None
+    order: int = None
+    estimated_sessions: Optional[int] = None
+    is_complete: bool = None
+
+class PlanStepsPatch(BaseModel):
+    # Applied in one transaction: deletes, then edits and new steps, then the ordering.
+    # order lists existing step ids; they swap among the positions they currently hold
+    # and the plan's steps are then renumbered 1..n
+    update: List[PlanStepEdit] = Field([], max_length=1000)
+    create: List[PlanStepCreate] = Field([], max_length=1000)
+    delete: List[int] = Field([], max_length=1000)
+    order: Optional[List[int]] = Field(None, max_length=1000)
+
 class StepSessionNoteUpdate(BaseModel):
     note: Optional[str] = None
     session_count: Optional[int] = None
@@ -0,0 +1,64 @@
+"""Direct JSON encoding for large read responses.
+
+Routes that return ORM objects pay for Pydantic validation of every row and then
+FastAPI's generic encoder. The list and tree reads instead select only the columns
+their response schema declares, build plain dicts and encode them here once, with
+orjson when it is installed (``pip install orjson``) and the stdlib otherwise. The
+schemas stay on the routes as ``response_model`` for the OpenAPI docs.
+"""
+import json
+from datetime import date, datetime
+from typing import Optional
+from fastapi import HTTPException, Query, Response
+from . import profiling
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value) -> bytes:
+    """Encode dicts, lists, scalars, dates and datetimes the way Pydantic's JSON mode does."""
+    with profiling.serializing():
+        if orjson is not None:
+            return orjson.dumps(value)
+        return json.dumps(value, default=_default, separators=(",", ":")).encode()
+
+def json_response(body: bytes, headers: dict = None, status_code: int = 200) -> Response:
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+def fields(schema, exclude=()) -> list:
+    """Field names a response schema declares, in order."""
+    return [name for name in schema.model_fields if name not in exclude]
+
+def records(names, rows) -> list:
+    return [dict(zip(names, row)) for row in rows]
+
+def columns(model, names) -> list:
+    """The model columns for a list of response field names, for column-only selects."""
+    return [getattr(model, name) for name in names]
+
+def sparse_fields(schema, exclude=(), always=("id",)):
+    """Dependency reading a fields= query parameter into the schema fields to return.
+
+    Fields come back in schema order and always include ``always``; without the
+    parameter every field is returned. Unknown names are a 422.
+    """
+    available = fields(schema, exclude)
+    description = f"Comma-separated fields to return ({', '.join(available)}); omit for all"
+
+    def parse(fields: Optional[str] = Query(None, description=description)):
+        if not fields:
+            return tuple(available)
+        requested = {part.strip() for part in fields.split(",") if part.strip()}
+        unknown = requested - set(available)
+        if unknown:
+            raise HTTPException(status_code=422, detail=f"Unknown field: {', '.join(sorted(unknown))}")
+        return tuple(name for name in available if name in requested or name in always)
+
+    return parse
@@ -0,0 +1,50 @@
+"""Streaming CSV / NDJSON encoding for bulk TimeLog import and export."""
+import codecs
+import csv
+import io
+import json
+from datetime import datetime
+
+FORMATS = ("csv", "ndjson")
+COLUMNS = ("id", "timestamp", "duration", "notes", "animal_id")
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+def guess_format(filename: str = None, content_type: str = None):
+    name = (filename or "").lower()
+    if name.endswith(".csv") or (content_type or "").startswith("text/csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in (content_type or ""):
+        return "ndjson"
+    return None
+
+def iter_records(binary_file, fmt: str):
+    """Yield (line_number, dict) pairs from an uploaded file without reading it all into memory."""
+    lines = codecs.iterdecode(binary_file, "utf-8-sig")
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            # Empty CSV cells mean "not provided"
+            yield reader.line_num, {key: value for key, value in record.items() if key and value not in ("", None)}
+        return
+    for line_number, line in enumerate(lines, start=1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as exc:
+                yield line_number, exc
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def encode_rows(rows, fmt: str) -> str:
+    """Encode a batch of (id, timestamp, duration, notes, animal_id) rows."""
+    if fmt == "ndjson":
+        return "".join(json.dumps(dict(zip(COLUMNS, map(_plain, row)))) + "\n" for row in rows)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_plain(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+def header(fmt: str) -> str:
+    if fmt == "csv":
+        return ",".join(COLUMNS) + "\r\n"
+    return ""
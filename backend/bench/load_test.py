@@ -0,0 +1,314 @@
+"""Concurrent load test of the main API flows against a running server.
+
+    python backend/bench/seed.py --orgs 20                      # once, writes bench_seed.json
+    python backend/bench/load_test.py --clients 16 --duration 30 --out results.json
+    python backend/bench/load_test.py --compare results.json    # later, prints the deltas
+    python backend/bench/load_test.py --login-storm 8 --compare results.json
+
+Each client is a thread with its own keep-alive connection that logs in as one of
+the seeded users and then loops over a weighted mix of flows: list animals, fetch
+an animal's plan tree, read a plan, add a session note and read stats. Latencies
+are recorded per route template, so the report lines up with ``/metrics``.
+
+--login-storm N adds N threads that post wrong passwords for the seeded emails from
+addresses spread over 192.0.2.0/24; their requests are reported separately as
+``POST /auth/login (storm)``. Compared against a run without it, the other
+endpoints' latency shows what a credential-stuffing burst costs everyone else.
+Each client sends its own X-Forwarded-For, so the server must trust the load
+test's address in TRUSTED_PROXY_IPS (--spawn sets it) for per-client throttling.
+
+--spawn starts ``uvicorn backend.app.main:app`` against DATABASE_URL for the run;
+otherwise --url must point at a running server. Seed and serve with the same
+BCRYPT_ROUNDS, or the first logins will rehash every password.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import date, datetime, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# flow name -> relative weight
+FLOWS = {
+    "list_animals": 25,
+    "plan_tree": 30,
+    "plan": 15,
+    "add_note": 15,
+    "stats": 10,
+    "login": 5,
+}
+
+class Client:
+    def __init__(self, url: str, timeout: float):
+        parsed = urllib.parse.urlsplit(url)
+        connection = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        self._connect = lambda: connection(parsed.hostname, parsed.port, timeout=timeout)
+        self.conn = self._connect()
+        self.headers = {}
+
+    def request(self, method: str, path: str, body=None):
+        headers = dict(self.headers)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        for attempt in (1, 2):
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # A dropped keep-alive connection is retried once on a fresh one
+                self.conn.close()
+                self.conn = self._connect()
+                if attempt == 2:
+                    raise
+        return response.status, json.loads(data) if data and response.getheader("Content-Type", "").startswith("application/json") else None
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def record(self, route: str, seconds: float, ok: bool):
+        with self.lock:
+            self.samples.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+def percentile(ordered, fraction: float) -> float:
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def timed(recorder: Recorder, client: Client, route: str, method: str, path: str, body=None, expect=(200,)):
+    start = time.perf_counter()
+    try:
+        status, data = client.request(method, path, body)
+    except (http.client.HTTPException, OSError):
+        status, data = None, None
+    recorder.record(route, time.perf_counter() - start, status in expect)
+    return status, data
+
+class VirtualUser:
+    def __init__(self, client: Client, recorder: Recorder, rng: random.Random, email: str, password: str):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.credentials = {"email": email, "password": password}
+        self.animals = []
+        self.plans = {}  # plan id -> step ids
+
+    def login(self):
+        status, data = timed(self.recorder, self.client, "POST /auth/login", "POST", "/auth/login", self.credentials)
+        if status == 200:
+            self.client.headers["Authorization"] = "Bearer " + data["access_token"]
+        return status == 200
+
+    def list_animals(self):
+        status, data = timed(self.recorder, self.client, "GET /animals/", "GET", "/animals/?limit=100")
+        if status == 200 and data:
+            self.animals = [animal["id"] for animal in data]
+
+    def plan_tree(self):
+        if not self.animals:
+            return self.list_animals()
+        animal_id = self.rng.choice(self.animals)
+        status, data = timed(
+            self.recorder, self.client, "GET /plans/animal/{animal_id}", "GET", f"/plans/animal/{animal_id}?include=progress"
+        )
+        if status == 200:
+            for plan in data:
+                self.plans[plan["id"]] = [step["id"] for step in plan.get("steps", [])]
+
+    def plan(self):
+        if not self.plans:
+            return self.plan_tree()
+        plan_id = self.rng.choice(list(self.plans))
+        timed(self.recorder, self.client, "GET /plans/{plan_id}", "GET", f"/plans/{plan_id}?include=notes")
+
+    def add_note(self):
+        steps = [step for steps in self.plans.values() for step in steps]
+        if not steps:
+            return self.plan_tree()
+        note = {"note": "load test", "session_count": 1, "performed_date": date.today().isoformat()}
+        timed(self.recorder, self.client, "POST /steps/{step_id}/notes", "POST", f"/steps/{self.rng.choice(steps)}/notes", note)
+
+    def stats(self):
+        group_by = self.rng.choice(["", "?group_by=animal", "?group_by=week"])
+        timed(self.recorder, self.client, "GET /plans/stats", "GET", "/plans/stats" + group_by)
+
+def run_client(url, timeout, recorder, rng, email, password, deadline, ready, address):
+    client = Client(url, timeout)
+    client.headers["X-Forwarded-For"] = address
+    user = VirtualUser(client, recorder, rng, email, password)
+    user.login()
+    user.list_animals()
+    ready.wait()
+    flows, weights = zip(*FLOWS.items())
+    while time.monotonic() < deadline[0]:
+        getattr(user, rng.choices(flows, weights)[0])()
+    client.conn.close()
+
+def run_storm(url, timeout, recorder, rng, emails, deadline, ready):
+    client = Client(url, timeout)
+    ready.wait()
+    while time.monotonic() < deadline[0]:
+        client.headers["X-Forwarded-For"] = f"192.0.2.{rng.randrange(256)}"
+        credentials = {"email": rng.choice(emails), "password": "wrong password"}
+        timed(recorder, client, "POST /auth/login (storm)", "POST", "/auth/login", credentials, expect=(401, 429))
+    client.conn.close()
+
+def summarize(recorder: Recorder, seconds: float) -> dict:
+    endpoints = {}
+    for route, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        endpoints[route] = {
+            "requests": len(ordered),
+            "errors": recorder.errors.get(route, 0),
+            "rps": round(len(ordered) / seconds, 2),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {"total_requests": total, "total_rps": round(total / seconds, 2), "endpoints": endpoints}
+
+def print_report(summary: dict, baseline: dict = None):
+    print(f"{'endpoint':34} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, stats in summary["endpoints"].items():
+        line = (f"{route:34} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>8.1f} "
+                f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+        before = (baseline or {}).get("endpoints", {}).get(route)
+        if before:
+            line += "  " + ", ".join(
+                f"{key} {(stats[key] - before[key]) / before[key] * 100:+.0f}%"
+                for key in ("rps", "p50_ms", "p95_ms", "p99_ms") if before[key]
+            )
+        print(line)
+    print(f"total: {summary['total_requests']} requests, {summary['total_rps']:.1f} req/s")
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def spawn_server(url: str):
+    port = urllib.parse.urlsplit(url).port or 8000
+    # Clients are told apart by their X-Forwarded-For, as behind a real proxy
+    env = {"TRUSTED_PROXY_IPS": "127.0.0.1", **os.environ}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    for _ in range(100):
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise SystemExit("server did not start")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn on --url's port for the run")
+    parser.add_argument("--manifest", default="bench_seed.json", help="logins written by seed.py")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of unmeasured load first")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--login-storm", type=int, default=0, metavar="N", help="threads posting failed logins meanwhile")
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--compare", help="results JSON of an earlier run to diff against")
+    args = parser.parse_args()
+
+    with open(args.manifest) as fh:
+        manifest = json.load(fh)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+
+    server = spawn_server(args.url) if args.spawn else None
+    try:
+        # Whether the server runs the asyncio engine (DB_ASYNC), so sync and async runs can be told apart
+        probe = Client(args.url, args.timeout)
+        db_async = (probe.request("GET", "/metrics/pool")[1] or {}).get("async_engine")
+        probe.conn.close()
+        rng = random.Random(args.seed)
+        emails = rng.sample(manifest["emails"], min(args.clients, len(manifest["emails"])))
+        recorder = Recorder()
+        ready = threading.Event()
+        deadline = [float("inf")]
+        threads = [
+            threading.Thread(
+                target=run_client,
+                args=(args.url, args.timeout, recorder, random.Random(args.seed + i),
+                      emails[i % len(emails)], manifest["password"], deadline, ready, f"10.0.{i // 256}.{i % 256}"),
+                daemon=True,
+            )
+            for i in range(args.clients)
+        ]
+        threads += [
+            threading.Thread(
+                target=run_storm,
+                args=(args.url, args.timeout, recorder, random.Random(-args.seed - i), manifest["emails"], deadline, ready),
+                daemon=True,
+            )
+            for i in range(args.login_storm)
+        ]
+        for thread in threads:
+            thread.start()
+        ready.set()
+        deadline[0] = time.monotonic() + args.warmup + args.duration
+        time.sleep(args.warmup)
+        # Drop the logins and warmup traffic so they don't skew the measured window
+        with recorder.lock:
+            recorder.samples, recorder.errors = {}, {}
+        start = time.monotonic()
+        for thread in threads:
+            thread.join()
+        summary = summarize(recorder, time.monotonic() - start)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(f"DB_ASYNC: {'on' if db_async else 'off'}" + (f" (baseline: {'on' if baseline.get('config', {}).get('db_async') else 'off'})" if baseline else ""))
+    print_report(summary, baseline)
+    if args.out:
+        result = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "config": {
+                **{key: getattr(args, key) for key in ("url", "clients", "duration", "warmup", "seed", "login_storm")},
+                "db_async": db_async,
+            },
+            "dataset": manifest.get("counts"),
+            **summary,
+        }
+        with open(args.out, "w") as fh:
+            json.dump(result, fh, indent=2)
+        print(f"results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Measure what MetricsMiddleware and the SQL statement hooks add per request.
+
+Runs without a server or database file:
+
+    python backend/bench/metrics_overhead.py [requests]
+
+The middleware is timed around a no-op ASGI app, so the numbers are its own cost;
+the SQL hooks are timed on an in-memory SQLite engine running ``SELECT 1``.
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from backend.app import metrics  # noqa: E402
+
+class _Route:
+    path = "/animals/"
+
+async def endpoint(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"[]"})
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def send(message):
+    pass
+
+async def drive(app, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        scope = {"type": "http", "method": "GET", "path": "/animals/"}
+        await app(scope, receive, send)
+    return time.perf_counter() - start
+
+def time_statements(engine, statements: int) -> float:
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for _ in range(statements):
+            conn.execute(text("SELECT 1"))
+        return time.perf_counter() - start
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    bare = asyncio.run(drive(endpoint, requests))
+    wrapped = asyncio.run(drive(metrics.MetricsMiddleware(endpoint), requests))
+    print(f"middleware: off {bare / requests * 1e6:.2f} us/request, "
+          f"on {wrapped / requests * 1e6:.2f} us/request, "
+          f"overhead {(wrapped - bare) / requests * 1e6:.2f} us/request")
+
+    plain = create_engine("sqlite://")
+    hooked = create_engine("sqlite://")
+    metrics.instrument_engine(hooked)
+    token = metrics._request_sql.set([0, 0.0])
+    try:
+        off = time_statements(plain, requests)
+        on = time_statements(hooked, requests)
+    finally:
+        metrics._request_sql.reset(token)
+    print(f"sql hooks:  off {off / requests * 1e6:.2f} us/statement, "
+          f"on {on / requests * 1e6:.2f} us/statement, "
+          f"overhead {(on - off) / requests * 1e6:.2f} us/statement")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Fill a database with synthetic organizations for load testing.
+
+    DATABASE_URL=sqlite:///./bench.db python backend/bench/seed.py --orgs 20 --seed 1
+
+Rows go in through bulk INSERT ... RETURNING batches rather than the API, so
+seeding thousands of animals takes seconds. Sizes are skewed the way real data
+is: a few large organizations and many small ones, most plans short, notes
+concentrated on the earlier (worked through) steps and time logs weighted toward
+recent weeks. The same --seed gives the same data.
+
+Every user gets the password given by --password (hashed once). The logins are
+written to a manifest, which ``load_test.py`` reads to pick its clients.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from sqlalchemy import insert, select  # noqa: E402
+from backend.app import crud, hashing, migrations, models  # noqa: E402
+from backend.app.database import engine  # noqa: E402
+
+SPECIES = ["dog"] * 6 + ["cat"] * 2 + ["horse", "parrot", "rabbit", "dolphin"]
+SEXES = ["Male", "Female", "Unknown"]
+CATEGORIES = ["husbandry", "behavior", "enrichment", "medical", "agility", None]
+SKILLS = ["Target", "Station", "Recall", "Crate", "Scale", "Nail trim", "Mouth open", "Leash walk", "Retrieve", "Settle"]
+
+def skewed(rng: random.Random, mean: float, minimum: int = 0, cap: int = None) -> int:
+    """Long-tailed count (lognormal) averaging roughly mean."""
+    value = int(rng.lognormvariate(0, 0.9) * mean / 1.5)
+    value = max(minimum, value)
+    return min(value, cap) if cap is not None else value
+
+def insert_returning_ids(conn, model, rows):
+    if not rows:
+        return []
+    stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+    return list(conn.execute(stmt, rows).scalars())
+
+def seed_org(conn, rng: random.Random, index: int, args, hashed_password: str, today: date):
+    scale = rng.paretovariate(1.5)  # a few organizations are several times the typical size
+    org_id = insert_returning_ids(conn, models.Organization, [
+        {"name": f"{args.prefix}-org-{index}", "description": "Synthetic benchmark organization"}
+    ])[0]
+
+    user_count = max(1, min(int(args.users * scale), args.users * 10))
+    emails = [f"user{u}@{args.prefix}-org-{index}.test" for u in range(user_count)]
+    user_ids = insert_returning_ids(conn, models.User, [
+        {"email": email, "hashed_password": hashed_password, "organization_id": org_id} for email in emails
+    ])
+
+    animal_count = max(1, int(args.animals * scale))
+    animal_ids = insert_returning_ids(conn, models.Animal, [
+        {
+            "name": f"Animal {index}-{a}",
+            "species": rng.choice(SPECIES),
+            "sex": rng.choice(SEXES),
+            "age": rng.randint(0, 25),
+            "location": f"Barn {rng.randint(1, 8)}",
+            "owner_id": rng.choice(user_ids),
+            "organization_id": org_id,
+        }
+        for a in range(animal_count)
+    ])
+
+    plan_rows = []
+    for animal_id in animal_ids:
+        for p in range(skewed(rng, args.plans, cap=args.plans * 8)):
+            plan_rows.append({
+                "name": f"{rng.choice(SKILLS)} plan {p}",
+                "description": "Shape the behavior in small approximations",
+                "criteria": "Three clean repetitions in a row",
+                "category": rng.choice(CATEGORIES),
+                "started_date": today - timedelta(days=rng.randint(0, 540)),
+                "animal_id": animal_id,
+            })
+    plan_ids = insert_returning_ids(conn, models.TrainingPlan, plan_rows)
+
+    step_rows, step_started = [], []
+    for plan_id, plan in zip(plan_ids, plan_rows):
+        steps = skewed(rng, args.steps, minimum=1, cap=args.steps * 5)
+        done = rng.randint(0, steps)  # steps before this one are complete
+        for order in range(1, steps + 1):
+            step_rows.append({
+                "name": f"Step {order}",
+                "description": "Reinforce on criteria, raise difficulty gradually",
+                "order": order,
+                "estimated_sessions": rng.choice([None, 2, 3, 5, 8, 13]),
+                "plan_id": plan_id,
+                "is_complete": 1 if order <= done else 0,
+            })
+            # Completed and current steps have been worked on; later ones mostly not
+            step_started.append((plan["started_date"], order <= done + 1))
+    step_ids = insert_returning_ids(conn, models.PlanStep, step_rows)
+
+    note_rows = []
+    for step_id, (started, worked) in zip(step_ids, step_started):
+        count = skewed(rng, args.notes, cap=args.notes * 10) if worked else int(rng.random() < 0.05)
+        span = max((today - started).days, 1)
+        for _ in range(count):
+            performed = started + timedelta(days=rng.randint(0, span))
+            note_rows.append({
+                "step_id": step_id,
+                "timestamp": datetime.combine(performed, datetime.min.time()) + timedelta(hours=rng.randint(7, 18)),
+                "note": rng.choice(["Good focus", "Distracted today", "Needed a lower criterion", None]),
+                "session_count": rng.choice([None, 1, 1, 1, 2, 3]),
+                "performed_date": performed if rng.random() < 0.9 else None,
+            })
+    for start in range(0, len(note_rows), args.batch):
+        conn.execute(insert(models.StepSessionNote), note_rows[start:start + args.batch])
+
+    log_rows = []
+    for user_id in user_ids:
+        for _ in range(skewed(rng, args.logs)):
+            # Exponential age: most logs are from the last few weeks
+            age = min(rng.expovariate(1 / 45), 730)
+            log_rows.append({
+                "duration": round(rng.uniform(5, 90), 1),
+                "timestamp": datetime.utcnow() - timedelta(days=age),
+                "notes": rng.choice([None, "Short session", "Worked on duration"]),
+                "user_id": user_id,
+                "animal_id": rng.choice(animal_ids) if rng.random() < 0.85 else None,
+            })
+    for start in range(0, len(log_rows), args.batch):
+        conn.execute(insert(models.TimeLog), log_rows[start:start + args.batch])
+
+    counts = {
+        "users": len(user_ids), "animals": len(animal_ids), "plans": len(plan_ids),
+        "steps": len(step_ids), "notes": len(note_rows), "timelogs": len(log_rows),
+    }
+    return emails, counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--orgs", type=int, default=10)
+    parser.add_argument("--users", type=int, default=3, help="typical users per organization")
+    parser.add_argument("--animals", type=int, default=25, help="typical animals per organization")
+    parser.add_argument("--plans", type=float, default=3, help="mean plans per animal")
+    parser.add_argument("--steps", type=float, default=6, help="mean steps per plan")
+    parser.add_argument("--notes", type=float, default=6, help="mean notes per worked step")
+    parser.add_argument("--logs", type=float, default=80, help="mean time logs per user")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--prefix", default="bench", help="organization names are <prefix>-org-<n>")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--batch", type=int, default=5000, help="rows per INSERT batch for notes and logs")
+    parser.add_argument("--manifest", default="bench_seed.json", help="where to write the generated logins")
+    args = parser.parse_args()
+
+    migrations.prepare_schema(engine)
+    with engine.connect() as conn:
+        taken = conn.execute(
+            select(models.Organization.id).where(models.Organization.name.like(f"{args.prefix}-org-%")).limit(1)
+        ).first()
+    if taken:
+        parser.error(f"organizations named {args.prefix}-org-* already exist; use another --prefix or a fresh database")
+
+    rng = random.Random(args.seed)
+    hashed_password = hashing.crypt_context().hash(args.password)
+    today = date.today()
+    totals, logins = {}, []
+    start = time.perf_counter()
+    for index in range(args.orgs):
+        # One transaction per organization keeps memory and lock time bounded
+        with engine.begin() as conn:
+            emails, counts = seed_org(conn, rng, index, args, hashed_password, today)
+        logins.extend(emails)
+        for name, value in counts.items():
+            totals[name] = totals.get(name, 0) + value
+    with engine.begin() as conn:
+        for stmt in crud.recount_step_progress():
+            conn.execute(stmt)
+    elapsed = time.perf_counter() - start
+
+    with open(args.manifest, "w") as fh:
+        json.dump({"password": args.password, "emails": logins, "seed": args.seed, "counts": totals}, fh, indent=2)
+    print(json.dumps({"seconds": round(elapsed, 2), **totals}))
+    print(f"logins written to {args.manifest}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Compare the ORM + Pydantic response path with the column-select + direct JSON path.
+
+    python backend/bench/serialization.py [--plans 50] [--steps 100] [--repeat 20]
+
+Builds one animal with plans * steps step rows (5,000 by default) in an in-memory
+SQLite database and times ``GET /plans/animal/{id}``'s work both ways:
+
+* orm: selectinload the plans and steps, ``model_validate`` each tree, dump it,
+  then validate and dump again as FastAPI's ``response_model`` does, and encode
+  with the stdlib like JSONResponse;
+* direct: ``crud.get_plan_tree`` column selects and ``serialization.dumps``.
+
+"encode" excludes the queries, "total" includes them. Medians in milliseconds.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+from backend.app import crud, models, schemas, serialization  # noqa: E402
+from backend.app.database import Base, SessionLocal, engine  # noqa: E402
+
+response_adapter = TypeAdapter(List[schemas.TrainingPlanTreeOut])
+
+def seed(plans: int, steps: int):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Organization), [{"id": 1, "name": "Bench"}])
+        conn.execute(insert(models.User), [{"id": 1, "email": "bench@example.com", "hashed_password": "x", "organization_id": 1}])
+        conn.execute(insert(models.Animal), [{"id": 1, "name": "Rex", "species": "dog", "sex": "Male", "owner_id": 1, "organization_id": 1}])
+        conn.execute(insert(models.TrainingPlan), [
+            {"id": p, "name": f"Plan {p}", "description": "Shape it", "category": "behavior",
+             "started_date": date(2024, 1, 1), "animal_id": 1}
+            for p in range(1, plans + 1)
+        ])
+        conn.execute(insert(models.PlanStep), [
+            {"name": f"Step {s}", "description": "Small approximations", "order": s, "estimated_sessions": 5,
+             "plan_id": p, "is_complete": s % 2}
+            for p in range(1, plans + 1) for s in range(1, steps + 1)
+        ])
+    return schemas.Principal(id=1, email="bench@example.com", organization_id=1)
+
+def orm_query(db, principal):
+    stmt = select(models.TrainingPlan).join(models.TrainingPlan.animal).options(selectinload(models.TrainingPlan.steps))
+    stmt = stmt.where(models.Animal.organization_id == principal.organization_id, models.TrainingPlan.animal_id == 1)
+    return db.scalars(stmt).all()
+
+def orm_encode(plans):
+    trees = [
+        schemas.TrainingPlanTreeOut.model_validate(plan).model_dump(mode="json", exclude_unset=True) for plan in plans
+    ]
+    content = response_adapter.dump_python(response_adapter.validate_python(trees), mode="json", exclude_unset=True)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+def measure(function, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--plans", type=int, default=50)
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    principal = seed(args.plans, args.steps)
+    with SessionLocal() as db:
+        def orm_total():
+            db.expunge_all()
+            return orm_encode(orm_query(db, principal))
+
+        def direct_total():
+            return serialization.dumps(crud.get_plan_tree(db, principal, animal_id=1))
+
+        orm_plans = orm_query(db, principal)
+        trees = crud.get_plan_tree(db, principal, animal_id=1)
+        assert json.loads(orm_encode(orm_plans)) == json.loads(serialization.dumps(trees))
+
+        results = {
+            "orm encode": measure(lambda: orm_encode(orm_plans), args.repeat),
+            "direct encode": measure(lambda: serialization.dumps(trees), args.repeat),
+            "orm total": measure(orm_total, args.repeat),
+            "direct total": measure(direct_total, args.repeat),
+        }
+
+    encoder = "orjson" if serialization.orjson is not None else "stdlib json"
+    print(f"{args.plans * args.steps} step rows, direct path encoding with {encoder}")
+    for name, ms in results.items():
+        print(f"{name:14} {ms:9.2f} ms")
+    print(f"encode speedup {results['orm encode'] / results['direct encode']:.1f}x, "
+          f"total speedup {results['orm total'] / results['direct total']:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Measure how long the API takes from process start to its first response.
+
+    python backend/bench/startup.py [--runs 5] [--budget-ms 2500]
+
+Every run is a fresh interpreter. Two numbers are reported (medians):
+
+* import: ``import backend.app.main`` alone, which must not touch the database;
+* first response: spawning uvicorn until ``GET /`` answers, including the startup
+  schema check. The first run goes against an empty SQLite file (tables are
+  created); later runs reuse it, which is the normal restart case.
+
+With --budget-ms the script exits non-zero when the warm first-response median
+is over budget, so CI can guard cold-start regressions.
+"""
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import backend.app.main
+print(time.perf_counter() - start)
+"""
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_import(env) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+def time_first_response(env, timeout: float = 30) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                conn.request("GET", "/")
+                if conn.getresponse().status == 200:
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.005)
+        raise SystemExit(f"no response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, help="fail when the warm first-response median exceeds this")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'startup.db')}"}
+        imports = [time_import(env) for _ in range(args.runs)]
+        cold = time_first_response(env)
+        warm = [time_first_response(env) for _ in range(args.runs)]
+
+    print(f"import:                    {statistics.median(imports) * 1000:8.1f} ms")
+    print(f"first response, empty db:  {cold * 1000:8.1f} ms")
+    print(f"first response, warm db:   {statistics.median(warm) * 1000:8.1f} ms")
+    if args.budget_ms is not None and statistics.median(warm) * 1000 > args.budget_ms:
+        print(f"over budget ({args.budget_ms:.0f} ms)")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Benchmark serve_frontend.py against the previous TCPServer + SimpleHTTPRequestHandler setup.
+
+    python backend/bench/static_server.py [--dist frontend/dist] [--clients 16] [--duration 5]
+
+Without --dist a synthetic Vite-like build (index.html, a 400 KB script and a
+60 KB stylesheet under assets/) is generated in a temporary directory. Each client
+repeatedly loads the page and its assets over its own connection, sending
+``Accept-Encoding: gzip, br``. Every round runs once normally and once with a
+slow client that opens a connection and sends its request line only after
+--slow-seconds, which a single-threaded server cannot work around.
+"""
+import argparse
+import http.client
+import os
+import random
+import socket
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Each server runs in its own interpreter so it doesn't share a GIL with the clients
+LEGACY_SERVER = """
+import http.server, socketserver, sys
+from functools import partial
+class Handler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+with socketserver.TCPServer(("127.0.0.1", int(sys.argv[2])), partial(Handler, directory=sys.argv[1])) as httpd:
+    httpd.serve_forever()
+"""
+
+def legacy_server(directory, port):
+    return [sys.executable, "-c", LEGACY_SERVER, directory, str(port)]
+
+def new_server(directory, port):
+    return [sys.executable, os.path.join(ROOT, "serve_frontend.py"), "--dir", directory, "--port", str(port),
+            "--host", "127.0.0.1", "--no-browser", "--quiet"]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_until_listening(port, timeout=10):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise SystemExit(f"server on port {port} did not start")
+
+def synthetic_build(root):
+    rng = random.Random(1)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(400)]
+
+    def text(size):
+        return " ".join(rng.choice(words) for _ in range(size // 6))[:size]
+
+    os.makedirs(os.path.join(root, "assets"))
+    with open(os.path.join(root, "assets", "index-Dk3j9Ab1.js"), "w") as fh:
+        fh.write(text(400_000))
+    with open(os.path.join(root, "assets", "index-Q8x2LmZ0.css"), "w") as fh:
+        fh.write(text(60_000))
+    with open(os.path.join(root, "index.html"), "w") as fh:
+        fh.write('<!doctype html><html><head><script type="module" src="/assets/index-Dk3j9Ab1.js"></script>'
+                 '<link rel="stylesheet" href="/assets/index-Q8x2LmZ0.css"></head><body><div id="root"></div></body></html>')
+    return ["/", "/assets/index-Dk3j9Ab1.js", "/assets/index-Q8x2LmZ0.css"]
+
+def build_paths(directory):
+    paths = ["/"]
+    assets = os.path.join(directory, "assets")
+    if os.path.isdir(assets):
+        paths += [f"/assets/{name}" for name in sorted(os.listdir(assets)) if not name.endswith((".gz", ".br"))]
+    return paths
+
+def client(port, paths, deadline, latencies, transferred, lock):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    local, sent = [], 0
+    while time.perf_counter() < deadline:
+        for path in paths:
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path, headers={"Accept-Encoding": "gzip, br"})
+                response = conn.getresponse()
+                body = response.read()
+                if response.will_close:
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                # The single-threaded server's listen backlog overflows under load
+                conn.close()
+                time.sleep(0.01)
+                continue
+            local.append(time.perf_counter() - start)
+            sent += len(body)
+    conn.close()
+    with lock:
+        latencies.extend(local)
+        transferred[0] += sent
+
+def slow_client(port, delay):
+    # Connects, then takes `delay` seconds to send its request
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        time.sleep(delay)
+        sock.sendall(b"GET / HTTP/1.0\r\nHost: localhost\r\n\r\n")
+        while sock.recv(65536):
+            pass
+
+def run(command, directory, paths, clients, duration, slow_seconds=None):
+    port = free_port()
+    server = subprocess.Popen(command(directory, port), stdout=subprocess.DEVNULL)
+    try:
+        wait_until_listening(port)
+        if slow_seconds:
+            threading.Thread(target=slow_client, args=(port, slow_seconds), daemon=True).start()
+            time.sleep(0.1)
+        latencies, transferred, lock = [], [0], threading.Lock()
+        start = time.perf_counter()
+        deadline = start + duration
+        workers = [
+            threading.Thread(target=client, args=(port, paths, deadline, latencies, transferred, lock))
+            for _ in range(clients)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    ordered = sorted(latencies) or [float("nan")]
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(ordered) * 1000,
+        "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+        "kb_per_page": transferred[0] / max(len(latencies) / len(paths), 1) / 1024,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dist", help="built frontend to serve (default: synthetic build)")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--slow-seconds", type=float, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.dist:
+            directory, paths = args.dist, build_paths(args.dist)
+        else:
+            directory, paths = tmp, synthetic_build(tmp)
+        print(f"{args.clients} clients, {args.duration:g}s per run, page = {', '.join(paths)}")
+        print(f"{'server':36} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'KB/page':>9}")
+        for name, factory in (("TCPServer (previous)", legacy_server), ("serve_frontend", new_server)):
+            for slow in (None, args.slow_seconds):
+                label = f"{name}{' + slow client' if slow else ''}"
+                result = run(factory, directory, paths, args.clients, args.duration, slow)
+                print(f"{label:36} {result['rps']:9.1f} {result['p50']:9.2f} {result['p99']:9.2f} {result['kb_per_page']:9.1f}")
+
+if __name__ == "__main__":
+    main()
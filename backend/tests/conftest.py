@@ -0,0 +1,63 @@
+"""Shared fixtures for the API tests.
+
+The app runs against a throwaway SQLite file built by its own startup step, with
+cheap bcrypt. Each test signs up into a fresh organization, so tests share the
+database without seeing each other's rows.
+
+    python -m pytest backend/tests
+"""
+import itertools
+import os
+import re
+import sys
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="trainit-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from backend.app.main import app  # noqa: E402
+
+_ids = itertools.count(1)
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+def signup(client, organization: str = None) -> dict:
+    """Auth headers for a new user in a new (or the named) organization."""
+    n = next(_ids)
+    email = f"user{n}@example.com"
+    response = client.post("/auth/signup", json={
+        "email": email, "password": "secret", "organization_name": organization or f"Org {n}",
+    })
+    assert response.status_code == 200, response.text
+    response = client.post("/auth/login", json={"email": email, "password": "secret"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def headers(client):
+    return signup(client)
+
+def create_animal(client, headers, name="Rex") -> dict:
+    response = client.post("/animals/", headers=headers, json={"name": name, "species": "dog", "sex": "Male"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def create_plan(client, headers, animal_id: int, steps: int = 3) -> dict:
+    response = client.post(f"/plans/animal/{animal_id}", headers=headers, json={
+        "name": "Target", "steps": [{"name": f"Step {i}", "order": i} for i in range(1, steps + 1)],
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def statements_run(client, route: str) -> float:
+    """SQL statements counted so far for a route template, from GET /metrics."""
+    pattern = re.compile(rf'^db_statements_total\{{route="{re.escape(route)}"\}} (\S+)$', re.M)
+    match = pattern.search(client.get("/metrics").text)
+    return float(match.group(1)) if match else 0.0
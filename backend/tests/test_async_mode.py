@@ -0,0 +1,31 @@
+"""The whole suite again with DB_ASYNC=1, so the async_crud paths are covered by default."""
+import os
+import subprocess
+import sys
+import pytest
+from backend.app import database
+
+TESTS = os.path.dirname(__file__)
+
+@pytest.mark.skipif(database.ASYNC_DB, reason="already running on the async engine")
+def test_suite_passes_on_async_engine():
+    pytest.importorskip("aiosqlite")
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-x", "-p", "no:cacheprovider", TESTS],
+        env={**os.environ, "DB_ASYNC": "1"}, capture_output=True, text=True, timeout=600,
+    )
+    assert result.returncode == 0, result.stdout[-4000:]
+
+def test_missing_async_driver_fails_clearly():
+    try:
+        import asyncpg  # noqa: F401
+        pytest.skip("asyncpg is installed")
+    except ImportError:
+        pass
+    env = {**os.environ, "DB_ASYNC": "1", "ASYNC_DATABASE_URL": "postgresql+asyncpg://localhost/app"}
+    result = subprocess.run(
+        [sys.executable, "-c", "import backend.app.database"],
+        cwd=os.path.join(TESTS, "..", ".."), env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode != 0
+    assert "DB_ASYNC is set but the asyncpg driver for postgresql+asyncpg is not installed" in result.stderr
@@ -0,0 +1,75 @@
+import pytest
+from backend.app import auth_utils
+from conftest import signup
+
+@pytest.fixture(autouse=True)
+def clean_throttle():
+    auth_utils.login_failures.clear()
+    yield
+    auth_utils.login_failures.clear()
+
+def login(client, email, password):
+    return client.post("/auth/login", json={"email": email, "password": password})
+
+def test_failed_logins_are_throttled_with_a_fixed_window(client):
+    signup(client)
+    email = "user-throttle@example.com"
+    for _ in range(auth_utils.LOGIN_MAX_FAILURES):
+        assert login(client, email, "wrong").status_code == 401
+    response = login(client, email, "wrong")
+    assert response.status_code == 429
+    assert 0 < int(response.headers["Retry-After"]) <= auth_utils.LOGIN_FAILURE_WINDOW
+    # Further attempts don't push the window out
+    _, window_end = auth_utils.login_failures.get(("login", email, "testclient"))
+    login(client, email, "wrong")
+    assert auth_utils.login_failures.get(("login", email, "testclient"))[1] == window_end
+
+def test_another_client_cannot_lock_a_user_out():
+    for _ in range(auth_utils.LOGIN_MAX_FAILURES * 3):
+        auth_utils.record_login_failure("victim@example.com", "203.0.113.9")
+    assert auth_utils.login_retry_after("victim@example.com", "203.0.113.9") > 0
+    assert auth_utils.login_retry_after("victim@example.com", "198.51.100.7") == 0
+
+def test_one_client_spraying_emails_is_capped(client):
+    statuses = [
+        login(client, f"spray{n}@example.com", "wrong").status_code
+        for n in range(auth_utils.LOGIN_CLIENT_MAX_FAILURES + 10)
+    ]
+    assert statuses.count(401) == auth_utils.LOGIN_CLIENT_MAX_FAILURES
+    assert set(statuses[auth_utils.LOGIN_CLIENT_MAX_FAILURES:]) == {429}
+    # So one client can't push other users' counters out of the cache
+    assert len(auth_utils.login_failures) == auth_utils.LOGIN_CLIENT_MAX_FAILURES + 1
+    assert auth_utils.login_retry_after("fresh@example.com", "198.51.100.7") == 0
+
+def test_success_clears_the_counter(client):
+    headers = signup(client)
+    email = client.get("/auth/me", headers=headers).json()["email"]
+    for _ in range(auth_utils.LOGIN_MAX_FAILURES - 1):
+        login(client, email, "wrong")
+    assert login(client, email, "secret").status_code == 200
+    assert auth_utils.login_retry_after(email, "testclient") == 0
+
+def test_clients_behind_one_proxy_are_throttled_separately(client, monkeypatch):
+    monkeypatch.setattr(auth_utils, "TRUSTED_PROXY_IPS", {"testclient"})
+    headers = signup(client)
+    email = client.get("/auth/me", headers=headers).json()["email"]
+    attacker = {"X-Forwarded-For": "203.0.113.9"}
+    for _ in range(auth_utils.LOGIN_MAX_FAILURES):
+        client.post("/auth/login", json={"email": email, "password": "wrong"}, headers=attacker)
+    assert client.post("/auth/login", json={"email": email, "password": "secret"}, headers=attacker).status_code == 429
+    user = {"X-Forwarded-For": "198.51.100.7"}
+    assert client.post("/auth/login", json={"email": email, "password": "secret"}, headers=user).status_code == 200
+
+@pytest.mark.parametrize("trusted, forwarded, expected", [
+    (set(), "203.0.113.9", "testclient"),
+    ({"testclient"}, "203.0.113.9", "203.0.113.9"),
+    # Addresses left of the first untrusted hop are client-supplied and ignored
+    ({"testclient"}, "192.0.2.1, 203.0.113.9", "203.0.113.9"),
+    ({"testclient", "10.0.0.2"}, "203.0.113.9, 10.0.0.2", "203.0.113.9"),
+    ({"*"}, "192.0.2.1, 203.0.113.9", "203.0.113.9"),
+])
+def test_client_address_reads_trusted_forwarded_header(client, monkeypatch, trusted, forwarded, expected):
+    monkeypatch.setattr(auth_utils, "TRUSTED_PROXY_IPS", trusted)
+    for _ in range(auth_utils.LOGIN_MAX_FAILURES):
+        client.post("/auth/login", json={"email": "ghost@example.com", "password": "x"}, headers={"X-Forwarded-For": forwarded})
+    assert auth_utils.login_retry_after("ghost@example.com", expected) > 0
@@ -0,0 +1,150 @@
+"""Accept-Encoding negotiation, which responses are left alone, streamed gzip, and
+fields= trimming both the payload and the columns selected."""
+import asyncio
+import gzip
+import zlib
+import pytest
+from sqlalchemy import event
+from backend.app import database
+from backend.app.compression import CompressionMiddleware, negotiate
+from conftest import create_animal, create_plan
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip", "gzip"),
+    ("br;q=0.5, gzip;q=0.8", "gzip"),
+    ("gzip;q=0.2, br;q=0.9", "br"),
+    ("gzip;q=0", None),
+    ("*", "br"),
+    ("*;q=0.5, br;q=0", "gzip"),
+    ("gzip, *;q=0", "gzip"),
+    ("identity", None),
+    ("", None),
+    ("gzip;q=nonsense", None),
+    # Equal ratings fall back to the server's preference order
+    ("gzip, br", "br"),
+])
+def test_negotiate(accept, expected):
+    assert negotiate(accept, ["br", "gzip"]) == expected
+
+def run(app, accept="gzip"):
+    """Send one GET through app and collect what it sends back."""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept.encode())]}
+    asyncio.run(app(scope, receive, send))
+    start = messages[0]
+    return start["status"], dict((k.decode(), v.decode()) for k, v in start["headers"]), [m["body"] for m in messages[1:]]
+
+def responder(status=200, body=b"", headers=(), chunks=None, content_type=b"application/json"):
+    async def app(scope, receive, send):
+        raw = [(b"content-type", content_type), *headers]
+        if chunks is None:
+            raw.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": raw})
+        if chunks is None:
+            await send({"type": "http.response.body", "body": body})
+            return
+        for n, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": n < len(chunks) - 1})
+    return CompressionMiddleware(app, minimum_size=100, encodings=["gzip"])
+
+LARGE = b'{"rows": "' + b"x" * 5000 + b'"}'
+
+def test_large_body_is_gzipped():
+    status, headers, bodies = run(responder(body=LARGE))
+    assert headers["content-encoding"] == "gzip" and headers["vary"] == "Accept-Encoding"
+    assert gzip.decompress(b"".join(bodies)) == LARGE
+    assert int(headers["content-length"]) == len(b"".join(bodies))
+
+@pytest.mark.parametrize("app", [
+    responder(body=b'{"small": true}'),
+    responder(status=204),
+    responder(status=304, headers=[(b"etag", b'W/"abc"')]),
+    responder(body=LARGE, headers=[(b"cache-control", b"no-transform")]),
+    responder(body=LARGE, headers=[(b"content-encoding", b"br")]),
+    responder(body=LARGE, content_type=b"image/png"),
+], ids=["small", "204", "304", "no-transform", "already-encoded", "binary"])
+def test_passthrough(app):
+    status, headers, bodies = run(app)
+    assert headers.get("content-encoding") in (None, "br")
+    assert headers["vary"] == "Accept-Encoding"
+
+def test_identity_when_gzip_refused():
+    status, headers, bodies = run(responder(body=LARGE), accept="gzip;q=0")
+    assert "content-encoding" not in headers and b"".join(bodies) == LARGE
+
+def test_streamed_chunks_are_flushed_one_by_one():
+    chunks = [b"id,duration\n", b"1,5\n" * 50, b"2,6\n" * 50]
+    status, headers, bodies = run(responder(chunks=chunks, content_type=b"text/csv"))
+    assert headers["content-encoding"] == "gzip" and "content-length" not in headers
+    # Every compressed chunk decodes to its own rows without waiting for the next
+    decoder = zlib.decompressobj(31)
+    assert [decoder.decompress(body) for body in bodies] == chunks
+
+def test_log_export_is_streamed_gzipped(client, headers):
+    logs = "duration\n" + "".join(f"{n}\n" for n in range(1, 2001))
+    client.post("/plans/logs/import", headers=headers, files={"file": ("logs.csv", logs.encode(), "text/csv")})
+    plain = client.get("/plans/logs/export", headers={**headers, "Accept-Encoding": "identity"})
+    with client.stream("GET", "/plans/logs/export", headers={**headers, "Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    assert "content-encoding" not in plain.headers
+    assert gzip.decompress(raw) == plain.content
+    assert plain.text.count("\n") == 2001
+
+def test_api_small_and_large_responses(client, headers):
+    assert "content-encoding" not in client.get("/", headers={"Accept-Encoding": "gzip"}).headers
+    animal_id = create_animal(client, headers)["id"]
+    create_plan(client, headers, animal_id, steps=60)
+    response = client.get(f"/plans/animal/{animal_id}", headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()[0]["steps"]) == 60
+    etag = client.get("/animals/", headers=headers).headers["etag"]
+    not_modified = client.get("/animals/", headers={**headers, "If-None-Match": etag, "Accept-Encoding": "gzip"})
+    assert not_modified.status_code == 304 and "content-encoding" not in not_modified.headers
+    spare_id = create_plan(client, headers, animal_id)["id"]
+    deleted = client.delete(f"/plans/{spare_id}", headers={**headers, "Accept-Encoding": "gzip"})
+    assert deleted.status_code == 204 and "content-encoding" not in deleted.headers
+
+@pytest.fixture
+def selects():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    engines = [database.engine] + ([database.async_engine.sync_engine] if database.async_engine else [])
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", record)
+
+def test_fields_trim_payload_and_columns(client, headers, selects):
+    animal_id = create_animal(client, headers)["id"]
+    plan_id = create_plan(client, headers, animal_id)["id"]
+
+    client.get("/auth/me", headers=headers)
+    selects.clear()
+    animals = client.get("/animals/?fields=name", headers=headers).json()
+    assert animals and all(animal.keys() == {"id", "name"} for animal in animals)
+    query = next(statement for statement in selects if "FROM animals" in statement and "LIMIT" in statement)
+    assert "animals.name" in query
+    assert "animals.species" not in query and "animals.sex" not in query
+
+    selects.clear()
+    plan = client.get(f"/plans/{plan_id}?fields=name", headers=headers).json()
+    assert plan.keys() == {"id", "name", "steps"}
+    query = next(statement for statement in selects if "FROM training_plans" in statement and "training_plans.name" in statement)
+    assert "training_plans.description" not in query and "training_plans.criteria" not in query
+
+def test_unknown_field_is_rejected(client, headers):
+    assert client.get("/animals/?fields=name,nope", headers=headers).status_code == 422
@@ -0,0 +1,43 @@
+import threading
+import pytest
+from sqlalchemy import func, select, text
+from backend.app import crud, database, models, schemas
+
+WRITERS = 16
+WRITES_PER_WRITER = 25
+
+def test_sqlite_pragmas_applied(client):
+    if not database.SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+        pytest.skip("SQLite only")
+    with database.engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == database.SQLITE_JOURNAL_MODE.lower()
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == database.SQLITE_BUSY_TIMEOUT_MS
+
+def test_parallel_log_writers_do_not_hit_lock_errors(client, headers):
+    principal = schemas.Principal(**client.get("/auth/me", headers=headers).json())
+    errors = []
+    start = threading.Barrier(WRITERS)
+
+    def writer():
+        start.wait()
+        try:
+            for _ in range(WRITES_PER_WRITER):
+                with database.SessionLocal() as db:
+                    crud.create_log(db, principal, schemas.TimeLogCreate(duration=1.0))
+        except Exception as error:  # a "database is locked" here is the regression
+            errors.append(error)
+
+    threads = [threading.Thread(target=writer) for _ in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with database.SessionLocal() as db:
+        written = db.scalar(select(func.count()).select_from(models.TimeLog).where(models.TimeLog.user_id == principal.id))
+    assert written == WRITERS * WRITES_PER_WRITER
+
+def test_pool_metrics_exposed(client):
+    status = client.get("/metrics/pool").json()
+    assert {"checkout_waits", "checkout_wait_seconds_total", "checkout_timeouts", "size", "checked_out"} <= status.keys()
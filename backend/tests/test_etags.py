@@ -0,0 +1,70 @@
+"""Every mutating route changes exactly the ETags of the reads it affects."""
+import pytest
+from conftest import create_animal, create_plan
+
+@pytest.fixture
+def world(client, headers):
+    animal = create_animal(client, headers)
+    spare = create_animal(client, headers, name="Spare")
+    plan = create_plan(client, headers, animal["id"], steps=2)
+    other = create_plan(client, headers, animal["id"], steps=1)
+    s1, s2 = [step["id"] for step in plan["steps"]]
+    note = client.post(f"/steps/{s1}/notes", headers=headers, json={"session_count": 1}).json()
+    template = client.post("/templates/", headers=headers, json={"name": "T", "steps": [{"name": "a", "order": 1}]}).json()
+    return {
+        "headers": headers, "animal": animal["id"], "spare": spare["id"], "plan": plan["id"], "other": other["id"],
+        "s1": s1, "s2": s2, "note": note["id"], "template": template["id"],
+    }
+
+def etags(client, w):
+    reads = {
+        "animals": "/animals/",
+        "plan": f"/plans/{w['plan']}",
+        "other plan": f"/plans/{w['other']}",
+        "s1 notes": f"/steps/{w['s1']}/notes",
+        "s2 notes": f"/steps/{w['s2']}/notes",
+        "timeline": "/timeline/",
+    }
+    return {name: client.get(path, headers=w["headers"]).headers.get("etag") for name, path in reads.items()}
+
+PLAN_WRITE = {"plan", "timeline"}
+
+MUTATIONS = [
+    ("create animal", lambda c, w: c.post("/animals/", json={"name": "New", "species": "cat", "sex": "Female"}, headers=w["headers"]),
+     {"animals"}),
+    ("update animal", lambda c, w: c.put(f"/animals/{w['spare']}", json={"name": "Renamed", "species": "cat", "sex": "Female"},
+                                         headers=w["headers"]), {"animals"}),
+    ("delete animal", lambda c, w: c.delete(f"/animals/{w['spare']}", headers=w["headers"]), {"animals", "timeline"}),
+    ("create plan", lambda c, w: c.post(f"/plans/animal/{w['animal']}", json={"name": "P", "steps": []}, headers=w["headers"]),
+     {"timeline"}),
+    ("update plan", lambda c, w: c.put(f"/plans/{w['plan']}", json={"name": "Renamed"}, headers=w["headers"]), PLAN_WRITE),
+    ("edit steps", lambda c, w: c.patch(f"/plans/{w['plan']}/steps", json={"order": [w["s2"], w["s1"]]}, headers=w["headers"]),
+     PLAN_WRITE),
+    ("delete plan", lambda c, w: c.delete(f"/plans/{w['other']}", headers=w["headers"]), {"other plan", "timeline"}),
+    ("add note", lambda c, w: c.post(f"/steps/{w['s1']}/notes", json={"note": "x"}, headers=w["headers"]),
+     PLAN_WRITE | {"s1 notes"}),
+    ("add notes in bulk", lambda c, w: c.post("/steps/notes/bulk", json={"notes": [{"step_id": w["s2"], "note": "x"}]},
+                                              headers=w["headers"]), PLAN_WRITE | {"s2 notes"}),
+    ("complete step", lambda c, w: c.post(f"/steps/{w['s1']}/complete", headers=w["headers"]), PLAN_WRITE),
+    ("update step", lambda c, w: c.put(f"/steps/{w['s1']}", json={"name": "Renamed"}, headers=w["headers"]), PLAN_WRITE),
+    ("delete step", lambda c, w: c.delete(f"/steps/{w['s2']}", headers=w["headers"]), PLAN_WRITE | {"s2 notes"}),
+    ("update note", lambda c, w: c.put(f"/steps/notes/{w['note']}", json={"session_count": 3}, headers=w["headers"]),
+     PLAN_WRITE | {"s1 notes"}),
+    ("delete note", lambda c, w: c.delete(f"/steps/notes/{w['note']}", headers=w["headers"]), PLAN_WRITE | {"s1 notes"}),
+    ("log session", lambda c, w: c.post("/plans/log", json={"duration": 5}, headers=w["headers"]), set()),
+    ("import logs", lambda c, w: c.post("/plans/logs/import", files={"file": ("logs.csv", b"duration\n5\n", "text/csv")},
+                                        headers=w["headers"]), set()),
+    ("create template", lambda c, w: c.post("/templates/", json={"name": "T2", "steps": []}, headers=w["headers"]), set()),
+    ("apply template", lambda c, w: c.post(f"/templates/{w['template']}/apply", json={"animal_ids": [w["animal"]]},
+                                           headers=w["headers"]), {"timeline"}),
+    ("delete template", lambda c, w: c.delete(f"/templates/{w['template']}", headers=w["headers"]), set()),
+]
+
+@pytest.mark.parametrize("mutate, expected", [m[1:] for m in MUTATIONS], ids=[m[0] for m in MUTATIONS])
+def test_mutation_changes_the_right_etags(client, world, mutate, expected):
+    before = etags(client, world)
+    assert all(before.values()), before
+    response = mutate(client, world)
+    assert response.status_code < 300, response.text
+    after = etags(client, world)
+    assert {name for name in before if after[name] != before[name]} == expected
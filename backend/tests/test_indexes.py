@@ -0,0 +1,78 @@
+"""The hot read queries use their indexes on a database brought up to date by migrations."""
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+from backend.app import crud, migrations, models, schemas
+from backend.app.database import Base
+
+HOT_INDEXES = (
+    "ix_timelogs_user_id_timestamp",
+    "ix_animals_organization_id_id",
+    "ix_training_plans_animal_id",
+    "ix_plan_steps_plan_id_order",
+    "ix_step_session_notes_step_id_timestamp",
+)
+
+principal = schemas.Principal(id=1, email="a@example.com", organization_id=1)
+
+def hot_queries():
+    plans, steps, notes = crud.select_plan_tree(principal, ("steps", "notes"), animal_id=3)
+    logs = select(models.TimeLog).where(models.TimeLog.user_id == principal.id)
+    return [
+        ("animal list", crud.select_user_animals(principal, limit=10, after_id=5), "ix_animals_organization_id_id"),
+        ("plans of an animal", plans, "ix_training_plans_animal_id"),
+        ("steps of plans", steps, "ix_plan_steps_plan_id_order"),
+        ("notes of plans", notes, "ix_step_session_notes_step_id_timestamp"),
+        ("notes of a step", crud.select_notes_for_step(7, principal, limit=10), "ix_step_session_notes_step_id_timestamp"),
+        ("log page", logs.order_by(models.TimeLog.timestamp.desc(), models.TimeLog.id.desc()).limit(10),
+         "ix_timelogs_user_id_timestamp"),
+    ]
+
+def query_plan(engine, stmt) -> str:
+    sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return "\n".join(row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    """A database shaped like one created before migration 1: no hot indexes, no token_version, no step_progress."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name in HOT_INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+        conn.execute(text("DROP TABLE step_progress"))
+        conn.execute(text("ALTER TABLE users DROP COLUMN token_version"))
+    yield engine
+    engine.dispose()
+
+def index_names(engine):
+    inspector = inspect(engine)
+    return {index["name"] for table in inspector.get_table_names() for index in inspector.get_indexes(table)}
+
+def test_migrate_upgrades_a_legacy_schema(legacy_engine):
+    assert not index_names(legacy_engine) & set(HOT_INDEXES)
+    assert migrations.migrate(legacy_engine) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert set(HOT_INDEXES) <= index_names(legacy_engine)
+    assert "token_version" in {column["name"] for column in inspect(legacy_engine).get_columns("users")}
+    assert "step_progress" in inspect(legacy_engine).get_table_names()
+    assert migrations.migrate(legacy_engine) == []
+
+def test_migrate_backfills_step_progress(legacy_engine):
+    with legacy_engine.begin() as conn:
+        conn.execute(text(
+            'INSERT INTO plan_steps (id, name, "order", plan_id) VALUES (1, \'sit\', 1, 1), (2, \'stay\', 2, 1)'
+        ))
+        conn.execute(text(
+            "INSERT INTO step_session_notes (step_id, session_count, performed_date) VALUES"
+            " (1, 2, '2024-01-03'), (1, NULL, '2024-01-01'), (1, 3, NULL)"
+        ))
+    migrations.migrate(legacy_engine)
+    with legacy_engine.connect() as conn:
+        rows = conn.execute(text("SELECT * FROM step_progress ORDER BY step_id")).all()
+    assert [tuple(row) for row in rows] == [(1, 5, 3, "2024-01-01", "2024-01-03"), (2, 0, 0, None, None)]
+
+@pytest.mark.parametrize("name, stmt, index", hot_queries(), ids=[query[0] for query in hot_queries()])
+def test_hot_query_uses_index(legacy_engine, name, stmt, index):
+    assert index not in query_plan(legacy_engine, stmt)
+    migrations.migrate(legacy_engine)
+    assert index in query_plan(legacy_engine, stmt)
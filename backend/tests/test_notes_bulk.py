@@ -0,0 +1,51 @@
+"""POST /steps/notes/bulk inserts every note in one statement, reports unknown steps per
+item and replays its stored result for a repeated Idempotency-Key."""
+import uuid
+from conftest import create_animal, create_plan, signup, statements_run
+
+def test_bulk_notes_take_one_insert(client, headers):
+    steps = [step["id"] for step in create_plan(client, headers, create_animal(client, headers)["id"])["steps"]]
+    # Repeated identical notes too, which must still each get their own id
+    notes = [{"step_id": steps[n % 3], "note": f"n{n % 10}", "session_count": 1} for n in range(50)]
+    client.get("/auth/me", headers=headers)
+
+    before = statements_run(client, "/steps/notes/bulk")
+    response = client.post("/steps/notes/bulk", headers=headers, json={"notes": notes})
+    assert response.status_code == 200, response.text
+    # Authorize, insert, one progress update per step and the revision bump
+    assert statements_run(client, "/steps/notes/bulk") - before <= 6
+
+    results = response.json()["results"]
+    assert len({result["id"] for result in results}) == 50
+    stored = {note["id"]: note for step in steps for note in client.get(f"/steps/{step}/notes", headers=headers).json()}
+    for item, result in zip(notes, results):
+        assert stored[result["id"]]["note"] == item["note"]
+        assert stored[result["id"]]["step_id"] == item["step_id"]
+
+def test_unknown_and_foreign_steps_are_not_found(client, headers):
+    step_id = create_plan(client, headers, create_animal(client, headers)["id"])["steps"][0]["id"]
+    other_headers = signup(client)
+    foreign = create_plan(client, other_headers, create_animal(client, other_headers)["id"])["steps"][0]["id"]
+    response = client.post("/steps/notes/bulk", headers=headers, json={"notes": [
+        {"step_id": foreign, "note": "x"}, {"step_id": step_id, "note": "y"}, {"step_id": 10**9, "note": "z"},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 1
+    assert [(result["index"], result["status"]) for result in body["results"]] == [(0, "not_found"), (1, "created"), (2, "not_found")]
+    assert body["results"][0]["id"] is None and body["results"][1]["id"] is not None
+    assert client.get(f"/steps/{foreign}/notes", headers=other_headers).json() == []
+
+def test_idempotency_key_replays_the_first_result(client, headers):
+    step_id = create_plan(client, headers, create_animal(client, headers)["id"])["steps"][0]["id"]
+    replay = {**headers, "Idempotency-Key": str(uuid.uuid4())}
+    payload = {"notes": [{"step_id": step_id, "note": "once", "session_count": 2}]}
+    first = client.post("/steps/notes/bulk", headers=replay, json=payload)
+    second = client.post("/steps/notes/bulk", headers=replay, json=payload)
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert len(client.get(f"/steps/{step_id}/notes", headers=headers).json()) == 1
+    # A new key inserts again
+    third = client.post("/steps/notes/bulk", headers={**headers, "Idempotency-Key": str(uuid.uuid4())}, json=payload)
+    assert third.json()["results"][0]["id"] != first.json()["results"][0]["id"]
+    assert len(client.get(f"/steps/{step_id}/notes", headers=headers).json()) == 2
@@ -0,0 +1,61 @@
+import pytest
+from conftest import create_animal, create_plan, signup
+
+@pytest.fixture
+def plan(client, headers):
+    return create_plan(client, headers, create_animal(client, headers)["id"], steps=4)
+
+def step_ids(response):
+    return [step["id"] for step in response.json()["steps"]]
+
+def test_full_reorder_renumbers(client, headers, plan):
+    ids = [step["id"] for step in plan["steps"]]
+    response = client.patch(f"/plans/{plan['id']}/steps", headers=headers, json={"order": ids[::-1]})
+    assert response.status_code == 200
+    assert step_ids(response) == ids[::-1]
+    assert [step["order"] for step in response.json()["steps"]] == [1, 2, 3, 4]
+
+def test_partial_order_swaps_listed_steps(client, headers, plan):
+    a, b, c, d = [step["id"] for step in plan["steps"]]
+    response = client.patch(f"/plans/{plan['id']}/steps", headers=headers, json={"order": [c, b]})
+    assert step_ids(response) == [a, c, b, d]
+
+def test_edit_create_delete_in_one_request(client, headers, plan):
+    a, b, c, d = [step["id"] for step in plan["steps"]]
+    client.post(f"/steps/{b}/notes", headers=headers, json={"session_count": 1})
+    response = client.patch(f"/plans/{plan['id']}/steps", headers=headers, json={
+        "update": [{"id": a, "name": "Renamed", "is_complete": True}],
+        "create": [{"name": "New", "order": 0}],
+        "delete": [b],
+    })
+    assert response.status_code == 200, response.text
+    steps = response.json()["steps"]
+    assert steps[0]["name"] == "New"
+    assert b not in [step["id"] for step in steps]
+    assert {"name": "Renamed", "is_complete": True}.items() <= steps[1].items()
+    assert client.get(f"/plans/{plan['id']}/progress", headers=headers).json()["step_count"] == 4
+
+@pytest.mark.parametrize("field", ["name", "order", "is_complete"])
+def test_null_for_required_column_is_rejected(client, headers, plan, field):
+    step = plan["steps"][0]["id"]
+    response = client.patch(f"/plans/{plan['id']}/steps", headers=headers, json={"update": [{"id": step, field: None}]})
+    assert response.status_code == 422
+
+def test_null_description_clears_it(client, headers, plan):
+    step = plan["steps"][0]["id"]
+    response = client.patch(f"/plans/{plan['id']}/steps", headers=headers, json={"update": [{"id": step, "description": None}]})
+    assert response.status_code == 200
+    assert response.json()["steps"][0]["description"] is None
+
+def test_invalid_step_ids_are_rejected(client, headers, plan):
+    first = plan["steps"][0]["id"]
+    for body in (
+        {"delete": [999999]},
+        {"order": [first, first]},
+        {"update": [{"id": first, "name": "Kept"}], "delete": [first]},
+    ):
+        assert client.patch(f"/plans/{plan['id']}/steps", headers=headers, json=body).status_code == 422
+
+def test_other_organization_gets_404(client, headers, plan):
+    outsider = signup(client)
+    assert client.patch(f"/plans/{plan['id']}/steps", headers=outsider, json={"order": []}).status_code == 404
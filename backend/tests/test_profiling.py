@@ -0,0 +1,83 @@
+"""Profiled requests split their time in Server-Timing; routes that return bytes from
+serialization.dumps count that work as serialization, not handler time. Slow statements
+and repeated statement shapes are logged."""
+import asyncio
+import logging
+import fastapi.routing
+import pytest
+from sqlalchemy import text
+from starlette.responses import JSONResponse
+from backend.app import database, metrics, profiling
+from conftest import create_animal, create_plan
+
+@pytest.fixture
+def profiles(monkeypatch):
+    # Sample every request and keep each profile's serialize time as the header is built
+    seen = []
+    server_timing = profiling.server_timing
+    def record(profile, total_seconds):
+        seen.append(profile.serialize_seconds)
+        return server_timing(profile, total_seconds)
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(profiling, "server_timing", record)
+    return seen
+
+@pytest.mark.parametrize("path", ["/animals", "/animals/{animal_id}", "/plans/animal/{animal_id}", "/steps/{step_id}/notes"])
+def test_dumps_routes_report_serialize_time(client, headers, profiles, path):
+    animal_id = create_animal(client, headers)["id"]
+    step_id = create_plan(client, headers, animal_id)["steps"][0]["id"]
+    client.post(f"/steps/{step_id}/notes", headers=headers, json={"session_count": 1})
+    profiles.clear()
+
+    response = client.get(path.format(animal_id=animal_id, step_id=step_id), headers=headers)
+    assert response.status_code == 200, response.text
+    assert "serialize;dur=" in response.headers["server-timing"]
+    assert profiles and profiles[-1] > 0
+
+def test_json_response_routes_report_serialize_time(client, headers, profiles):
+    response = client.get("/auth/me", headers=headers)
+    assert response.status_code == 200
+    assert profiles and profiles[-1] > 0
+
+def test_framework_functions_are_not_patched():
+    assert fastapi.routing.serialize_response.__module__ == "fastapi.routing"
+    assert JSONResponse.render.__qualname__ == "JSONResponse.render"
+
+def test_unprofiled_requests_have_no_server_timing(client, headers):
+    assert "server-timing" not in client.get("/animals/", headers=headers).headers
+
+def test_slow_queries_are_logged_with_their_route(client, headers, monkeypatch, caplog):
+    monkeypatch.setattr(profiling, "SLOW_QUERY_MS", 1e-6)
+    with caplog.at_level(logging.WARNING, logger=profiling.logger.name):
+        client.get("/plans/stats", headers=headers)
+    assert any(record.getMessage().startswith("slow query") and "/plans/stats" in record.getMessage() for record in caplog.records)
+
+def run_queries(count):
+    """An ASGI app behind ProfilingMiddleware that runs one statement shape count times."""
+    async def app(scope, receive, send):
+        with database.engine.connect() as connection:
+            for n in range(count):
+                connection.execute(text("SELECT :n"), {"n": n})
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/repeat", "headers": []}
+    asyncio.run(profiling.ProfilingMiddleware(app)(scope, receive, send))
+
+def n_plus_one_total():
+    lines = metrics.render().splitlines()
+    return sum(float(line.rsplit(" ", 1)[1]) for line in lines if line.startswith("db_repeated_statement_requests_total{"))
+
+@pytest.mark.parametrize("count, flagged", [(profiling.N_PLUS_ONE_THRESHOLD, True), (profiling.N_PLUS_ONE_THRESHOLD - 1, False)])
+def test_repeated_statement_shapes_are_flagged(client, caplog, count, flagged):
+    before = n_plus_one_total()
+    with caplog.at_level(logging.WARNING, logger=profiling.logger.name):
+        run_queries(count)
+    assert any("possible N+1" in record.getMessage() for record in caplog.records) == flagged
+    assert n_plus_one_total() - before == (1 if flagged else 0)
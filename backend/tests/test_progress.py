@@ -0,0 +1,41 @@
+from datetime import date
+from sqlalchemy import select
+from backend.app import crud, database, models
+from conftest import create_animal, create_plan
+
+def progress_row(step_id):
+    with database.SessionLocal() as db:
+        return db.get(models.StepProgress, step_id)
+
+def test_new_steps_get_progress_rows(client, headers):
+    plan = create_plan(client, headers, create_animal(client, headers)["id"])
+    added = client.patch(f"/plans/{plan['id']}/steps", headers=headers, json={"create": [{"name": "Extra", "order": 9}]})
+    for step in added.json()["steps"]:
+        row = progress_row(step["id"])
+        assert (row.actual_sessions, row.note_count) == (0, 0)
+
+def test_recount_is_an_upsert(client, headers):
+    # Two writers recounting one step must not collide on the step_progress primary key
+    plan = create_plan(client, headers, create_animal(client, headers)["id"])
+    step_id = plan["steps"][0]["id"]
+    client.post(f"/steps/{step_id}/notes", headers=headers, json={"session_count": 3, "performed_date": "2024-03-01"})
+    with database.SessionLocal() as db:
+        for _ in range(2):
+            for stmt in crud.recount_step_progress([step_id], db.bind.dialect.name):
+                db.execute(stmt)
+        db.commit()
+        rows = db.execute(select(models.StepProgress).where(models.StepProgress.step_id == step_id)).scalars().all()
+    assert len(rows) == 1
+    assert (rows[0].actual_sessions, rows[0].note_count, rows[0].first_performed_date) == (3, 1, date(2024, 3, 1))
+
+def test_note_edits_keep_progress_in_step(client, headers):
+    plan = create_plan(client, headers, create_animal(client, headers)["id"])
+    step_id = plan["steps"][0]["id"]
+    first = client.post(f"/steps/{step_id}/notes", headers=headers, json={"session_count": 2, "performed_date": "2024-03-01"}).json()
+    client.post(f"/steps/{step_id}/notes", headers=headers, json={"session_count": 1, "performed_date": "2024-03-05"})
+    client.put(f"/steps/notes/{first['id']}", headers=headers, json={"session_count": 4, "performed_date": "2024-03-02"})
+    row = progress_row(step_id)
+    assert (row.actual_sessions, row.note_count, row.first_performed_date) == (5, 2, date(2024, 3, 2))
+    client.delete(f"/steps/notes/{first['id']}", headers=headers)
+    row = progress_row(step_id)
+    assert (row.actual_sessions, row.note_count, row.first_performed_date) == (1, 1, date(2024, 3, 5))
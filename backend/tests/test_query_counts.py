@@ -0,0 +1,85 @@
+"""Step, note and plan operations resolve ownership with one joined query, so each request
+runs a small fixed number of statements (counted by the metrics middleware); plan trees
+load in the same number of queries for one plan or thousands."""
+import pytest
+from sqlalchemy import insert, select
+from backend.app import crud, database, models
+from conftest import create_animal, create_plan, statements_run
+
+# Statement budgets include the ownership query, the write, the revision bump and any refresh
+BUDGETS = [
+    ("post", "/steps/{step_id}/notes", {"session_count": 1}, 5),
+    ("get", "/steps/{step_id}/notes", None, 2),
+    ("post", "/steps/{step_id}/complete", None, 4),
+    ("put", "/steps/{step_id}", {"name": "Renamed"}, 4),
+    ("put", "/steps/notes/{note_id}", {"session_count": 2}, 5),
+    ("delete", "/steps/notes/{note_id}", None, 4),
+    ("delete", "/steps/{step_id}", None, 7),
+    ("put", "/plans/{plan_id}", {"name": "Renamed"}, 5),
+]
+
+@pytest.mark.parametrize("method, route, body, budget", BUDGETS, ids=[f"{m.upper()} {r}" for m, r, _, _ in BUDGETS])
+def test_statements_per_request(client, headers, method, route, body, budget):
+    plan = create_plan(client, headers, create_animal(client, headers)["id"])
+    step_id = plan["steps"][0]["id"]
+    note_id = client.post(f"/steps/{step_id}/notes", headers=headers, json={"session_count": 1}).json()["id"]
+    path = route.format(step_id=step_id, note_id=note_id, plan_id=plan["id"])
+    # Warm the principal cache so only the route's own statements are counted
+    client.get("/auth/me", headers=headers)
+
+    before = statements_run(client, route)
+    response = client.request(method, path, headers=headers, json=body)
+    assert response.status_code < 300, response.text
+    assert statements_run(client, route) - before <= budget
+
+def seed_plans(animal_id: int, plans: int, steps: int = 3, notes: int = 2):
+    """Bulk-insert plans, steps, notes and progress rows for an animal, bypassing the API."""
+    with database.SessionLocal() as db:
+        plan_ids = db.scalars(
+            insert(models.TrainingPlan).returning(models.TrainingPlan.id),
+            [{"name": f"Plan {n}", "animal_id": animal_id} for n in range(plans)],
+        ).all()
+        db.execute(insert(models.PlanStep), [
+            {"name": f"Step {i}", "order": i, "plan_id": plan_id} for plan_id in plan_ids for i in range(1, steps + 1)
+        ])
+        step_ids = db.scalars(select(models.PlanStep.id).where(models.PlanStep.plan_id.in_(plan_ids))).all()
+        db.execute(insert(models.StepSessionNote), [
+            {"step_id": step_id, "note": "x", "session_count": 1} for step_id in step_ids for _ in range(notes)
+        ])
+        for stmt in crud.recount_step_progress(step_ids, db.bind.dialect.name):
+            db.execute(stmt)
+        db.commit()
+    return plan_ids
+
+TREE_INCLUDE = "include=steps,notes,progress"
+
+def tree_statements(client, headers, route, path):
+    before = statements_run(client, route)
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.text
+    return statements_run(client, route) - before, response.json()
+
+def test_plan_tree_statements_do_not_grow_with_plans(client, headers):
+    small, large = create_animal(client, headers, name="Small")["id"], create_animal(client, headers, name="Large")["id"]
+    seed_plans(small, 1)
+    seed_plans(large, 2000)
+    client.get("/auth/me", headers=headers)
+
+    route = "/plans/animal/{animal_id}"
+    few, trees = tree_statements(client, headers, route, f"/plans/animal/{small}?{TREE_INCLUDE}")
+    many, trees = tree_statements(client, headers, route, f"/plans/animal/{large}?{TREE_INCLUDE}")
+    assert len(trees) == 2000 and all(len(tree["steps"]) == 3 and len(tree["steps"][0]["notes"]) == 2 for tree in trees)
+    # Plans, steps joined with their progress, and notes: one query each
+    assert many == few <= 3
+
+def test_single_plan_statements_do_not_grow_with_steps(client, headers):
+    animal_id = create_animal(client, headers)["id"]
+    short, long = seed_plans(animal_id, 1, steps=1, notes=1)[0], seed_plans(animal_id, 1, steps=500, notes=5)[0]
+    client.get("/auth/me", headers=headers)
+
+    route = "/plans/{plan_id}"
+    few, _ = tree_statements(client, headers, route, f"/plans/{short}?{TREE_INCLUDE}")
+    many, tree = tree_statements(client, headers, route, f"/plans/{long}?{TREE_INCLUDE}")
+    assert len(tree["steps"]) == 500 and sum(len(step["notes"]) for step in tree["steps"]) == 2500
+    # The ETag revision lookup, then the tree queries
+    assert many == few <= 4
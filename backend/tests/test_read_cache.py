@@ -0,0 +1,136 @@
+"""Read cache generations stay bounded and invalidation never fails a committed write."""
+import asyncio
+import threading
+import time
+import pytest
+from backend.app import crud, database
+from backend.app.read_cache import MemoryBackend, RedisBackend, ReadCache, read_cache
+from conftest import create_animal, create_plan
+
+fakeredis = pytest.importorskip("fakeredis")
+
+class FailingBackend(MemoryBackend):
+    def advance(self, keys):
+        raise ConnectionError("cache down")
+
+class SlowBlockingBackend(MemoryBackend):
+    blocking = True
+
+    def __init__(self):
+        super().__init__(maxsize=16, ttl=60)
+        self.advanced_on = []
+
+    def advance(self, keys):
+        time.sleep(0.05)
+        self.advanced_on.append(threading.get_ident())
+        super().advance(keys)
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, monkeypatch, client):
+    if request.param == "memory":
+        backend = MemoryBackend(maxsize=64, ttl=60)
+    else:
+        backend = RedisBackend(client=fakeredis.FakeRedis(server=fakeredis.FakeServer()))
+    # Commits anywhere in the app invalidate through the shared instance; client has created the tables
+    monkeypatch.setattr(read_cache, "backend", backend)
+    return backend
+
+def cached(key, payload):
+    """Read key through the shared cache; payload is what a miss would load."""
+    async def load():
+        return payload
+    return asyncio.run(read_cache.get_or_load("test", key, {"page": 1}, load))
+
+def bump(key, commit=True):
+    with database.SessionLocal() as db:
+        crud.bump_revisions(db, key)
+        if commit:
+            db.commit()
+        else:
+            db.rollback()
+
+def test_repeat_reads_hit(backend):
+    assert cached("test:hit", b"first") == b"first"
+    assert cached("test:hit", b"second") == b"first"
+    assert read_cache.stats()["backend"] == backend.name
+
+def test_commit_invalidates(backend):
+    cached("test:commit", b"first")
+    bump("test:commit")
+    assert cached("test:commit", b"second") == b"second"
+    # Other keys keep their entries
+    cached("test:other", b"kept")
+    bump("test:commit")
+    assert cached("test:other", b"new") == b"kept"
+
+def test_rollback_does_not_invalidate(backend):
+    cached("test:rollback", b"first")
+    bump("test:rollback", commit=False)
+    assert cached("test:rollback", b"second") == b"first"
+
+def test_api_write_invalidates_list(backend, client, headers):
+    create_animal(client, headers, name="Before")
+    assert [animal["name"] for animal in client.get("/animals/", headers=headers).json()] == ["Before"]
+    create_animal(client, headers, name="After")
+    assert [animal["name"] for animal in client.get("/animals/", headers=headers).json()] == ["Before", "After"]
+
+def test_generations_are_bounded():
+    backend = MemoryBackend(maxsize=4, ttl=60)
+    for n in range(100):
+        backend.advance([f"key{n}"])
+        backend.generation(f"read{n}")
+    assert len(backend._generations) <= 4
+
+def test_evicted_key_does_not_return_to_old_generation():
+    backend = MemoryBackend(maxsize=2, ttl=60)
+    seen = {backend.generation("a")}
+    backend.advance(["a"])
+    seen.add(backend.generation("a"))
+    backend.advance(["b", "c"])
+    assert "a" not in backend._generations
+    # Entries under an older generation of "a" could still be live; none can be read
+    assert backend.generation("a") not in seen - {max(seen)}
+    backend.advance(["a"])
+    assert backend.generation("a") not in seen
+
+def test_invalidation_errors_are_logged(caplog):
+    cache = ReadCache(FailingBackend(maxsize=16, ttl=60))
+    cache.invalidate({"plans:1"})
+    assert "read cache invalidation failed" in caplog.text
+
+def test_committed_write_succeeds_when_invalidation_fails(client, headers, monkeypatch):
+    monkeypatch.setattr(read_cache, "backend", FailingBackend(maxsize=16, ttl=60))
+    animal_id = create_animal(client, headers)["id"]
+    assert client.put(f"/animals/{animal_id}", headers=headers, json={"name": "Renamed", "species": "dog", "sex": "Male"}).status_code == 200
+    assert client.get(f"/animals/{animal_id}", headers=headers).json()["name"] == "Renamed"
+
+def test_blocking_invalidation_runs_off_the_event_loop():
+    backend = SlowBlockingBackend()
+    cache = ReadCache(backend)
+
+    async def write_then_read():
+        loads = []
+        async def load():
+            loads.append(1)
+            return b"fresh"
+        await cache.get_or_load("plans", "plans:1", (), load)
+        started = time.perf_counter()
+        cache.invalidate({"plans:1"})
+        returned_after = time.perf_counter() - started
+        # The next read waits for the pending invalidation, so it does not serve the old entry
+        await cache.get_or_load("plans", "plans:1", (), load)
+        return returned_after, len(loads)
+
+    returned_after, loads = asyncio.run(write_then_read())
+    assert returned_after < 0.05
+    assert backend.advanced_on and backend.advanced_on[0] != threading.get_ident()
+    assert loads == 2
+    assert not cache._pending
+
+def test_timeline_is_served_from_read_cache(client, headers):
+    create_plan(client, headers, create_animal(client, headers)["id"])
+    before = read_cache.stats()["resources"].get("timeline", {"hits": 0})["hits"]
+    first = client.get("/timeline/", headers=headers)
+    second = client.get("/timeline/", headers=headers)
+    assert first.status_code == 200 and second.content == first.content
+    assert client.get("/metrics/cache").json()["resources"]["timeline"]["hits"] > before
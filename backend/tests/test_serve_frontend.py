@@ -0,0 +1,18 @@
+import os
+import pytest
+import serve_frontend
+
+@pytest.mark.parametrize("name, hashed", [
+    ("assets/index-Dk3j9Ab1.js", True),
+    ("assets/index-Q8x2LmZ0.css", True),
+    ("assets/logo-a_b-C9d0.svg", True),
+    ("assets/vendor/chunk-4fG7hJ2k.js", True),
+    ("apple-touch-icon.png", False),
+    ("android-chrome-192x192.png", False),
+    ("og-image-twitter.png", False),
+    ("assets/apple-touch-icon.png", False),
+    ("index.html", False),
+    ("favicon-12345678.ico", False),
+])
+def test_only_vite_hashed_assets_are_immutable(tmp_path, name, hashed):
+    assert serve_frontend.is_hashed_asset(str(tmp_path), os.path.join(os.path.realpath(tmp_path), name)) is hashed
@@ -0,0 +1,41 @@
+"""Importing the app stays cheap: no database connection, no passlib, within a time budget."""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+# Generous so slow CI machines pass; the import measured about 1 s when this was written
+IMPORT_BUDGET_SECONDS = float(os.environ.get("STARTUP_IMPORT_BUDGET_SECONDS", "5"))
+
+IMPORT_PROBE = """
+import json, sys, time
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+connections = []
+event.listen(Pool, "connect", lambda *args: connections.append(1))
+start = time.perf_counter()
+import backend.app.main
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "connections": len(connections),
+    "passlib": "passlib" in sys.modules,
+}))
+"""
+
+def run_probe(tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'untouched.db'}", PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_import_does_not_touch_the_database(tmp_path):
+    probe = run_probe(tmp_path)
+    assert probe["connections"] == 0
+    assert not (tmp_path / "untouched.db").exists()
+
+def test_import_defers_heavy_modules_and_stays_within_budget(tmp_path):
+    probe = run_probe(tmp_path)
+    assert not probe["passlib"]
+    assert probe["seconds"] < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,27 @@
+"""Stats accept dates or datetimes for from/to; a date ``to`` includes that whole day."""
+import pytest
+from conftest import signup
+
+LOGS = b"timestamp,duration\n2023-12-31T23:00:00,1\n2024-01-01T00:00:00,2\n2024-02-01T18:30:00,4\n2024-02-02T00:00:00,8\n"
+
+@pytest.fixture
+def logged(client):
+    headers = signup(client)
+    response = client.post("/plans/logs/import", headers=headers, files={"file": ("logs.csv", LOGS, "text/csv")})
+    assert response.status_code < 300, response.text
+    return headers
+
+@pytest.mark.parametrize("query, total_time", [
+    ("from=2024-01-01&to=2024-02-01", 6),
+    ("from=2024-01-01T00:00:00&to=2024-02-01T00:00:00", 2),
+    ("from=2024-01-01&to=2024-02-01T18:30:00", 2),
+    ("to=2023-12-31", 1),
+    ("from=2024-02-02", 8),
+])
+def test_stats_date_bounds(client, logged, query, total_time):
+    response = client.get(f"/plans/stats?{query}", headers=logged)
+    assert response.status_code == 200, response.text
+    assert response.json()["total_time"] == total_time
+
+def test_stats_rejects_invalid_bounds(client, logged):
+    assert client.get("/plans/stats?to=2024-13-01", headers=logged).status_code == 422
@@ -0,0 +1,73 @@
+"""Applying a template creates one plan per authorized animal, with copied steps, in a
+fixed handful of statements however many animals and steps there are."""
+from datetime import date
+from sqlalchemy import insert
+from backend.app import database, models
+from conftest import create_animal, signup, statements_run
+
+def seed_animals(client, headers, count):
+    me = client.get("/auth/me", headers=headers).json()
+    with database.SessionLocal() as db:
+        ids = db.scalars(insert(models.Animal).returning(models.Animal.id), [
+            {"name": f"A{n}", "species": "dog", "sex": "Male", "owner_id": me["id"], "organization_id": me["organization_id"]}
+            for n in range(count)
+        ]).all()
+        db.commit()
+    return ids
+
+def create_template(client, headers, steps):
+    response = client.post("/templates/", headers=headers, json={
+        "name": "Recall", "criteria": "Comes when called", "category": "behavior",
+        "steps": [{"name": f"Step {i}", "order": i, "estimated_sessions": i} for i in range(1, steps + 1)],
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def test_apply_to_many_animals_in_a_handful_of_statements(client, headers):
+    animals = seed_animals(client, headers, 100)
+    template_id = create_template(client, headers, 20)
+    client.get("/auth/me", headers=headers)
+
+    route = "/templates/{template_id}/apply"
+    before = statements_run(client, route)
+    response = client.post(f"/templates/{template_id}/apply", headers=headers, json={"animal_ids": animals})
+    assert response.status_code == 200, response.text
+    # Template and its steps, animals, plans, steps, progress rows and the revision bump
+    assert statements_run(client, route) - before <= 7
+    body = response.json()
+    assert body["created"] == 100
+    assert [result["animal_id"] for result in body["results"]] == animals
+    assert len({result["plan_id"] for result in body["results"]}) == 100
+
+def test_results_and_copied_steps(client, headers):
+    mine = create_animal(client, headers)["id"]
+    other_headers = signup(client)
+    foreign = create_animal(client, other_headers)["id"]
+    template_id = create_template(client, headers, 3)
+
+    response = client.post(f"/templates/{template_id}/apply", headers=headers, json={
+        "animal_ids": [mine, foreign, mine, 10**9], "started_date": "2024-05-01",
+    })
+    assert response.status_code == 200, response.text
+    body = response.json()
+    # Repeated ids get one plan and one result
+    assert body["created"] == 1
+    assert [(result["animal_id"], result["status"]) for result in body["results"]] == [
+        (mine, "created"), (foreign, "not_found"), (10**9, "not_found"),
+    ]
+    assert body["results"][1]["plan_id"] is None
+
+    plan = client.get(f"/plans/{body['results'][0]['plan_id']}?include=progress", headers=headers).json()
+    assert (plan["name"], plan["criteria"], plan["category"], plan["animal_id"]) == ("Recall", "Comes when called", "behavior", mine)
+    assert plan["started_date"] == date(2024, 5, 1).isoformat()
+    assert [(step["name"], step["order"], step["estimated_sessions"]) for step in plan["steps"]] == [
+        (f"Step {i}", i, i) for i in range(1, 4)
+    ]
+    assert all(step["progress"]["actual_sessions"] == 0 for step in plan["steps"])
+    assert client.get(f"/plans/animal/{foreign}", headers=other_headers).json() == []
+
+def test_other_organizations_template_is_404(client, headers):
+    template_id = create_template(client, signup(client), 1)
+    animal = create_animal(client, headers)["id"]
+    response = client.post(f"/templates/{template_id}/apply", headers=headers, json={"animal_ids": [animal]})
+    assert response.status_code == 404
@@ -0,0 +1,76 @@
+"""Timeline payload: step spans from dated notes (or the plan's start date), session
+totals per day, week or month bucket, and from/to filtering."""
+import pytest
+from conftest import create_animal, signup
+
+NOTES = [  # (step, performed_date, session_count)
+    (0, "2024-03-04", 2),
+    (0, "2024-03-06", 1),
+    (0, "2024-03-10", 3),
+    (0, "2024-04-02", 1),
+    (2, None, 4),  # undated notes count toward neither spans nor buckets
+]
+
+@pytest.fixture(scope="module")
+def world(client):
+    headers = signup(client)
+    animal_id = create_animal(client, headers)["id"]
+    plan = client.post(f"/plans/animal/{animal_id}", headers=headers, json={
+        "name": "Gantt", "started_date": "2024-03-01",
+        "steps": [{"name": f"Step {i}", "order": i, "estimated_sessions": 5} for i in range(1, 4)],
+    }).json()
+    steps = [step["id"] for step in plan["steps"]]
+    for step, performed_date, session_count in NOTES:
+        client.post(f"/steps/{steps[step]}/notes", headers=headers,
+                    json={"performed_date": performed_date, "session_count": session_count})
+    return {"headers": headers, "plan": plan["id"], "animal": animal_id, "steps": steps}
+
+def timeline(client, world, query=""):
+    response = client.get(f"/timeline/?plan_id={world['plan']}&{query}", headers=world["headers"])
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def sessions_by_bucket(payload):
+    sessions = payload["sessions"]
+    return {
+        (payload["steps"]["name"][step], payload["buckets"][bucket]): (total, notes)
+        for step, bucket, total, notes in zip(sessions["step"], sessions["bucket"], sessions["sessions"], sessions["notes"])
+    }
+
+def test_spans_fall_back_to_plan_start(client, world):
+    payload = timeline(client, world)
+    assert payload["plans"] == {"id": [world["plan"]], "name": ["Gantt"], "animal_id": [world["animal"]], "started_date": ["2024-03-01"]}
+    steps = payload["steps"]
+    assert steps["id"] == world["steps"] and steps["order"] == [1, 2, 3]
+    assert steps["start"] == ["2024-03-04", "2024-03-01", "2024-03-01"]
+    assert steps["end"] == ["2024-04-02", "2024-03-01", "2024-03-01"]
+
+@pytest.mark.parametrize("bucket, expected", [
+    ("day", {"2024-03-04": (2, 1), "2024-03-06": (1, 1), "2024-03-10": (3, 1), "2024-04-02": (1, 1)}),
+    # Weeks start on Monday; 2024-03-10 is the Sunday closing the week of the 4th
+    ("week", {"2024-03-04": (6, 3), "2024-04-01": (1, 1)}),
+    ("month", {"2024-03-01": (6, 3), "2024-04-01": (1, 1)}),
+])
+def test_buckets(client, world, bucket, expected):
+    payload = timeline(client, world, f"bucket={bucket}")
+    assert payload["bucket"] == bucket
+    assert payload["buckets"] == sorted(expected)
+    assert sessions_by_bucket(payload) == {("Step 1", key): value for key, value in expected.items()}
+
+def test_from_to_filter_spans_and_sessions(client, world):
+    payload = timeline(client, world, "bucket=day&from=2024-03-05&to=2024-03-10")
+    # Steps whose span ends before from drop out; to includes its own day
+    assert payload["steps"]["name"] == ["Step 1"]
+    assert payload["buckets"] == ["2024-03-06", "2024-03-10"]
+    assert sessions_by_bucket(payload) == {("Step 1", "2024-03-06"): (1, 1), ("Step 1", "2024-03-10"): (3, 1)}
+
+def test_range_before_any_activity_keeps_nothing(client, world):
+    payload = timeline(client, world, "to=2024-02-29")
+    assert payload["steps"]["id"] == [] and payload["buckets"] == [] and payload["plans"]["id"] == []
+
+def test_scoped_to_the_organization(client, world):
+    other = signup(client)
+    assert client.get(f"/timeline/?plan_id={world['plan']}", headers=other).json()["plans"]["id"] == []
+
+def test_unknown_bucket_is_rejected(client, world):
+    assert client.get("/timeline/?bucket=year", headers=world["headers"]).status_code == 422
@@ -0,0 +1,76 @@
+"""Access tokens: cached verification up to ``exp``, revocation by password change, and
+the uid/org claims checked against the user (tokens with only ``sub`` still work)."""
+import hashlib
+import time
+from datetime import timedelta
+import pytest
+from fastapi import HTTPException
+from backend.app import auth_utils
+from conftest import signup
+
+# /auth/me resolves the user from the database, /animals/ through the cached principal
+ROUTES = ["/auth/me", "/animals/"]
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def user(client, headers):
+    return {**client.get("/auth/me", headers=headers).json(), "headers": headers}
+
+def token_for(user, **claims):
+    return auth_utils.create_access_token({"sub": user["email"], **claims}, expires_delta=timedelta(minutes=5))
+
+def cache_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def test_cached_token_expires_at_exp():
+    unauthorized = HTTPException(status_code=401)
+    token = auth_utils.create_access_token({"sub": "cached@example.com"}, expires_delta=timedelta(seconds=1))
+    assert auth_utils.verify_token(token, unauthorized).email == "cached@example.com"
+    _, expires_at = auth_utils.token_cache._data[cache_key(token)]
+    assert expires_at - time.monotonic() <= 1
+    # Served from the cache until exp, then dropped
+    assert auth_utils.verify_token(token, unauthorized).email == "cached@example.com"
+    time.sleep(1.05)
+    assert auth_utils.token_cache.get(cache_key(token)) is None
+
+def test_expired_token_is_rejected(client):
+    token = auth_utils.create_access_token({"sub": "expired@example.com"}, expires_delta=timedelta(seconds=-5))
+    with pytest.raises(HTTPException):
+        auth_utils.verify_token(token, HTTPException(status_code=401))
+    assert auth_utils.token_cache.get(cache_key(token)) is None
+    assert client.get("/animals/", headers=bearer(token)).status_code == 401
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_sub_only_token_is_accepted(client, user, route):
+    assert client.get(route, headers=bearer(token_for(user))).status_code == 200
+
+@pytest.mark.parametrize("route", ROUTES)
+@pytest.mark.parametrize("claim", ["uid", "org"])
+def test_mismatched_uid_or_org_is_rejected(client, user, route, claim):
+    actual = {"uid": user["id"], "org": user["organization_id"]}[claim]
+    assert client.get(route, headers=bearer(token_for(user, **{claim: actual}))).status_code == 200
+    assert client.get(route, headers=bearer(token_for(user, **{claim: actual + 1000}))).status_code == 401
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_password_change_revokes_older_tokens(client, route):
+    old = signup(client)
+    email = client.get("/auth/me", headers=old).json()["email"]
+    sub_only = bearer(auth_utils.create_access_token({"sub": email}))
+    # Warm the principal and token caches, which must not keep the old tokens alive
+    assert client.get(route, headers=old).status_code == 200
+    response = client.put("/auth/password", headers=old, json={"current_password": "secret", "new_password": "changed"})
+    assert response.status_code == 200, response.text
+    new = bearer(response.json()["access_token"])
+
+    assert client.get(route, headers=old).status_code == 401
+    assert client.get(route, headers=sub_only).status_code == 401
+    assert client.get(route, headers=new).status_code == 200
+    assert client.post("/auth/login", json={"email": email, "password": "changed"}).status_code == 200
+    assert client.post("/auth/login", json={"email": email, "password": "secret"}).status_code == 401
+
+def test_password_change_needs_the_current_password(client, headers):
+    response = client.put("/auth/password", headers=headers, json={"current_password": "wrong", "new_password": "changed"})
+    assert response.status_code == 400
+    assert client.get("/auth/me", headers=headers).status_code == 200
@@ -1,36 +1,273 @@
 #!/usr/bin/env python3
 """
-Simple HTTP server to serve the frontend files
-This helps avoid CORS issues when testing locally
+HTTP server for the frontend build (frontend/dist, from `npm run build`)
+
+- one thread per connection, so a slow client doesn't hold up the others
+- gzip (and brotli, with `pip install brotli`) responses, using .gz/.br files
+  next to the originals when the build produced them
+- hashed assets (assets/index-<hash>.js) are cached as immutable, everything
+  else is revalidated with ETag / Last-Modified
+- byte range requests
+- unknown paths without a file extension get index.html, so client-side routes
+  survive a reload
 """
 
+import argparse
+import email.utils
+import functools
+import gzip
 import http.server
-import socketserver
+import mimetypes
 import os
+import re
+import threading
+import urllib.parse
 import webbrowser
 from pathlib import Path
 
-def serve_frontend():
-    # Change to the frontend directory
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+MIN_COMPRESS_SIZE = 1024
+# Vite writes built files to assets/ as name-<8 character hash>.ext, so their content never
+# changes under a URL; files from public/ (icons, robots.txt) keep their names and aren't hashed
+HASHED_ASSET = re.compile(r"^assets/(?:.+/)?[^/]+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+mimetypes.add_type("application/javascript", ".js")
+mimetypes.add_type("application/javascript", ".mjs")
+mimetypes.add_type("image/svg+xml", ".svg")
+
+class CompressedVariants:
+    """gzip/brotli bodies per (file, encoding), recomputed when the file changes."""
+
+    def __init__(self):
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, stat, encoding):
+        key = (path, encoding)
+        with self._lock:
+            cached = self._variants.get(key)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1]
+        # A precompressed file from the build wins over compressing here
+        sibling = path + (".br" if encoding == "br" else ".gz")
+        if os.path.isfile(sibling) and os.stat(sibling).st_mtime_ns >= stat.st_mtime_ns:
+            with open(sibling, "rb") as fh:
+                body = fh.read()
+        else:
+            with open(path, "rb") as fh:
+                raw = fh.read()
+            body = brotli.compress(raw) if encoding == "br" else gzip.compress(raw, compresslevel=9, mtime=0)
+        with self._lock:
+            self._variants[key] = ((stat.st_mtime_ns, stat.st_size), body)
+        return body
+
+def is_hashed_asset(root, path):
+    relative = os.path.relpath(path, os.path.realpath(root)).replace(os.sep, "/")
+    return HASHED_ASSET.match(relative) is not None
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q=") and quality[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single satisfiable range, None to ignore the header, or "invalid"."""
+    match = RANGE.match(header.strip())
+    if not match:
+        return None  # multiple or non-byte ranges: serve the whole file
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return "invalid"
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return "invalid"
+    return start, end
+
+class StaticHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive; every response has a Content-Length
+    # Headers and body go out in separate writes; with Nagle on, a kept-alive client's
+    # delayed ACK stalls every response by ~40 ms
+    disable_nagle_algorithm = True
+    variants = CompressedVariants()
+    quiet = False
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def resolve(self):
+        """File path for the request, falling back to index.html for client-side routes."""
+        url_path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        root = os.path.realpath(self.directory)
+        path = os.path.realpath(os.path.join(root, url_path.lstrip("/")))
+        if os.path.commonpath([root, path]) != root:
+            return None, False
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        if os.path.isfile(path):
+            return path, False
+        if "." not in url_path.rsplit("/", 1)[-1]:
+            index = os.path.join(root, "index.html")
+            if os.path.isfile(index):
+                return index, True
+        return None, False
+
+    def not_modified(self, etag, stat):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(stat.st_mtime) <= since
+        return False
+
+    def serve(self, send_body):
+        path, fallback = self.resolve()
+        if path is None:
+            self.send_error(404, "File not found")
+            return
+        stat = os.stat(path)
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        compressible = content_type.startswith(COMPRESSIBLE_TYPES) and stat.st_size >= MIN_COMPRESS_SIZE
+        immutable = not fallback and is_hashed_asset(self.directory, path)
+
+        # Ranges are only served from the identity encoding
+        encoding = None
+        range_header = self.headers.get("Range")
+        if compressible and not range_header:
+            accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+            if "br" in accepted and brotli is not None:
+                encoding = "br"
+            elif "gzip" in accepted:
+                encoding = "gzip"
+
+        validator = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        etag = f'"{validator}-{encoding}"' if encoding else f'"{validator}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": email.utils.formatdate(stat.st_mtime, usegmt=True),
+            "Cache-Control": IMMUTABLE if immutable else REVALIDATE,
+            "Accept-Ranges": "bytes",
+        }
+        if compressible:
+            headers["Vary"] = "Accept-Encoding"
+
+        if self.not_modified(etag, stat):
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        if encoding:
+            body = self.variants.get(path, stat, encoding)
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Encoding", encoding)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+            return
+
+        start, end, status = 0, stat.st_size - 1, 200
+        if_range = self.headers.get("If-Range")
+        if range_header and (not if_range or if_range.strip() in (etag, headers["Last-Modified"])):
+            requested = parse_range(range_header, stat.st_size)
+            if requested == "invalid":
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{stat.st_size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if requested:
+                start, end = requested
+                status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(end - start + 1))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{stat.st_size}")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if send_body and end >= start:
+            with open(path, "rb") as fh:
+                self.connection.sendfile(fh, offset=start, count=end - start + 1)
+
+class StaticServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+def make_server(directory, port, host="", quiet=False):
+    handler = type("Handler", (StaticHandler,), {"quiet": quiet, "variants": CompressedVariants()})
+    return StaticServer((host, port), functools.partial(handler, directory=str(directory)))
+
+def default_directory():
     frontend_dir = Path(__file__).parent / "frontend"
-    os.chdir(frontend_dir)
-    
-    # Set up the server
-    PORT = 3000
-    Handler = http.server.SimpleHTTPRequestHandler
-    
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
-        print(f"🌐 Frontend server running at http://localhost:{PORT}")
-        print(f"📁 Serving files from: {frontend_dir}")
+    dist_dir = frontend_dir / "dist"
+    if (dist_dir / "index.html").is_file():
+        return dist_dir
+    print(f"⚠️  {dist_dir} not found, run `npm run build` in frontend/; serving {frontend_dir} instead")
+    return frontend_dir
+
+def serve_frontend():
+    parser = argparse.ArgumentParser(description="Serve the frontend build")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--host", default="")
+    parser.add_argument("--dir", type=Path, help="directory to serve (default: frontend/dist)")
+    parser.add_argument("--no-browser", action="store_true", help="don't open a browser tab")
+    parser.add_argument("--quiet", action="store_true", help="don't log every request")
+    args = parser.parse_args()
+
+    directory = args.dir or default_directory()
+    with make_server(directory, args.port, args.host, args.quiet) as httpd:
+        print(f"🌐 Frontend server running at http://localhost:{args.port}")
+        print(f"📁 Serving files from: {directory}")
         print("Press Ctrl+C to stop the server")
-        
+
         # Open the browser automatically
-        webbrowser.open(f"http://localhost:{PORT}")
-        
+        if not args.no_browser:
+            webbrowser.open(f"http://localhost:{args.port}")
+
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\n🛑 Server stopped")
 
 if __name__ == "__main__":
-    serve_frontend() 
\ No newline at end of file
+    serve_frontend()